@@ -0,0 +1,24 @@
+"""
+Connections to the model backends (whisper, ollama and kokoro).
+
+See: docs/services/agent.md#connection-pooling
+"""
+
+from .admission import AdmissionController, AdmissionPolicy, LoadBoard, RequestTracker
+from .clients import ClientRegistry, PoolLimits
+from .router import LLMBackendPool, RoutingLLM
+from .warmup import WarmupResult, parse_keep_alive, warm_backends
+
+__all__ = [
+    "AdmissionController",
+    "AdmissionPolicy",
+    "ClientRegistry",
+    "LLMBackendPool",
+    "LoadBoard",
+    "PoolLimits",
+    "RequestTracker",
+    "RoutingLLM",
+    "WarmupResult",
+    "parse_keep_alive",
+    "warm_backends",
+]
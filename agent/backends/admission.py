@@ -0,0 +1,399 @@
+"""
+Load-aware job admission based on backend queue depth and latency.
+
+LiveKit's default load function reports the worker's CPU. The agent's own
+CPU is rarely the bottleneck: the work happens in whisper, ollama and
+kokoro. When ollama saturates, the worker still looks idle, new rooms keep
+being admitted, and every active call slows down together.
+
+Load is measured where the requests are made, and in three parts:
+
+``RequestTracker``
+    Lives in each job process. Hooked into the pooled clients of
+    ``ClientRegistry``, it counts in-flight ``POST`` requests per backend
+    and keeps their recent time to response headers, which grows with the
+    backend's queue.
+``LoadBoard``
+    Each job process publishes its tracker snapshot as a small JSON file in
+    a shared directory, a few times per second. Snapshots from processes
+    that stopped publishing are ignored.
+``AdmissionController``
+    Runs in the main worker process. ``load`` combines all fresh snapshots
+    into one value for ``WorkerOptions.load_fnc``, so LiveKit stops
+    dispatching to a worker above ``load_threshold``. ``request_fnc`` closes
+    the gap between load reports: a job that arrives while over the
+    threshold waits up to ``queue_timeout`` for capacity, and is then
+    rejected so LiveKit can hand it to another worker.
+
+See: docs/services/agent.md#admission-control
+"""
+
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Mapping, Optional, Sequence, Union
+
+logger = logging.getLogger("local-agent")
+
+SERVICES = ("stt", "llm", "tts")
+
+
+class RequestTracker:
+    """
+    In-flight requests and recent latency per backend, for one process.
+
+    Requests are attributed to a backend by URL prefix. Only ``POST``
+    requests count, so connection warm-up and health checks do not.
+
+    Attributes:
+        inflight: Requests currently open, per service.
+        sessions: Sessions currently running in this process.
+
+    Example:
+        >>> tracker = RequestTracker({"llm": LLM_BASE_URL, "stt": STT_BASE_URL})
+        >>> registry = ClientRegistry(limits, tracker=tracker)
+        >>> tracker.snapshot()["inflight"]
+        {'llm': 0, 'stt': 0}
+
+    See Also:
+        docs/services/agent.md#admission-control
+    """
+
+    def __init__(
+        self, urls: Mapping[str, Union[str, Sequence[str]]], latency_window: float = 30.0, max_samples: int = 512
+    ) -> None:
+        """
+        Args:
+            urls: Base URL (or URLs) of each service, e.g. ``{"llm": "http://ollama:11434/v1"}``.
+            latency_window: Seconds of latency samples kept in a snapshot.
+            max_samples: Latency samples kept per service.
+        """
+        # longest prefix first, so nested URLs resolve to the most specific service
+        self._prefixes = sorted(
+            (
+                (url.rstrip("/"), service)
+                for service, service_urls in urls.items()
+                for url in ([service_urls] if isinstance(service_urls, str) else service_urls)
+            ),
+            key=lambda p: -len(p[0]),
+        )
+        self.latency_window = latency_window
+        self.inflight: Dict[str, int] = {service: 0 for service in urls}
+        self.sessions = 0
+        self._latency = {service: deque(maxlen=max_samples) for service in urls}
+        self._lock = threading.Lock()
+
+    def service_for(self, url: str) -> Optional[str]:
+        """Return the service whose base URL prefixes ``url``, if any."""
+        for prefix, service in self._prefixes:
+            if url.startswith(prefix):
+                return service
+        return None
+
+    def begin(self, service: str) -> None:
+        """Count a request as in flight."""
+        with self._lock:
+            self.inflight[service] += 1
+
+    def end(self, service: str) -> None:
+        """Count a request as finished."""
+        with self._lock:
+            self.inflight[service] -= 1
+
+    def observe(self, service: str, seconds: float) -> None:
+        """Record the time to response headers of one request."""
+        with self._lock:
+            self._latency[service].append((time.monotonic(), seconds))
+
+    def session_started(self) -> None:
+        """Count a session as running in this process."""
+        with self._lock:
+            self.sessions += 1
+
+    def session_ended(self) -> None:
+        """Count a session as finished."""
+        with self._lock:
+            self.sessions -= 1
+
+    def snapshot(self) -> Dict:
+        """
+        Return this process's load as a JSON-serializable dict.
+
+        Returns:
+            ``pid``, ``time`` (wall clock), ``sessions``, ``inflight`` per
+            service and ``latency_p95`` per service over the last
+            ``latency_window`` seconds (None without recent requests).
+        """
+        cutoff = time.monotonic() - self.latency_window
+        with self._lock:
+            inflight = dict(self.inflight)
+            recent = {s: [v for t, v in samples if t >= cutoff] for s, samples in self._latency.items()}
+            sessions = self.sessions
+        return {
+            "pid": os.getpid(),
+            "time": time.time(),
+            "sessions": sessions,
+            "inflight": inflight,
+            "latency_p95": {s: _p95(values) for s, values in recent.items()},
+        }
+
+    def httpx_transport(self, **kwargs):
+        """
+        Return an ``httpx.AsyncHTTPTransport`` that reports to this tracker.
+
+        A request is in flight until its response body is closed, so a
+        streamed LLM reply counts for its whole duration.
+
+        Args:
+            **kwargs: Passed to ``httpx.AsyncHTTPTransport`` (e.g. ``limits``).
+        """
+        import httpx
+
+        tracker = self
+
+        class TrackedStream(httpx.AsyncByteStream):
+            def __init__(self, inner, service: str) -> None:
+                self._inner = inner
+                self._service = service
+                self._open = True
+
+            async def __aiter__(self):
+                async for chunk in self._inner:
+                    yield chunk
+
+            async def aclose(self) -> None:
+                try:
+                    await self._inner.aclose()
+                finally:
+                    if self._open:
+                        self._open = False
+                        tracker.end(self._service)
+
+        class TrackedTransport(httpx.AsyncHTTPTransport):
+            async def handle_async_request(self, request):
+                service = tracker.service_for(str(request.url)) if request.method == "POST" else None
+                if service is None:
+                    return await super().handle_async_request(request)
+                tracker.begin(service)
+                start = time.perf_counter()
+                try:
+                    response = await super().handle_async_request(request)
+                except BaseException:
+                    tracker.end(service)
+                    raise
+                tracker.observe(service, time.perf_counter() - start)
+                response.stream = TrackedStream(response.stream, service)
+                return response
+
+        return TrackedTransport(**kwargs)
+
+    def aiohttp_trace_config(self):
+        """
+        Return an ``aiohttp.TraceConfig`` that reports to this tracker.
+
+        aiohttp signals the end of a request when the response headers
+        arrive, so for this client a request is in flight until then.
+        """
+        import aiohttp
+
+        async def on_start(session, ctx, params) -> None:
+            ctx.service = self.service_for(str(params.url)) if params.method == "POST" else None
+            if ctx.service is not None:
+                ctx.start = time.perf_counter()
+                self.begin(ctx.service)
+
+        async def on_end(session, ctx, params) -> None:
+            if ctx.service is not None:
+                self.observe(ctx.service, time.perf_counter() - ctx.start)
+                self.end(ctx.service)
+                ctx.service = None
+
+        async def on_exception(session, ctx, params) -> None:
+            if ctx.service is not None:
+                self.end(ctx.service)
+                ctx.service = None
+
+        trace = aiohttp.TraceConfig()
+        trace.on_request_start.append(on_start)
+        trace.on_request_end.append(on_end)
+        trace.on_request_exception.append(on_exception)
+        return trace
+
+
+def _p95(values: List[float]) -> Optional[float]:
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(0.95 * len(values)))]
+
+
+class LoadBoard:
+    """
+    Directory of per-process load snapshots shared by a worker's processes.
+
+    Attributes:
+        directory: Where each process writes ``<pid>.json``.
+    """
+
+    def __init__(self, directory: str) -> None:
+        """Use ``directory``, creating it on first publish."""
+        self.directory = Path(directory)
+        self._publisher: Optional[threading.Thread] = None
+
+    def publish(self, snapshot: Dict) -> None:
+        """Atomically replace this process's snapshot."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / f"{snapshot['pid']}.json"
+        # the publisher thread and the event loop may both publish for one pid
+        tmp = path.with_suffix(f".{threading.get_ident()}.tmp")
+        tmp.write_text(json.dumps(snapshot), encoding="utf-8")
+        os.replace(tmp, path)
+
+    def read(self, max_age: float) -> List[Dict]:
+        """
+        Return the snapshots published within the last ``max_age`` seconds.
+
+        Files of processes that stopped publishing long ago are deleted.
+        """
+        now = time.time()
+        snapshots = []
+        try:
+            paths = list(self.directory.glob("*.json"))
+        except OSError:
+            return snapshots
+        for path in paths:
+            try:
+                snapshot = json.loads(path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                continue
+            age = now - snapshot.get("time", 0)
+            if age <= max_age:
+                snapshots.append(snapshot)
+            elif age > 10 * max_age:
+                path.unlink(missing_ok=True)
+        return snapshots
+
+    def start_publisher(self, snapshot: Callable[[], Dict], interval: float = 0.5) -> None:
+        """Publish ``snapshot()`` every ``interval`` seconds from a daemon thread (once per process)."""
+        if self._publisher is not None:
+            return
+
+        def run() -> None:
+            while True:
+                try:
+                    self.publish(snapshot())
+                except OSError as e:
+                    logger.warning(f"Could not publish load to {self.directory}: {e}")
+                time.sleep(interval)
+
+        self._publisher = threading.Thread(target=run, name="load-publisher", daemon=True)
+        self._publisher.start()
+
+
+@dataclass(frozen=True)
+class AdmissionPolicy:
+    """
+    Capacity of the worker; each limit maps to a load of 1.0.
+
+    ``max_inflight`` and ``latency_slo`` are per service. A limit of 0
+    disables that term.
+    """
+
+    max_sessions: int = 0
+    max_inflight: Mapping[str, int] = field(default_factory=lambda: {"stt": 8, "llm": 4, "tts": 8})
+    latency_slo: Mapping[str, float] = field(default_factory=lambda: {"stt": 1.0, "llm": 1.5, "tts": 1.0})
+    threshold: float = 0.75
+    queue_timeout: float = 2.0
+
+
+class AdmissionController:
+    """
+    Worker load and job admission from the snapshots on a ``LoadBoard``.
+
+    Example:
+        >>> controller = AdmissionController(LoadBoard(ADMISSION_DIR), AdmissionPolicy())
+        >>> WorkerOptions(entrypoint_fnc=entrypoint, load_fnc=controller.load,
+        ...               load_threshold=0.75, request_fnc=controller.request_fnc)
+
+    See Also:
+        docs/services/agent.md#admission-control
+    """
+
+    def __init__(self, board: LoadBoard, policy: AdmissionPolicy = AdmissionPolicy(), max_age: float = 5.0) -> None:
+        """
+        Args:
+            board: Where the job processes publish their load.
+            policy: Limits and threshold.
+            max_age: Snapshots older than this many seconds are ignored.
+        """
+        self.board = board
+        self.policy = policy
+        self.max_age = max_age
+
+    def breakdown(self) -> Dict[str, float]:
+        """
+        Return each load term (sessions, ``<service>_inflight``, ``<service>_latency``) in ``[0, 1]``.
+
+        A ``<service>_latency`` term is only counted while that service has
+        requests in flight or sessions are active. The p95 covers the whole
+        latency window, so a slow burst (a cold model) would otherwise hold
+        an idle worker over the threshold, with nothing running to lower it.
+        """
+        snapshots = self.board.read(self.max_age)
+        policy = self.policy
+        terms: Dict[str, float] = {}
+        sessions = sum(s.get("sessions", 0) for s in snapshots)
+        if policy.max_sessions > 0:
+            terms["sessions"] = sessions / policy.max_sessions
+        for service in SERVICES:
+            inflight = sum(s["inflight"].get(service, 0) for s in snapshots)
+            limit = policy.max_inflight.get(service, 0)
+            if limit > 0:
+                terms[f"{service}_inflight"] = inflight / limit
+            slo = policy.latency_slo.get(service, 0)
+            if slo > 0 and (inflight > 0 or sessions > 0):
+                latencies = [s["latency_p95"].get(service) for s in snapshots]
+                worst = max((v for v in latencies if v is not None), default=0.0)
+                terms[f"{service}_latency"] = worst / slo
+        return {name: min(1.0, max(0.0, value)) for name, value in terms.items()}
+
+    def load(self, worker=None) -> float:
+        """
+        Return the worker load in ``[0, 1]``: the highest of all terms.
+
+        Used as ``WorkerOptions.load_fnc``. LiveKit calls it periodically
+        from the main process and stops dispatching jobs at or above
+        ``load_threshold``.
+        """
+        return max(self.breakdown().values(), default=0.0)
+
+    async def request_fnc(self, req) -> None:
+        """
+        Accept the job if the worker is below the threshold.
+
+        Used as ``WorkerOptions.request_fnc``. If the worker is over the
+        threshold, waits up to ``queue_timeout`` for it to drop, then
+        rejects the job so LiveKit can offer it to another worker.
+        """
+        deadline = time.monotonic() + self.policy.queue_timeout
+        while True:
+            terms = self.breakdown()
+            load = max(terms.values(), default=0.0)
+            if load < self.policy.threshold:
+                await req.accept()
+                return
+            if time.monotonic() >= deadline:
+                break
+            await asyncio.sleep(0.25)
+
+        busiest = max(terms, key=terms.get)
+        logger.warning(
+            "Rejecting job %s: load %.2f >= %.2f (%s)", req.id, load, self.policy.threshold, busiest
+        )
+        await req.reject()
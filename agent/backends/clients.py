@@ -0,0 +1,177 @@
+"""
+Process-wide registry of pooled HTTP clients for the model backends.
+
+``LocalAgent.__init__`` used to let ``openai.STT``, ``openai.LLM`` and
+``groq.TTS`` create their own HTTP clients, so every session opened fresh
+TCP connections to whisper, ollama and kokoro and discarded them on hangup.
+``ClientRegistry`` hands out one keep-alive ``openai.AsyncClient`` per
+backend URL and one ``aiohttp.ClientSession``. All sessions of the process
+share them, with configurable pool limits.
+
+httpx and aiohttp connections belong to the event loop they were opened
+on, so clients are kept per running loop. In the usual setup that is the
+single loop of a job process. ``warm_up`` opens connections ahead of the
+first user turn with a cheap ``GET /models`` per backend. With a
+``RequestTracker``, every client reports its in-flight requests for
+admission control.
+
+See: docs/services/agent.md#connection-pooling
+"""
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional, Tuple
+
+logger = logging.getLogger("local-agent")
+
+
+@dataclass(frozen=True)
+class PoolLimits:
+    """Connection pool settings shared by all backend clients."""
+
+    max_connections: int = 32
+    max_keepalive: int = 16
+    keepalive_expiry: float = 60.0
+    connect_timeout: float = 5.0
+    read_timeout: float = 30.0
+
+
+class ClientRegistry:
+    """
+    Shared, pooled HTTP clients keyed by event loop and backend URL.
+
+    Attributes:
+        limits: Pool settings applied to every client.
+        tracker: Optional ``RequestTracker`` the clients report requests to.
+
+    Example:
+        >>> registry = ClientRegistry(PoolLimits(max_connections=16))
+        >>> llm = openai.LLM(model="gemma3:4b", client=registry.openai_client(LLM_BASE_URL))
+        >>> await registry.warm_up([LLM_BASE_URL])
+
+    See Also:
+        docs/services/agent.md#connection-pooling
+    """
+
+    def __init__(self, limits: PoolLimits = PoolLimits(), tracker=None) -> None:
+        """Create an empty registry; clients are created on first use."""
+        self.limits = limits
+        self.tracker = tracker
+        self._openai: Dict[Tuple[asyncio.AbstractEventLoop, str], object] = {}
+        self._sessions: Dict[asyncio.AbstractEventLoop, object] = {}
+
+    def openai_client(self, base_url: str, api_key: str = "no-key-needed"):
+        """
+        Return the shared ``openai.AsyncClient`` for ``base_url`` on this loop.
+
+        Must be called with an event loop running (e.g. from the job
+        entrypoint, where ``LocalAgent`` is created).
+
+        Retries are left to the agent (``max_retries=0``) so a slow backend
+        does not silently multiply a turn's latency.
+
+        Args:
+            base_url: OpenAI-compatible base URL, e.g. ``http://ollama:11434/v1``.
+            api_key: API key sent to the backend.
+        """
+        import httpx
+        import openai
+
+        key = (asyncio.get_running_loop(), base_url.rstrip("/"))
+        client = self._openai.get(key)
+        if client is None or client.is_closed():
+            limits = self.limits
+            pool = httpx.Limits(
+                max_connections=limits.max_connections,
+                max_keepalive_connections=limits.max_keepalive,
+                keepalive_expiry=limits.keepalive_expiry,
+            )
+            http_client = httpx.AsyncClient(
+                limits=pool,
+                # the client's limits only apply to its default transport
+                transport=self.tracker.httpx_transport(limits=pool) if self.tracker else None,
+                timeout=httpx.Timeout(limits.read_timeout, connect=limits.connect_timeout),
+            )
+            client = openai.AsyncClient(
+                base_url=key[1], api_key=api_key, http_client=http_client, max_retries=0
+            )
+            self._openai[key] = client
+        return client
+
+    def http_session(self):
+        """Return the shared ``aiohttp.ClientSession`` of this loop."""
+        import aiohttp
+
+        loop = asyncio.get_running_loop()
+        session = self._sessions.get(loop)
+        if session is None or session.closed:
+            limits = self.limits
+            session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=limits.max_connections,
+                    keepalive_timeout=limits.keepalive_expiry,
+                ),
+                timeout=aiohttp.ClientTimeout(
+                    total=None, sock_connect=limits.connect_timeout, sock_read=limits.read_timeout
+                ),
+                trace_configs=[self.tracker.aiohttp_trace_config()] if self.tracker else None,
+            )
+            self._sessions[loop] = session
+        return session
+
+    async def _warm_openai(self, base_url: str) -> None:
+        await self.openai_client(base_url).models.list()
+
+    async def _warm_session(self, base_url: str) -> None:
+        async with self.http_session().get(f"{base_url.rstrip('/')}/models") as resp:
+            await resp.read()
+
+    async def warm_up(
+        self, openai_urls: Iterable[str] = (), session_urls: Iterable[str] = (), connections: int = 2
+    ) -> Dict[str, Optional[float]]:
+        """
+        Open keep-alive connections to every backend before they are needed.
+
+        Each backend gets ``connections`` concurrent ``GET /models``
+        requests, so that many pooled connections are left open. Failures
+        are logged and leave the pool cold; they never raise.
+
+        Args:
+            openai_urls: Backends used through :meth:`openai_client`.
+            session_urls: Backends used through :meth:`http_session`.
+            connections: Concurrent warm-up requests per backend.
+
+        Returns:
+            Seconds taken per backend URL, or None if it was unreachable.
+        """
+        async def warm(url: str, fn) -> Tuple[str, Optional[float]]:
+            start = time.perf_counter()
+            results = await asyncio.gather(
+                *(fn(url) for _ in range(max(1, connections))), return_exceptions=True
+            )
+            errors = [r for r in results if isinstance(r, BaseException)]
+            if len(errors) == len(results):
+                logger.warning(f"Connection warm-up to {url} failed: {errors[0]!r}")
+                return url, None
+            return url, time.perf_counter() - start
+
+        timings = dict(await asyncio.gather(
+            *(warm(url, self._warm_openai) for url in openai_urls),
+            *(warm(url, self._warm_session) for url in session_urls),
+        ))
+        logger.info(
+            "Warmed backend connections: "
+            + ", ".join(f"{url} {'unreachable' if t is None else f'{t * 1000:.0f} ms'}" for url, t in timings.items())
+        )
+        return timings
+
+    async def aclose(self) -> None:
+        """Close the clients of the running loop (call on job shutdown)."""
+        loop = asyncio.get_running_loop()
+        for key in [k for k in self._openai if k[0] is loop]:
+            await self._openai.pop(key).close()
+        session = self._sessions.pop(loop, None)
+        if session is not None:
+            await session.close()
@@ -0,0 +1,365 @@
+"""
+Least-loaded routing of LLM requests across several OpenAI-compatible backends.
+
+``LocalAgent`` used to talk to a single ollama. ``RoutingLLM`` is a LiveKit
+``llm.LLM`` over a list of endpoints. It wraps one ``openai.LLM`` per
+endpoint and, for each request:
+
+1. ranks the backends of ``LLMBackendPool`` by expected wait: the EWMA of
+   their time to first token multiplied by (in-flight requests + 1).
+   Ejected backends are skipped unless no healthy one is left,
+2. streams from the best one. If no token arrives within ``ttft_deadline``,
+   the request is cancelled there and retried on the next backend, where
+   the last attempt has no deadline,
+3. on a connection or status error before the first token, fails over to
+   the next backend. After the first token, the error is raised, because
+   the reply is already being spoken.
+
+The pool is shared by all sessions of a process. LiveKit runs every job in
+its own process, so with a ``LoadBoard`` the pool also publishes its
+in-flight counts and TTFT EWMAs there and ranks with those of the other
+processes: a new session sees the load of the running ones and starts from
+their measurements. Health stays per process. Backends are ejected after
+``eject_after`` consecutive failures, and a periodic ``GET /models`` probe
+ejects or restores them.
+
+See: docs/services/agent.md#llm-routing
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from statistics import mean
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from livekit.agents import DEFAULT_API_CONNECT_OPTIONS, APIConnectionError, APIConnectOptions, APIError, llm
+
+from .admission import LoadBoard
+
+logger = logging.getLogger("local-agent")
+
+
+class TTFTDeadlineExceeded(Exception):
+    """No first token within the routing deadline."""
+
+
+@dataclass
+class BackendState:
+    """
+    Routing state of one LLM endpoint.
+
+    Attributes:
+        url: OpenAI-compatible base URL.
+        inflight: Requests currently streaming from this backend, in this process.
+        ttft_ewma: Smoothed time to first token in seconds, None until measured.
+        healthy: False while ejected.
+        failures: Consecutive failed requests or probes.
+    """
+
+    url: str
+    inflight: int = 0
+    ttft_ewma: Optional[float] = None
+    healthy: bool = True
+    failures: int = 0
+
+    def expected_wait(self, remote_inflight: int = 0, remote_ttft: Optional[float] = None) -> float:
+        """
+        Return the estimated time to first token of one more request.
+
+        Args:
+            remote_inflight: Requests other processes have in flight here.
+            remote_ttft: Their TTFT estimate, used until this process has one.
+        """
+        ttft = self.ttft_ewma if self.ttft_ewma is not None else remote_ttft
+        # unmeasured backends rank first, so each gets traffic and a measurement
+        return (ttft or 0.0) * (self.inflight + remote_inflight + 1)
+
+
+class LLMBackendPool:
+    """
+    Load, latency and health of a set of LLM backends, shared per process.
+
+    Attributes:
+        board: Where the job processes exchange backend load, or None to
+            route on this process's requests only.
+
+    Example:
+        >>> pool = LLMBackendPool(["http://gpu-1:11434/v1", "http://gpu-2:11434/v1"],
+        ...                       board=LoadBoard("/tmp/local-voice-ai/llm-routing"))
+        >>> pool.start_sharing()
+        >>> pool.start_health_checks(lambda url: registry.openai_client(url).models.list())
+        >>> llm = RoutingLLM(pool, lambda url: openai.LLM(model="gemma3:4b", base_url=url))
+
+    See Also:
+        docs/services/agent.md#llm-routing
+    """
+
+    def __init__(
+        self,
+        urls: Sequence[str],
+        ewma_alpha: float = 0.3,
+        ttft_deadline: float = 2.0,
+        eject_after: int = 2,
+        probe_interval: float = 5.0,
+        probe_timeout: float = 2.0,
+        board: Optional[LoadBoard] = None,
+        share_max_age: float = 5.0,
+    ) -> None:
+        """
+        Args:
+            urls: Base URLs of the backends, in order of preference for ties.
+            ewma_alpha: Weight of the newest TTFT sample.
+            ttft_deadline: Seconds to wait for a first token before retrying
+                elsewhere (0 disables the deadline).
+            eject_after: Consecutive failures that eject a backend.
+            probe_interval: Seconds between health probes.
+            probe_timeout: Seconds before a probe counts as failed.
+            board: Shared directory of per-process backend state, or None.
+            share_max_age: Snapshots of other processes older than this many
+                seconds are ignored.
+        """
+        if not urls:
+            raise ValueError("LLMBackendPool needs at least one backend URL")
+        self.backends = [BackendState(url.rstrip("/")) for url in urls]
+        self.ewma_alpha = ewma_alpha
+        self.ttft_deadline = ttft_deadline
+        self.eject_after = eject_after
+        self.probe_interval = probe_interval
+        self.probe_timeout = probe_timeout
+        self.board = board
+        self.share_max_age = share_max_age
+        self._probe_task: Optional[asyncio.Task] = None
+
+    def snapshot(self) -> Dict:
+        """Return this process's backend state as a JSON-serializable dict for the board."""
+        return {
+            "pid": os.getpid(),
+            "time": time.time(),
+            "backends": {b.url: {"inflight": b.inflight, "ttft_ewma": b.ttft_ewma} for b in self.backends},
+        }
+
+    def start_sharing(self, interval: float = 1.0) -> None:
+        """Publish the snapshot every ``interval`` seconds (once per process), so it stays fresh between requests."""
+        if self.board is not None:
+            self.board.start_publisher(self.snapshot, interval=interval)
+
+    def remote_load(self) -> Dict[str, Tuple[int, Optional[float]]]:
+        """Return per URL the requests other processes have in flight and the mean of their TTFT EWMAs."""
+        if self.board is None:
+            return {}
+        pid = os.getpid()
+        inflight: Dict[str, int] = defaultdict(int)
+        ttfts: Dict[str, List[float]] = defaultdict(list)
+        for snapshot in self.board.read(self.share_max_age):
+            if snapshot.get("pid") == pid:
+                continue
+            for url, state in snapshot.get("backends", {}).items():
+                inflight[url] += state.get("inflight", 0)
+                if state.get("ttft_ewma") is not None:
+                    ttfts[url].append(state["ttft_ewma"])
+        return {url: (inflight[url], mean(ttfts[url]) if ttfts[url] else None) for url in {*inflight, *ttfts}}
+
+    def ranked(self) -> List[BackendState]:
+        """Return the backends to try, best first: the healthy ones, or all of them if none is."""
+        healthy = [b for b in self.backends if b.healthy]
+        remote = self.remote_load()
+
+        def key(backend: BackendState) -> Tuple[float, int]:
+            """Expected wait, then in-flight requests: ties between unmeasured backends go to the least busy one."""
+            others, ttft = remote.get(backend.url, (0, None))
+            return backend.expected_wait(others, ttft), backend.inflight + others
+
+        return sorted(healthy or self.backends, key=key)
+
+    def acquire(self, backend: BackendState) -> None:
+        """Count a request starting on ``backend``."""
+        backend.inflight += 1
+        self._publish()
+
+    def release(self, backend: BackendState) -> None:
+        """Count a request on ``backend`` as finished."""
+        backend.inflight -= 1
+        self._publish()
+
+    def _publish(self) -> None:
+        """Write the snapshot now, so other processes see a change before the next periodic publish."""
+        if self.board is None:
+            return
+        try:
+            # a few hundred bytes; cheap next to the request it accounts for
+            self.board.publish(self.snapshot())
+        except OSError as e:
+            logger.debug("Could not publish LLM backend state to %s: %s", self.board.directory, e)
+
+    def record_ttft(self, backend: BackendState, seconds: float) -> None:
+        """Fold one time-to-first-token sample into the backend's EWMA."""
+        if backend.ttft_ewma is None:
+            backend.ttft_ewma = seconds
+        else:
+            backend.ttft_ewma += self.ewma_alpha * (seconds - backend.ttft_ewma)
+
+    def record_success(self, backend: BackendState) -> None:
+        """Reset the failure count, restoring the backend if it was ejected."""
+        backend.failures = 0
+        if not backend.healthy:
+            backend.healthy = True
+            logger.info("LLM backend %s restored", backend.url)
+
+    def record_failure(self, backend: BackendState, error: BaseException) -> None:
+        """Count a failure and eject the backend after ``eject_after`` in a row."""
+        backend.failures += 1
+        if backend.healthy and backend.failures >= self.eject_after:
+            backend.healthy = False
+            logger.warning("LLM backend %s ejected after %d failures: %r", backend.url, backend.failures, error)
+
+    async def probe(self, check: Callable[[str], Awaitable[object]]) -> None:
+        """Run ``check(url)`` against every backend once and update their health."""
+        async def one(backend: BackendState) -> None:
+            try:
+                await asyncio.wait_for(check(backend.url), self.probe_timeout)
+            except Exception as e:
+                # a failed probe ejects at once: no user request is needed to find a dead backend
+                backend.failures = max(backend.failures, self.eject_after - 1)
+                self.record_failure(backend, e)
+            else:
+                self.record_success(backend)
+
+        await asyncio.gather(*(one(b) for b in self.backends))
+
+    def start_health_checks(self, check: Callable[[str], Awaitable[object]]) -> None:
+        """Probe all backends every ``probe_interval`` on the running loop, once per loop."""
+        loop = asyncio.get_running_loop()
+        if self.probe_interval <= 0:
+            return
+        if self._probe_task is not None and not self._probe_task.done() and self._probe_task.get_loop() is loop:
+            return
+
+        async def run() -> None:
+            while True:
+                await self.probe(check)
+                await asyncio.sleep(self.probe_interval)
+
+        self._probe_task = loop.create_task(run())
+
+
+class RoutingLLM(llm.LLM):
+    """
+    LiveKit LLM that routes each request to the best backend of a pool.
+
+    Attributes:
+        pool: Shared backend state.
+
+    Example:
+        >>> llm = RoutingLLM(pool, lambda url: openai.LLM(model="gemma3:4b", client=registry.openai_client(url)))
+        >>> llm.on("metrics_collected", agent_metrics.record_llm)
+
+    See Also:
+        docs/services/agent.md#llm-routing
+    """
+
+    def __init__(self, pool: LLMBackendPool, make_llm: Callable[[str], llm.LLM]) -> None:
+        """
+        Args:
+            pool: Backends to route across, usually shared per process.
+            make_llm: Builds the plugin LLM that talks to one base URL.
+        """
+        super().__init__()
+        self.pool = pool
+        self._llms = {backend.url: make_llm(backend.url) for backend in pool.backends}
+
+    @property
+    def model(self) -> str:
+        return next(iter(self._llms.values())).model
+
+    def chat(
+        self,
+        *,
+        chat_ctx: llm.ChatContext,
+        tools: Optional[list] = None,
+        conn_options: APIConnectOptions = DEFAULT_API_CONNECT_OPTIONS,
+        **kwargs,
+    ) -> "RoutingLLMStream":
+        return RoutingLLMStream(self, chat_ctx=chat_ctx, tools=tools, conn_options=conn_options, kwargs=kwargs)
+
+    async def aclose(self) -> None:
+        for inner in self._llms.values():
+            await inner.aclose()
+
+
+class RoutingLLMStream(llm.LLMStream):
+    """One routed request; forwards the chunks of whichever backend answers."""
+
+    def __init__(
+        self,
+        router: RoutingLLM,
+        *,
+        chat_ctx: llm.ChatContext,
+        tools: Optional[list],
+        conn_options: APIConnectOptions,
+        kwargs: Dict,
+    ) -> None:
+        super().__init__(router, chat_ctx=chat_ctx, tools=tools or [], conn_options=conn_options)
+        self._router = router
+        self._kwargs = kwargs
+
+    async def _run(self) -> None:
+        pool = self._router.pool
+        candidates = pool.ranked()
+        last_error: Optional[BaseException] = None
+        for attempt, backend in enumerate(candidates):
+            # the last candidate gets unlimited time: a slow answer beats none
+            is_last = attempt == len(candidates) - 1
+            deadline = None if is_last or pool.ttft_deadline <= 0 else pool.ttft_deadline
+            started = [False]
+            try:
+                await self._stream_from(backend, deadline, started)
+                return
+            except TTFTDeadlineExceeded as e:
+                logger.warning("No first token from %s within %.1fs, retrying on another backend", backend.url, deadline)
+                last_error = e
+            except APIError as e:
+                pool.record_failure(backend, e)
+                if started[0]:
+                    # part of the reply is out: a retry elsewhere would repeat it
+                    raise APIConnectionError(f"LLM backend {backend.url} failed mid-reply", retryable=False) from e
+                last_error = e
+        raise APIConnectionError(f"All LLM backends failed, last error: {last_error!r}")
+
+    async def _stream_from(self, backend: BackendState, deadline: Optional[float], started: List[bool]) -> None:
+        """Forward one backend's stream, enforcing ``deadline`` on the first chunk."""
+        pool = self._router.pool
+        inner = self._router._llms[backend.url]
+        pool.acquire(backend)
+        start = time.perf_counter()
+        try:
+            async with inner.chat(
+                chat_ctx=self._chat_ctx,
+                tools=self._tools,
+                # failover is handled here, not by retrying the same backend
+                conn_options=APIConnectOptions(
+                    max_retry=0, retry_interval=self._conn_options.retry_interval, timeout=self._conn_options.timeout
+                ),
+                **self._kwargs,
+            ) as stream:
+                chunks = stream.__aiter__()
+                try:
+                    first = await asyncio.wait_for(chunks.__anext__(), deadline)
+                except asyncio.TimeoutError:
+                    # the real TTFT is unknown but above the deadline: count it as twice
+                    # the deadline, so a slow backend ranks lower without being ejected
+                    pool.record_ttft(backend, 2 * deadline)
+                    raise TTFTDeadlineExceeded() from None
+                except StopAsyncIteration:
+                    pool.record_success(backend)
+                    return
+                pool.record_ttft(backend, time.perf_counter() - start)
+                started[0] = True
+                self._event_ch.send_nowait(first)
+                async for chunk in chunks:
+                    self._event_ch.send_nowait(chunk)
+            pool.record_success(backend)
+        finally:
+            pool.release(backend)
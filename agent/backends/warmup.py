@@ -0,0 +1,200 @@
+"""
+Model warm-up for the whisper, ollama and kokoro backends.
+
+The first request after a container starts pays for loading weights: ollama
+loads gemma3:4b into memory, whisper loads its model, kokoro its voice. That
+cost used to land on the first user's first turn. ``warm_backends`` sends a
+minimal request to each backend twice, in parallel across backends, from
+the main worker process before ``cli.run_app`` registers the worker. The
+first (cold) call loads the model. The second (warm) call measures what a
+turn pays afterwards. The difference is reported as time saved.
+
+For ollama, the model is also pinned with ``keep_alive`` through its native
+``/api/generate`` endpoint, so it is not unloaded between calls. The
+OpenAI-compatible endpoint does not accept that option. Backends without
+``/api/generate`` are only warmed.
+
+Uses the standard library only. It runs before any event loop exists, and
+every failure is logged and reported without raising.
+
+See: docs/services/agent.md#prewarm-and-warm-up
+"""
+
+import http.client
+import io
+import json
+import logging
+import time
+import urllib.request
+import uuid
+import wave
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Sequence, Union
+
+logger = logging.getLogger("local-agent")
+
+WARMUP_TEXT = "Hi."
+
+
+@dataclass
+class WarmupResult:
+    """Cold and warm latency of one backend, in seconds."""
+
+    service: str
+    url: str
+    cold: Optional[float] = None
+    warm: Optional[float] = None
+    error: Optional[str] = None
+
+    @property
+    def saved(self) -> Optional[float]:
+        """Seconds the first turn no longer spends waiting for the model to load."""
+        if self.cold is None or self.warm is None:
+            return None
+        return max(0.0, self.cold - self.warm)
+
+
+def _post(url: str, body: bytes, content_type: str, timeout: float) -> bytes:
+    request = urllib.request.Request(url, data=body, headers={"Content-Type": content_type})
+    with urllib.request.urlopen(request, timeout=timeout) as resp:
+        return resp.read()
+
+
+def _post_json(url: str, payload: dict, timeout: float) -> bytes:
+    return _post(url, json.dumps(payload).encode(), "application/json", timeout)
+
+
+def _silent_wav(seconds: float = 0.5, sample_rate: int = 16000) -> bytes:
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(sample_rate)
+        w.writeframes(b"\x00\x00" * int(seconds * sample_rate))
+    return buf.getvalue()
+
+
+def _multipart(fields: dict, filename: str, content: bytes) -> tuple:
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+        )
+    parts.append(
+        f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+        f"Content-Type: audio/wav\r\n\r\n".encode() + content + b"\r\n"
+    )
+    parts.append(f"--{boundary}--\r\n".encode())
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+
+def parse_keep_alive(value: str) -> Union[int, str]:
+    """Return ``keep_alive`` the way ollama expects it: seconds as int, or a duration like ``"30m"``."""
+    try:
+        return int(value)
+    except ValueError:
+        return value
+
+
+def pin_ollama_model(base_url: str, model: str, keep_alive: Union[int, str], timeout: float) -> bool:
+    """
+    Load ``model`` and keep it resident using ollama's native API.
+
+    Args:
+        base_url: OpenAI-compatible base URL, e.g. ``http://ollama:11434/v1``.
+        model: Model to pin.
+        keep_alive: Seconds (``-1`` = forever) or a duration string.
+        timeout: Request timeout in seconds.
+
+    Returns:
+        False if the backend has no ``/api/generate`` (not ollama) or failed.
+    """
+    root = base_url.rstrip("/")
+    if root.endswith("/v1"):
+        root = root[:-3]
+    try:
+        _post_json(f"{root}/api/generate", {"model": model, "keep_alive": keep_alive}, timeout)
+        return True
+    except (OSError, http.client.HTTPException) as e:  # URLError, HTTPError, timeouts, garbled replies
+        logger.debug("keep_alive pin of %s at %s failed: %r", model, root, e)
+        return False
+
+
+def _timed_twice(result: WarmupResult, call: Callable[[], object]) -> WarmupResult:
+    try:
+        start = time.perf_counter()
+        call()
+        result.cold = time.perf_counter() - start
+        start = time.perf_counter()
+        call()
+        result.warm = time.perf_counter() - start
+    except (OSError, http.client.HTTPException) as e:  # URLError, HTTPError, timeouts, garbled replies
+        result.error = repr(e)
+    return result
+
+
+def warm_llm(base_url: str, model: str, keep_alive: Union[int, str], timeout: float) -> WarmupResult:
+    """Warm the LLM with a one-token completion, then pin it with ``keep_alive``."""
+    url = f"{base_url.rstrip('/')}/chat/completions"
+    payload = {"model": model, "messages": [{"role": "user", "content": WARMUP_TEXT}], "max_tokens": 1}
+    result = _timed_twice(WarmupResult("llm", base_url), lambda: _post_json(url, payload, timeout))
+    if result.error is None:
+        pin_ollama_model(base_url, model, keep_alive, timeout)
+    return result
+
+
+def warm_stt(base_url: str, model: str, timeout: float) -> WarmupResult:
+    """Warm the STT by transcribing half a second of silence."""
+    url = f"{base_url.rstrip('/')}/audio/transcriptions"
+    body, content_type = _multipart({"model": model}, "warmup.wav", _silent_wav())
+    return _timed_twice(WarmupResult("stt", base_url), lambda: _post(url, body, content_type, timeout))
+
+
+def warm_tts(base_url: str, model: str, voice: str, timeout: float) -> WarmupResult:
+    """Warm the TTS by synthesizing a short word with the configured voice."""
+    url = f"{base_url.rstrip('/')}/audio/speech"
+    payload = {"model": model, "voice": voice, "input": WARMUP_TEXT, "response_format": "wav"}
+    return _timed_twice(WarmupResult("tts", base_url), lambda: _post_json(url, payload, timeout))
+
+
+def warm_backends(
+    stt: tuple, llms: Sequence[tuple], tts: tuple, keep_alive: Union[int, str] = -1, timeout: float = 120.0
+) -> List[WarmupResult]:
+    """
+    Load the models of all three backends in parallel and log the time saved.
+
+    Args:
+        stt: ``(base_url, model)`` of the speech-to-text backend.
+        llms: ``(base_url, model)`` of each LLM backend.
+        tts: ``(base_url, model, voice)`` of the text-to-speech backend.
+        keep_alive: Ollama ``keep_alive`` for the LLM.
+        timeout: Per-request timeout; cold model loads can take a while.
+
+    Returns:
+        One :class:`WarmupResult` per backend, in STT, LLM, TTS order.
+    """
+    with ThreadPoolExecutor(max_workers=2 + len(llms), thread_name_prefix="warmup") as pool:
+        futures = [
+            pool.submit(warm_stt, *stt, timeout),
+            *(pool.submit(warm_llm, *llm, keep_alive, timeout) for llm in llms),
+            pool.submit(warm_tts, *tts, timeout),
+        ]
+        results = [f.result() for f in futures]
+    log_report(results)
+    return results
+
+
+def log_report(results: List[WarmupResult]) -> None:
+    """Log one line per backend with its cold and warm latency."""
+    for r in results:
+        if r.error is not None:
+            logger.warning("Warm-up of %s at %s failed: %s", r.service, r.url, r.error)
+        else:
+            logger.info(
+                "Warmed %s at %s: cold %.0f ms, warm %.0f ms, %.0f ms saved on the first turn",
+                r.service, r.url, r.cold * 1000, r.warm * 1000, r.saved * 1000,
+            )
+    total = sum(r.saved for r in results if r.saved is not None)
+    logger.info("Backend warm-up saved %.2fs of first-turn latency", total)
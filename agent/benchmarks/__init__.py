@@ -0,0 +1,9 @@
+"""
+Benchmarks for the Agent service.
+
+Each module is a standalone script run from the ``agent`` directory, for
+example ``python -m benchmarks.ann_report``, and prints a human-readable
+table plus optional machine-readable JSON for comparing commits.
+
+See: docs/services/agent.md#benchmarks
+"""
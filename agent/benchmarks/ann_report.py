@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Recall-vs-latency report for the RAG index backends.
+
+Builds every backend from ``rag.indexes`` over the same embedding matrix,
+sweeps its query-time parameter and reports recall@k against exact flat
+search, single-query latency (the way ``rag_lookup`` issues queries), build
+time and serialized index size. Operators use it to pick ``RAG_INDEX_TYPE``
+and its parameters for their corpus.
+
+Usage Examples:
+  python -m benchmarks.ann_report --embeddings ~/.cache/local-voice-ai/rag/all-MiniLM-L6-v2/embeddings.npy
+  python -m benchmarks.ann_report --synthetic 200000 --dim 384 --json ann.json
+
+See: docs/services/agent.md#index-backends
+"""
+
+import argparse
+import json
+import sys
+import time
+from dataclasses import replace
+from typing import Dict, List
+
+import faiss
+import numpy as np
+
+from rag.indexes import IndexSpec, build_index, configure_search, effective_spec
+
+# Query-time parameter sweep per backend: (IndexSpec field, values)
+SWEEPS = {
+    "flat": ("nprobe", [0]),
+    "ivf_flat": ("nprobe", [1, 4, 8, 16, 32]),
+    "hnsw": ("ef_search", [16, 32, 64, 128]),
+    "ivf_pq": ("nprobe", [1, 4, 8, 16, 32]),
+}
+
+
+def synthetic_embeddings(n: int, dim: int, seed: int = 0) -> np.ndarray:
+    """
+    Generate clustered vectors that resemble sentence embeddings.
+
+    Uniform random vectors have no neighbourhood structure and make every
+    ANN index look bad; points drawn around a few hundred centres are closer
+    to a real corpus of related passages.
+    """
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(max(1, n // 500), dim)).astype(np.float32)
+    points = centres[rng.integers(0, len(centres), size=n)]
+    points += 0.35 * rng.normal(size=(n, dim)).astype(np.float32)
+    return points
+
+
+def make_queries(embeddings: np.ndarray, count: int, seed: int = 1) -> np.ndarray:
+    """Perturb random corpus rows to stand in for user query embeddings."""
+    rng = np.random.default_rng(seed)
+    rows = embeddings[rng.integers(0, len(embeddings), size=count)]
+    noise = rng.normal(scale=0.1 * float(np.std(embeddings)), size=rows.shape)
+    return np.ascontiguousarray(rows + noise, dtype=np.float32)
+
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    """Fraction of the exact top-k ids that the index also returned."""
+    hits = sum(len(set(f[f >= 0]) & set(t)) for f, t in zip(found, truth))
+    return hits / truth.size
+
+
+def time_queries(index: faiss.Index, queries: np.ndarray, k: int) -> Dict[str, float]:
+    """Run one query at a time and return latency percentiles in ms."""
+    latencies = []
+    found = np.empty((len(queries), k), dtype=np.int64)
+    for i, q in enumerate(queries):
+        start = time.perf_counter()
+        _, ids = index.search(q[None, :], k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        found[i] = ids[0]
+    lat = np.array(latencies)
+    return {
+        "found": found,
+        "p50_ms": float(np.percentile(lat, 50)),
+        "p95_ms": float(np.percentile(lat, 95)),
+        "mean_ms": float(lat.mean()),
+    }
+
+
+def run_report(embeddings: np.ndarray, queries: np.ndarray, k: int, base: IndexSpec) -> List[dict]:
+    """
+    Build every backend and measure it against exact search.
+
+    Args:
+        embeddings: Corpus matrix of shape ``(n, dim)``.
+        queries: Query matrix of shape ``(q, dim)``.
+        k: Neighbours per query, normally ``RAG_TOP_K``.
+        base: Build parameters shared by all backends.
+
+    Returns:
+        One result row per backend and query-time parameter value.
+    """
+    exact = faiss.IndexFlatL2(embeddings.shape[1])
+    exact.add(embeddings)
+    _, truth = exact.search(queries, k)
+
+    rows = []
+    for kind, (param, values) in SWEEPS.items():
+        spec = replace(base, kind=kind)
+        if effective_spec(spec, len(embeddings)).kind != kind:
+            print(f"  skipping {kind}: corpus too small to train it", file=sys.stderr)
+            continue
+        start = time.perf_counter()
+        index = build_index(spec, embeddings)
+        build_s = time.perf_counter() - start
+        size_mb = faiss.serialize_index(index).nbytes / 1e6
+        for value in values:
+            tuned = replace(spec, **{param: value}) if kind != "flat" else spec
+            configure_search(index, tuned)
+            timing = time_queries(index, queries, k)
+            rows.append({
+                "index": tuned.key,
+                "param": f"{param}={value}" if kind != "flat" else "-",
+                "recall_at_k": recall_at_k(timing.pop("found"), truth),
+                "build_s": build_s,
+                "size_mb": size_mb,
+                **timing,
+            })
+    return rows
+
+
+def print_table(rows: List[dict], n: int, k: int) -> None:
+    """Print the report as an aligned text table."""
+    print(f"\nANN report: {n} vectors, recall@{k} vs exact flat search\n")
+    print(f"{'index':<34} {'param':<14} {'recall':>7} {'p50 ms':>8} {'p95 ms':>8} {'build s':>8} {'MB':>8}")
+    for r in rows:
+        print(
+            f"{r['index']:<34} {r['param']:<14} {r['recall_at_k']:>7.3f} {r['p50_ms']:>8.3f} "
+            f"{r['p95_ms']:>8.3f} {r['build_s']:>8.2f} {r['size_mb']:>8.1f}"
+        )
+
+
+def main() -> None:
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description="Compare RAG index backends")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--embeddings", help="Path to an embeddings.npy from the RAG cache")
+    source.add_argument("--synthetic", type=int, help="Number of synthetic vectors to generate")
+    parser.add_argument("--dim", type=int, default=384, help="Synthetic vector dimension")
+    parser.add_argument("--queries", type=int, default=500, help="Number of queries")
+    parser.add_argument("-k", type=int, default=8, help="Neighbours per query (RAG_TOP_K)")
+    parser.add_argument("--nlist", type=int, default=0, help="IVF cells (0 = 4*sqrt(n))")
+    parser.add_argument("--hnsw-m", type=int, default=32, help="HNSW graph degree")
+    parser.add_argument("--pq-m", type=int, default=16, help="IVF-PQ sub-quantizers")
+    parser.add_argument("--json", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    if args.embeddings:
+        embeddings = np.ascontiguousarray(np.load(args.embeddings), dtype=np.float32)
+    else:
+        embeddings = synthetic_embeddings(args.synthetic, args.dim)
+    queries = make_queries(embeddings, args.queries)
+    base = IndexSpec(nlist=args.nlist, hnsw_m=args.hnsw_m, pq_m=args.pq_m)
+
+    rows = run_report(embeddings, queries, args.k, base)
+    print_table(rows, len(embeddings), args.k)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"vectors": len(embeddings), "k": args.k, "results": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Compare the embedding backends: import time, load time, RSS and latency.
+
+Every backend is measured in a fresh Python subprocess, so import time and
+resident memory are what an agent worker would actually pay. The parent
+process then checks that the backends produce compatible embeddings
+(cosine similarity of the same texts), which is what allows an index built
+with one backend to be queried with the other.
+
+Usage Examples:
+  python -m benchmarks.embedding_backends
+  python -m benchmarks.embedding_backends --backends onnx --queries 500 --json emb.json
+
+See: docs/services/agent.md#embedding-backends
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+import numpy as np
+
+AGENT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SAMPLE_QUERIES = [
+    "what can you do",
+    "what are you able to do",
+    "which model do you use for speech recognition",
+    "how do you turn text into speech",
+    "what language model is running",
+    "tell me about the embedding model used for retrieval",
+    "error code 503 when connecting to ollama",
+    "can I change the voice",
+]
+
+
+def _rss_mb() -> float:
+    """Return the current resident set size of this process in MB."""
+    try:
+        with open("/proc/self/status", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _child(backend: str, model: str, queries: int, batch: int, out_path: str) -> None:
+    """Measure one backend inside this (fresh) process and print JSON."""
+    sys.path.insert(0, AGENT_DIR)
+    rss_start = _rss_mb()
+
+    start = time.perf_counter()
+    if backend == "onnx":
+        import onnxruntime  # noqa: F401
+        import tokenizers  # noqa: F401
+    else:
+        import sentence_transformers  # noqa: F401
+    import_s = time.perf_counter() - start
+
+    from rag.models import load_embedding_model
+
+    start = time.perf_counter()
+    embed_model = load_embedding_model(backend, model)
+    load_s = time.perf_counter() - start
+
+    embed_model.encode(["warm up"])
+    latencies = []
+    for i in range(queries):
+        text = SAMPLE_QUERIES[i % len(SAMPLE_QUERIES)]
+        t0 = time.perf_counter()
+        embed_model.encode([text])
+        latencies.append((time.perf_counter() - t0) * 1000)
+
+    texts = [SAMPLE_QUERIES[i % len(SAMPLE_QUERIES)] + f" {i}" for i in range(batch * 4)]
+    t0 = time.perf_counter()
+    for i in range(0, len(texts), batch):
+        embed_model.encode(texts[i : i + batch])
+    batch_tps = len(texts) / (time.perf_counter() - t0)
+
+    np.save(out_path, embed_model.encode(SAMPLE_QUERIES))
+    lat = np.array(latencies)
+    print(json.dumps({
+        "backend": backend,
+        "import_s": import_s,
+        "load_s": load_s,
+        "rss_mb": _rss_mb(),
+        "rss_delta_mb": _rss_mb() - rss_start,
+        "query_p50_ms": float(np.percentile(lat, 50)),
+        "query_p95_ms": float(np.percentile(lat, 95)),
+        f"batch{batch}_texts_per_s": batch_tps,
+    }))
+
+
+def run_backend(backend: str, model: str, queries: int, batch: int, out_path: str) -> Dict:
+    """Run :func:`_child` in a subprocess and return its measurements."""
+    cmd = [
+        sys.executable, "-m", "benchmarks.embedding_backends", "--child", backend,
+        "--model", model, "--queries", str(queries), "--batch", str(batch), "--out", out_path,
+    ]
+    proc = subprocess.run(cmd, cwd=AGENT_DIR, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"{backend} benchmark failed:\n{proc.stderr}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description="Compare embedding backends")
+    parser.add_argument("--backends", nargs="+", default=["sentence-transformers", "onnx"])
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--queries", type=int, default=200, help="Single-query encodes to time")
+    parser.add_argument("--batch", type=int, default=32, help="Batch size for throughput")
+    parser.add_argument("--json", help="Write the results as JSON to this file")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--out", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        _child(args.child, args.model, args.queries, args.batch, args.out)
+        return
+
+    results: List[Dict] = []
+    embeddings: Dict[str, np.ndarray] = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for backend in args.backends:
+            out_path = os.path.join(tmp, f"{backend}.npy")
+            results.append(run_backend(backend, args.model, args.queries, args.batch, out_path))
+            embeddings[backend] = np.load(out_path)
+
+    if len(embeddings) > 1:
+        reference, *others = args.backends
+        for other in others:
+            a, b = embeddings[reference], embeddings[other]
+            cos = np.sum(a * b, axis=1) / (np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1))
+            for r in results:
+                if r["backend"] == other:
+                    r[f"cosine_vs_{reference}_min"] = float(cos.min())
+                    r[f"cosine_vs_{reference}_mean"] = float(cos.mean())
+
+    batch_key = f"batch{args.batch}_texts_per_s"
+    print(f"\nEmbedding backends for {args.model}\n")
+    print(f"{'backend':<24} {'import s':>9} {'load s':>8} {'RSS MB':>8} {'p50 ms':>8} {'p95 ms':>8} {'texts/s':>9}")
+    for r in results:
+        print(
+            f"{r['backend']:<24} {r['import_s']:>9.2f} {r['load_s']:>8.2f} {r['rss_mb']:>8.0f} "
+            f"{r['query_p50_ms']:>8.2f} {r['query_p95_ms']:>8.2f} {r[batch_key]:>9.0f}"
+        )
+        for key, value in r.items():
+            if key.startswith("cosine_vs_"):
+                print(f"  {key}: {value:.4f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"model": args.model, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+Local stand-ins for the whisper, ollama and kokoro services.
+
+Each fake speaks the subset of the OpenAI-compatible API that the LiveKit
+plugins in ``LocalAgent`` use, and delays its answers according to a
+``LatencyProfile``. Together they let ``benchmarks.turn_replay`` measure
+the agent's own code without GPUs or containers:
+
+``POST /v1/audio/transcriptions``
+    Returns the transcript registered for the uploaded audio (matched by a
+    hash of its PCM samples) after ``stt_base + stt_rtf * audio_seconds``.
+``POST /v1/chat/completions``
+    Streams a canned reply as SSE chunks. The first token arrives after
+    ``llm_ttft + llm_prefill_per_token * prompt_tokens``, and each later
+    token after ``llm_token_interval``.
+``POST /v1/audio/speech``
+    Returns silent 24 kHz WAV audio, ~60 ms per character, after
+    ``tts_base + tts_per_char * characters``.
+
+Every server runs on its own daemon thread with a thread per request, so
+concurrent sessions overlap the way they do against the real services.
+
+Usage Examples:
+  python -m benchmarks.fake_services --profile gpu   # serve until Ctrl-C
+
+See: docs/services/agent.md#benchmarks
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import random
+import re
+import threading
+import time
+import wave
+from dataclasses import asdict, dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+
+TTS_SAMPLE_RATE = 24000
+TTS_SECONDS_PER_CHAR = 0.06
+
+DEFAULT_REPLY = (
+    "Sure, I can help with that. The agent runs whisper for speech recognition, "
+    "gemma three on ollama for replies and kokoro for the voice. Is there anything else?"
+)
+
+
+@dataclass(frozen=True)
+class LatencyProfile:
+    """Simulated service latencies, in seconds."""
+
+    stt_base: float = 0.0
+    stt_rtf: float = 0.0
+    llm_ttft: float = 0.0
+    llm_prefill_per_token: float = 0.0
+    llm_token_interval: float = 0.0
+    tts_base: float = 0.0
+    tts_per_char: float = 0.0
+    jitter: float = 0.0
+
+    def delay(self, seconds: float) -> None:
+        """Sleep ``seconds`` scaled by a random factor within ``±jitter``."""
+        if seconds > 0:
+            time.sleep(seconds * random.uniform(1 - self.jitter, 1 + self.jitter))
+
+
+PROFILES: Dict[str, LatencyProfile] = {
+    # no service latency: measures the agent's own overhead
+    "instant": LatencyProfile(),
+    # roughly the docker-compose stack on a consumer GPU
+    "gpu": LatencyProfile(
+        stt_base=0.12, stt_rtf=0.05, llm_ttft=0.15, llm_prefill_per_token=0.0002,
+        llm_token_interval=0.015, tts_base=0.08, tts_per_char=0.002, jitter=0.2,
+    ),
+    # the same stack on CPU only
+    "cpu": LatencyProfile(
+        stt_base=0.3, stt_rtf=0.3, llm_ttft=0.5, llm_prefill_per_token=0.002,
+        llm_token_interval=0.07, tts_base=0.25, tts_per_char=0.012, jitter=0.2,
+    ),
+}
+
+
+def load_profile(name_or_path: str) -> LatencyProfile:
+    """Return a built-in profile, or load one from a JSON file of its fields."""
+    if name_or_path in PROFILES:
+        return PROFILES[name_or_path]
+    with open(name_or_path, encoding="utf-8") as f:
+        return LatencyProfile(**json.load(f))
+
+
+def audio_key(pcm: bytes) -> str:
+    """Return the key under which a transcript is registered for ``pcm``."""
+    return hashlib.sha256(pcm).hexdigest()
+
+
+def silent_wav(seconds: float, sample_rate: int = TTS_SAMPLE_RATE) -> bytes:
+    """Return a mono 16-bit WAV file of silence."""
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(sample_rate)
+        w.writeframes(b"\x00\x00" * int(seconds * sample_rate))
+    return buf.getvalue()
+
+
+def _read_wav(data: bytes) -> Tuple[bytes, float]:
+    """Return the PCM samples and duration of a WAV file (empty if unparsable)."""
+    try:
+        with wave.open(io.BytesIO(data)) as w:
+            return w.readframes(w.getnframes()), w.getnframes() / w.getframerate()
+    except (wave.Error, EOFError):
+        return b"", 0.0
+
+
+def _multipart_file(body: bytes, content_type: str) -> bytes:
+    """Return the content of the ``file`` field of a multipart body."""
+    match = re.search(r"boundary=\"?([^\";]+)\"?", content_type)
+    if not match:
+        return b""
+    for part in body.split(b"--" + match.group(1).encode()):
+        head, sep, content = part.partition(b"\r\n\r\n")
+        if sep and b'name="file"' in head:
+            return content[:-2] if content.endswith(b"\r\n") else content
+    return b""
+
+
+class FakeServices:
+    """
+    Fake STT, LLM and TTS servers sharing one latency profile.
+
+    Attributes:
+        profile: Latencies applied to every request.
+        transcripts: PCM hash -> transcript returned by the STT.
+        reply: Text streamed by the LLM.
+        requests: Request counts per service.
+
+    Example:
+        >>> services = FakeServices(PROFILES["gpu"])
+        >>> services.start()
+        >>> services.base_url("llm")
+        'http://127.0.0.1:54321/v1'
+    """
+
+    def __init__(self, profile: LatencyProfile, reply: str = DEFAULT_REPLY) -> None:
+        """Create the services; call :meth:`start` to listen."""
+        self.profile = profile
+        self.reply = reply
+        self.transcripts: Dict[str, str] = {}
+        self.requests = {"stt": 0, "llm": 0, "tts": 0}
+        self._lock = threading.Lock()
+        self._servers: Dict[str, ThreadingHTTPServer] = {}
+
+    def register(self, pcm: bytes, transcript: str) -> None:
+        """Make the STT return ``transcript`` for uploads of the samples ``pcm``."""
+        self.transcripts[audio_key(pcm)] = transcript
+
+    def base_url(self, service: str) -> str:
+        """Return the OpenAI-style base URL of ``"stt"``, ``"llm"`` or ``"tts"``."""
+        host, port = self._servers[service].server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self, host: str = "127.0.0.1", ports: Optional[Dict[str, int]] = None) -> None:
+        """Start the three servers on ``ports`` (ephemeral by default)."""
+        ports = ports or {}
+        for service in ("stt", "llm", "tts"):
+            server = ThreadingHTTPServer((host, ports.get(service, 0)), self._handler(service))
+            server.daemon_threads = True
+            threading.Thread(target=server.serve_forever, name=f"fake-{service}", daemon=True).start()
+            self._servers[service] = server
+
+    def stop(self) -> None:
+        """Shut all servers down."""
+        for server in self._servers.values():
+            server.shutdown()
+            server.server_close()
+        self._servers.clear()
+
+    def _count(self, service: str) -> None:
+        with self._lock:
+            self.requests[service] += 1
+
+    def _handler(self, service: str):
+        """Build the request handler class of one service."""
+        services = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args) -> None:
+                pass
+
+            def _body(self) -> bytes:
+                return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+            def _send(self, status: int, body: bytes, content_type: str) -> None:
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self) -> None:
+                # /v1/models doubles as a health check
+                self._send(200, json.dumps({"object": "list", "data": []}).encode(), "application/json")
+
+            def do_POST(self) -> None:
+                services._count(service)
+                body = self._body()
+                try:
+                    if service == "stt":
+                        services._transcribe(self, body)
+                    elif service == "llm":
+                        services._complete(self, json.loads(body or b"{}"))
+                    else:
+                        services._speak(self, json.loads(body or b"{}"))
+                except (BrokenPipeError, ConnectionResetError):
+                    # the client cancelled, e.g. an interrupted reply
+                    pass
+
+        return Handler
+
+    def _transcribe(self, handler, body: bytes) -> None:
+        """Handle ``/v1/audio/transcriptions``."""
+        pcm, seconds = _read_wav(_multipart_file(body, handler.headers.get("Content-Type", "")))
+        self.profile.delay(self.profile.stt_base + self.profile.stt_rtf * seconds)
+        text = self.transcripts.get(audio_key(pcm), "hello")
+        handler._send(200, json.dumps({"text": text}).encode(), "application/json")
+
+    def _complete(self, handler, request: Dict) -> None:
+        """Handle ``/v1/chat/completions``, streaming or not."""
+        prompt = " ".join(str(m.get("content", "")) for m in request.get("messages", []))
+        prompt_tokens = max(1, len(prompt) // 4)
+        tokens = re.findall(r"\S+\s*", self.reply)
+        self.profile.delay(self.profile.llm_ttft + self.profile.llm_prefill_per_token * prompt_tokens)
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": len(tokens),
+            "total_tokens": prompt_tokens + len(tokens),
+        }
+        base = {"id": "chatcmpl-fake", "created": int(time.time()), "model": request.get("model", "fake")}
+
+        if not request.get("stream"):
+            for _ in tokens[1:]:
+                self.profile.delay(self.profile.llm_token_interval)
+            message = {"role": "assistant", "content": self.reply}
+            body = {**base, "object": "chat.completion", "usage": usage,
+                    "choices": [{"index": 0, "message": message, "finish_reason": "stop"}]}
+            handler._send(200, json.dumps(body).encode(), "application/json")
+            return
+
+        handler.send_response(200)
+        handler.send_header("Content-Type", "text/event-stream")
+        handler.send_header("Cache-Control", "no-cache")
+        handler.send_header("Connection", "close")
+        handler.end_headers()
+
+        def event(payload) -> None:
+            data = payload if isinstance(payload, str) else json.dumps({**base, **payload})
+            handler.wfile.write(f"data: {data}\n\n".encode())
+            handler.wfile.flush()
+
+        for i, token in enumerate(tokens):
+            if i:
+                self.profile.delay(self.profile.llm_token_interval)
+            delta = {"role": "assistant", "content": token} if i == 0 else {"content": token}
+            event({"object": "chat.completion.chunk",
+                   "choices": [{"index": 0, "delta": delta, "finish_reason": None}]})
+        event({"object": "chat.completion.chunk",
+               "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+        if (request.get("stream_options") or {}).get("include_usage"):
+            event({"object": "chat.completion.chunk", "choices": [], "usage": usage})
+        event("[DONE]")
+
+    def _speak(self, handler, request: Dict) -> None:
+        """Handle ``/v1/audio/speech``."""
+        text = str(request.get("input", ""))
+        self.profile.delay(self.profile.tts_base + self.profile.tts_per_char * len(text))
+        handler._send(200, silent_wav(len(text) * TTS_SECONDS_PER_CHAR), "audio/wav")
+
+
+def main() -> None:
+    """Serve the fakes on fixed ports until interrupted."""
+    parser = argparse.ArgumentParser(description="Fake OpenAI-compatible STT/LLM/TTS services")
+    parser.add_argument("--profile", default="gpu", help=f"One of {sorted(PROFILES)} or a JSON file")
+    parser.add_argument("--stt-port", type=int, default=8001)
+    parser.add_argument("--llm-port", type=int, default=8002)
+    parser.add_argument("--tts-port", type=int, default=8003)
+    args = parser.parse_args()
+
+    services = FakeServices(load_profile(args.profile))
+    services.start(ports={"stt": args.stt_port, "llm": args.llm_port, "tts": args.tts_port})
+    print(json.dumps({s: services.base_url(s) for s in ("stt", "llm", "tts")}))
+    print(json.dumps(asdict(services.profile)))
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        services.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Recall and latency of vector, BM25 and hybrid RAG retrieval.
+
+Runs the same queries through four retrieval modes over one corpus:
+
+``vector``
+    Embedding plus exact flat FAISS search, the retrieval before hybrid search.
+``bm25``
+    BM25 alone (``Retriever.lexical_search``).
+``hybrid``
+    Both, merged by reciprocal rank fusion (``Retriever.fuse``).
+``hybrid+fast``
+    What ``rag_lookup`` does with ``RAG_KEYWORD_FAST_PATH``: queries that
+    ``Retriever.keyword_match`` accepts skip the embedding.
+
+Latency covers the query embedding as well, since the embedding is the cost
+the fast path avoids. Queries are either labeled (``--queries``, one
+``{"query": "...", "source": "file.txt"}`` per line, relevant = any passage
+of that file) or generated from the corpus: a span of words cut from a
+random passage (``phrase``), or a short question around an identifier the
+passage contains, such as a model name or error code (``identifier``).
+
+Usage Examples:
+  python -m benchmarks.hybrid_report
+  python -m benchmarks.hybrid_report --docs ~/support-docs --queries labeled.jsonl --json hybrid.json
+
+See: docs/services/agent.md#hybrid-retrieval
+"""
+
+import argparse
+import json
+import random
+import re
+import time
+from typing import Callable, Dict, List, Sequence, Set, Tuple
+
+import numpy as np
+
+from config import (
+    DOCS_DIR, EMBED_BACKEND, EMBED_MODEL_NAME, EMBED_ONNX_FILE, EMBED_ONNX_MODEL_PATH,
+    EMBED_ONNX_THREADS, RAG_CHUNK_OVERLAP_TOKENS, RAG_CHUNK_TOKENS, RAG_CONTEXT_TOKENS,
+)
+from rag.corpus import Passage, ingest
+from rag.indexes import IndexSpec
+from rag.lexical import is_identifier, tokenize
+from rag.models import load_embedding_model
+from rag.retriever import build_retriever
+
+MODES = ["vector", "bm25", "hybrid", "hybrid+fast"]
+
+_WORD_RE = re.compile(r"\S+")
+
+# A query with its relevant passage ids and kind
+Query = Tuple[str, Set[int], str]
+
+
+def covering(passages: Sequence[Passage], source: str, start: int, end: int) -> Set[int]:
+    """Return the ids of the passages of ``source`` that contain ``[start, end)``."""
+    return {i for i, p in enumerate(passages) if p.source == source and p.start <= start and end <= p.end}
+
+
+def generate_queries(passages: Sequence[Passage], count: int, seed: int = 0) -> List[Query]:
+    """
+    Cut phrase and identifier queries out of random passages.
+
+    Args:
+        passages: The corpus.
+        count: Number of queries of each kind (fewer identifier queries if
+            the corpus has few identifiers).
+        seed: Random seed.
+
+    Returns:
+        ``(query, relevant_ids, kind)`` triples.
+    """
+    rng = random.Random(seed)
+    queries: List[Query] = []
+    for _ in range(count):
+        p = rng.choice(passages)
+        words = list(_WORD_RE.finditer(p.text))
+        if len(words) < 4:
+            continue
+        n = rng.randint(4, min(10, len(words)))
+        first = rng.randrange(len(words) - n + 1)
+        a, b = words[first].start(), words[first + n - 1].end()
+        queries.append((p.text[a:b], covering(passages, p.source, p.start + a, p.start + b), "phrase"))
+
+    spans = [
+        (i, m) for i, p in enumerate(passages)
+        for m in _WORD_RE.finditer(p.text)
+        if any(is_identifier(t) for t in tokenize(m.group()))
+    ]
+    for i, m in rng.sample(spans, min(count, len(spans))):
+        p = passages[i]
+        token = m.group().strip(".,;:!?()[]\"'")
+        a = p.text.index(token, m.start())
+        relevant = covering(passages, p.source, p.start + a, p.start + a + len(token))
+        # an identifier occurs in several places; all of them answer the query
+        relevant |= {j for j, q in enumerate(passages) if token in q.text}
+        queries.append((f"what do you know about {token}", relevant, "identifier"))
+    return queries
+
+
+def load_queries(path: str, passages: Sequence[Passage]) -> List[Query]:
+    """Read labeled queries; every passage of the labeled source is relevant."""
+    queries = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                row = json.loads(line)
+                relevant = {i for i, p in enumerate(passages) if p.source == row["source"]}
+                queries.append((row["query"], relevant, "labeled"))
+    return queries
+
+
+def run_mode(mode: str, retriever, encode: Callable, queries: Sequence[Query], k: int) -> Dict[str, Dict]:
+    """
+    Run every query through one mode.
+
+    Returns:
+        Per query kind (and ``all``): recall@k, MRR, latency percentiles and
+        the share of queries answered by the fast path.
+    """
+    per_kind: Dict[str, Dict[str, list]] = {}
+    for query, relevant, kind in queries:
+        fast = False
+        start = time.perf_counter()
+        if mode == "bm25":
+            hits = retriever.lexical_search(query)
+        else:
+            lexical = retriever.lexical_search(query) if mode != "vector" else None
+            if mode == "hybrid+fast" and retriever.keyword_match(query, lexical):
+                hits, fast = lexical, True
+            else:
+                hits = retriever.search(encode([query]))
+                if lexical is not None:
+                    hits = retriever.fuse(hits, lexical)
+        elapsed = (time.perf_counter() - start) * 1000
+
+        ranks = [rank for rank, (pid, _) in enumerate(hits[:k], start=1) if pid in relevant]
+        for key in (kind, "all"):
+            stats = per_kind.setdefault(key, {"hit": [], "rr": [], "ms": [], "fast": []})
+            stats["hit"].append(1.0 if ranks else 0.0)
+            stats["rr"].append(1.0 / ranks[0] if ranks else 0.0)
+            stats["ms"].append(elapsed)
+            stats["fast"].append(1.0 if fast else 0.0)
+
+    return {
+        kind: {
+            "queries": len(s["hit"]),
+            "recall_at_k": float(np.mean(s["hit"])),
+            "mrr": float(np.mean(s["rr"])),
+            "p50_ms": float(np.percentile(s["ms"], 50)),
+            "p95_ms": float(np.percentile(s["ms"], 95)),
+            "fast_path": float(np.mean(s["fast"])),
+        }
+        for kind, s in per_kind.items()
+    }
+
+
+def print_table(results: Dict[str, Dict[str, Dict]], passages: int, k: int) -> None:
+    """Print the report as an aligned text table."""
+    print(f"\nHybrid retrieval report: {passages} passages, recall@{k}\n")
+    print(f"{'mode':<12} {'queries':<11} {'n':>5} {'recall':>7} {'MRR':>6} {'p50 ms':>8} {'p95 ms':>8} {'fast':>6}")
+    for mode, kinds in results.items():
+        for kind, r in sorted(kinds.items()):
+            print(
+                f"{mode:<12} {kind:<11} {r['queries']:>5} {r['recall_at_k']:>7.3f} {r['mrr']:>6.3f} "
+                f"{r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f} {r['fast_path']:>6.0%}"
+            )
+
+
+def main() -> None:
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description="Compare vector, BM25 and hybrid RAG retrieval")
+    parser.add_argument("--docs", default=DOCS_DIR, help="Document directory (default: RAG_DOCS_DIR)")
+    parser.add_argument("--queries", help="Labeled queries as JSON lines; generated from the corpus if omitted")
+    parser.add_argument("--count", type=int, default=200, help="Generated queries of each kind")
+    parser.add_argument("-k", type=int, default=8, help="Results per query (RAG_TOP_K)")
+    parser.add_argument("--json", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    passages = ingest(args.docs, RAG_CHUNK_TOKENS, RAG_CHUNK_OVERLAP_TOKENS)
+    if not passages:
+        parser.error(f"no documents in {args.docs}")
+    model = load_embedding_model(
+        EMBED_BACKEND, EMBED_MODEL_NAME,
+        onnx_model_path=EMBED_ONNX_MODEL_PATH, onnx_file=EMBED_ONNX_FILE, onnx_threads=EMBED_ONNX_THREADS,
+    )
+    retriever = build_retriever(
+        passages, model.encode, model.dim, IndexSpec(), top_k=args.k, token_budget=RAG_CONTEXT_TOKENS
+    )
+    retriever.lexical
+
+    queries = load_queries(args.queries, passages) if args.queries else generate_queries(passages, args.count)
+    model.encode([queries[0][0]])  # first call pays one-off setup
+    results = {mode: run_mode(mode, retriever, model.encode, queries, args.k) for mode in MODES}
+    print_table(results, len(passages), args.k)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"passages": len(passages), "k": args.k, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Startup profile of an agent worker process.
+
+Every job process of ``cli.run_app`` imports ``myagent`` before it can take
+a job, so import time is paid once per process. This report imports the
+module in fresh interpreters with ``python -X importtime`` and prints:
+
+* the wall time of the import (median over ``--runs``),
+* the slowest top-level imports by cumulative time, i.e. what
+  ``myagent`` pulls in directly and everything below it,
+* the slowest individual modules by self time.
+
+With ``--ready``, it also measures how long the RAG loader thread started
+in prewarm takes to finish (embedding model, corpus, BM25 and reranker). That happens in the background and delays only the first
+RAG lookup, not the process start.
+
+Usage Examples:
+  python -m benchmarks.startup_report
+  python -m benchmarks.startup_report --runs 5 --json startup.json
+  python -m benchmarks.startup_report --ready --compare startup.json
+
+See: docs/services/agent.md#startup-time
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Optional
+
+AGENT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_LINE_RE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$")
+
+_READY_SCRIPT = """
+import time
+start = time.perf_counter()
+import {module}
+imported = time.perf_counter()
+{module}.start_rag_loading()
+if not {module}.rag_loading.wait():
+    raise SystemExit(f"load_rag failed: {{{module}.rag_loading.error!r}}")
+print(f"{{imported - start}} {{time.perf_counter() - imported}}")
+"""
+
+
+def parse_importtime(stderr: str) -> List[Dict]:
+    """
+    Parse ``-X importtime`` output.
+
+    Returns:
+        One row per imported module: ``module``, ``self_ms``,
+        ``cumulative_ms`` and nesting ``depth`` (0 = imported directly by
+        the profiled code).
+    """
+    rows = []
+    for line in stderr.splitlines():
+        m = _LINE_RE.match(line)
+        if m:
+            rows.append({
+                "module": m.group(4),
+                "self_ms": int(m.group(1)) / 1000,
+                "cumulative_ms": int(m.group(2)) / 1000,
+                "depth": len(m.group(3)) // 2,
+            })
+    return rows
+
+
+def profile_import(module: str) -> Dict:
+    """Import ``module`` in a fresh interpreter under ``-X importtime``."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=AGENT_DIR, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        tail = proc.stderr.strip().splitlines()[-1:] or ["no output"]
+        raise SystemExit(f"import {module} failed: {tail[0]}")
+    rows = parse_importtime(proc.stderr)
+    top = [r for r in rows if r["depth"] == 0]
+    return {"import_ms": sum(r["cumulative_ms"] for r in top), "modules": rows}
+
+
+def time_ready(module: str) -> Dict[str, float]:
+    """Return the import time and the time until RAG is loaded in a fresh process, in seconds."""
+    proc = subprocess.run(
+        [sys.executable, "-c", _READY_SCRIPT.format(module=module)],
+        cwd=AGENT_DIR, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise SystemExit(f"RAG loading failed: {proc.stderr.strip().splitlines()[-1:]}")
+    imported, ready = (float(v) for v in proc.stdout.split()[-2:])
+    return {"import_s": imported, "rag_ready_s": ready}
+
+
+def print_report(result: Dict, top: int) -> None:
+    """Print the report as aligned text tables."""
+    print(f"\nStartup report: import {result['module']}, {result['runs']} runs\n")
+    print(f"  import time (median)  {result['import_ms']:>9.1f} ms")
+    if result.get("rag_ready_s") is not None:
+        print(f"  RAG ready after       {result['rag_ready_s'] * 1000:>9.1f} ms (background)")
+
+    print(f"\n{'top-level import':<40} {'cumulative ms':>14}")
+    for r in result["top_level"][:top]:
+        print(f"{r['module']:<40} {r['cumulative_ms']:>14.1f}")
+    print(f"\n{'module':<40} {'self ms':>14}")
+    for r in result["slowest"][:top]:
+        print(f"{r['module']:<40} {r['self_ms']:>14.1f}")
+
+
+def print_comparison(result: Dict, baseline_path: str) -> None:
+    """Print the change of the headline numbers against a previous ``--json`` result."""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    print(f"\nChange vs {baseline_path} ({baseline.get('commit') or 'unknown commit'})")
+    for key, label in (("import_ms", "import"), ("rag_ready_s", "RAG ready")):
+        old, new = baseline.get(key), result.get(key)
+        if old and new is not None:
+            print(f"  {label}: {(new - old) / old * 100:+.1f}%")
+    before = {r["module"]: r["cumulative_ms"] for r in baseline.get("top_level", [])}
+    for r in result["top_level"]:
+        if r["module"] not in before:
+            print(f"  new top-level import: {r['module']} ({r['cumulative_ms']:.1f} ms)")
+    for module in sorted(set(before) - {r["module"] for r in result["top_level"]}):
+        print(f"  no longer imported at top level: {module} ({before[module]:.1f} ms)")
+
+
+def git_commit() -> Optional[str]:
+    """Return the current commit hash, if run inside a git checkout."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=AGENT_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main() -> None:
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description="Import-time profile of the agent worker")
+    parser.add_argument("--module", default="myagent", help="Module to import (default: myagent)")
+    parser.add_argument("--runs", type=int, default=3, help="Fresh interpreters to import in")
+    parser.add_argument("--top", type=int, default=15, help="Rows per table")
+    parser.add_argument("--ready", action="store_true", help="Also time the background RAG loading")
+    parser.add_argument("--json", help="Write the results as JSON to this file")
+    parser.add_argument("--compare", help="Previous --json result to compare against")
+    args = parser.parse_args()
+
+    runs = [profile_import(args.module) for _ in range(args.runs)]
+    median = sorted(runs, key=lambda r: r["import_ms"])[len(runs) // 2]
+    modules = median["modules"]
+    result = {
+        "commit": git_commit(),
+        "module": args.module,
+        "runs": args.runs,
+        "import_ms": statistics.median(r["import_ms"] for r in runs),
+        "rag_ready_s": time_ready(args.module)["rag_ready_s"] if args.ready else None,
+        "top_level": sorted(
+            ({"module": r["module"], "cumulative_ms": r["cumulative_ms"]} for r in modules if r["depth"] == 0),
+            key=lambda r: -r["cumulative_ms"],
+        ),
+        "slowest": sorted(
+            ({"module": r["module"], "self_ms": r["self_ms"]} for r in modules),
+            key=lambda r: -r["self_ms"],
+        )[: args.top],
+    }
+
+    print_report(result, args.top)
+    if args.compare:
+        print_comparison(result, args.compare)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+Offline replay benchmark of the full agent turn pipeline.
+
+Drives ``LocalAgent`` turn by turn without a LiveKit room or any model
+container. The whisper, ollama and kokoro services are replaced by
+``benchmarks.fake_services`` with a configurable latency profile. Each
+turn runs the same code path as a live call:
+
+1. ``agent.stt.recognize`` on the recorded audio (fake STT returns the
+   recorded transcript),
+2. ``agent.on_user_turn_completed`` (RAG lookup against the real corpus),
+3. ``agent.complete`` (reply cache, then the LLM; the part of
+   ``llm_node`` that needs no running session) streamed into
+   ``agent.tts_node`` (clause segmentation and pipelined synthesis against
+   the fake TTS).
+
+``--sessions 1 4 8`` runs every level with that many concurrent sessions
+in one process, sharing the embedding service and corpus like the sessions
+of one worker. Per level the report gives p50/p95/p99 of turn latency (end
+of user speech to last reply audio), time to first audio, STT, RAG and LLM
+TTFT, plus throughput in turns per second. ``--json`` writes the results
+for comparing commits with ``--compare``.
+
+Replay files are JSON lines of ``{"transcript": "...", "audio": "x.wav"}``.
+Without ``audio``, a silent clip of matching length is generated.
+
+Usage Examples:
+  python -m benchmarks.turn_replay --profile gpu --sessions 1 4 8 --json replay.json
+  python -m benchmarks.turn_replay --replay turns.jsonl --profile cpu --compare replay.json
+
+See: docs/services/agent.md#benchmarks
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+import wave
+from dataclasses import asdict
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from benchmarks.fake_services import PROFILES, FakeServices, load_profile
+
+AGENT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SAMPLE_TURNS = [
+    "what can you do",
+    "which model do you use for speech recognition",
+    "how do you turn text into speech",
+    "what language model is running and where",
+    "tell me about the embedding model used for retrieval",
+    "can I change the voice you speak with",
+]
+
+STT_SAMPLE_RATE = 16000
+SECONDS_PER_WORD = 0.35
+METRICS = ("turn_s", "ttfa_s", "stt_s", "rag_s", "llm_ttft_s")
+
+
+def load_turns(path: Optional[str]) -> List[Dict]:
+    """Return replay turns as dicts with ``transcript`` and ``pcm`` (16 kHz mono)."""
+    records = [{"transcript": t} for t in SAMPLE_TURNS]
+    if path:
+        with open(path, encoding="utf-8") as f:
+            records = [json.loads(line) for line in f if line.strip()]
+
+    turns = []
+    for i, record in enumerate(records):
+        if record.get("audio"):
+            with wave.open(os.path.join(os.path.dirname(path), record["audio"])) as w:
+                pcm, rate, channels = w.readframes(w.getnframes()), w.getframerate(), w.getnchannels()
+        else:
+            seconds = len(record["transcript"].split()) * SECONDS_PER_WORD
+            samples = np.zeros(int(seconds * STT_SAMPLE_RATE), dtype=np.int16)
+            samples[0] = i + 1  # distinct audio per turn, so transcripts can be told apart
+            pcm, rate, channels = samples.tobytes(), STT_SAMPLE_RATE, 1
+        turns.append({"transcript": record["transcript"], "pcm": pcm, "rate": rate, "channels": channels})
+    return turns
+
+
+def configure_environment(services: FakeServices) -> None:
+    """Point the agent at the fakes and turn off side effects, before importing it."""
+    os.environ.update({
+        "STT_BASE_URL": services.base_url("stt"),
+        "LLM_BASE_URL": services.base_url("llm"),
+        "TTS_BASE_URL": services.base_url("tts"),
+        "METRICS_PORT": "0",
+        "TRACE_EXPORT_PATH": "",
+        "TRACE_WATERFALL_LOG": "false",
+        "RAG_HOT_RELOAD": "false",
+        "RAG_SHARED_CORPUS": "false",
+    })
+    # replayed turns repeat, so caches would hide the service latencies unless asked for
+    os.environ.setdefault("TTS_CACHE_ENABLED", "false")
+    sys.path.insert(0, AGENT_DIR)
+
+
+def load_agent():
+    """Import ``myagent`` and load its RAG state the way a job process does."""
+    import myagent
+
+    # rag_lookup waits on rag_loading, not on load_rag() having run
+    myagent.start_rag_loading()
+    if not myagent.rag_loading.wait():
+        raise SystemExit(f"load_rag failed: {myagent.rag_loading.error!r}")
+    return myagent
+
+
+async def run_turn(agent, turn: Dict) -> Dict[str, float]:
+    """Run one user turn through ``agent`` and return its timings in seconds."""
+    from livekit import rtc
+    from livekit.agents import ChatContext, ModelSettings
+
+    frame = rtc.AudioFrame(
+        data=turn["pcm"],
+        sample_rate=turn["rate"],
+        num_channels=turn["channels"],
+        samples_per_channel=len(turn["pcm"]) // (2 * turn["channels"]),
+    )
+    timings: Dict[str, float] = {}
+
+    # t0 = end of the user's speech
+    t0 = time.perf_counter()
+    event = await agent.stt.recognize([frame])
+    text = event.alternatives[0].text if event.alternatives else turn["transcript"]
+    timings["stt_s"] = time.perf_counter() - t0
+
+    chat_ctx = ChatContext.empty()
+    chat_ctx.add_message(role="system", content=agent.instructions)
+    message = chat_ctx.add_message(role="user", content=text)
+    t_rag = time.perf_counter()
+    await agent.on_user_turn_completed(chat_ctx, message)
+    timings["rag_s"] = time.perf_counter() - t_rag
+
+    async def reply_text():
+        started = time.perf_counter()
+        async for content in agent.complete(chat_ctx):
+            timings.setdefault("llm_ttft_s", time.perf_counter() - started)
+            yield content
+
+    async for _ in agent.tts_node(reply_text(), ModelSettings()):
+        timings.setdefault("ttfa_s", time.perf_counter() - t0)
+    timings["turn_s"] = time.perf_counter() - t0
+    return timings
+
+
+async def run_level(agent_cls, turns: List[Dict], sessions: int, turns_per_session: int) -> Dict:
+    """Run ``sessions`` concurrent sessions and aggregate their turn timings."""
+    results: List[Dict[str, float]] = []
+    errors = 0
+
+    async def session(offset: int) -> None:
+        nonlocal errors
+        agent = agent_cls()
+        for i in range(turns_per_session):
+            try:
+                results.append(await run_turn(agent, turns[(offset + i) % len(turns)]))
+            except Exception as e:
+                errors += 1
+                print(f"turn failed: {e!r}", file=sys.stderr)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(session(s) for s in range(sessions)))
+    wall = time.perf_counter() - start
+
+    level = {"sessions": sessions, "turns": len(results), "errors": errors,
+             "wall_s": wall, "throughput_turns_per_s": len(results) / wall if wall else 0.0}
+    for metric in METRICS:
+        values = np.array([r[metric] for r in results if metric in r])
+        level[metric] = (
+            {"p50": float(np.percentile(values, 50)), "p95": float(np.percentile(values, 95)),
+             "p99": float(np.percentile(values, 99)), "mean": float(values.mean())}
+            if len(values) else None
+        )
+    return level
+
+
+def print_table(results: List[Dict]) -> None:
+    """Print one row per concurrency level, latencies in ms."""
+    header = f"{'sessions':>8} {'turns':>6} {'turns/s':>8}"
+    for metric in METRICS:
+        header += f" {metric[:-2] + ' p50/p95/p99':>24}"
+    print(header)
+    for level in results:
+        row = f"{level['sessions']:>8} {level['turns']:>6} {level['throughput_turns_per_s']:>8.2f}"
+        for metric in METRICS:
+            s = level[metric]
+            cell = f"{s['p50'] * 1000:.0f}/{s['p95'] * 1000:.0f}/{s['p99'] * 1000:.0f}" if s else "-"
+            row += f" {cell:>24}"
+        print(row)
+
+
+def print_comparison(results: List[Dict], baseline_path: str) -> None:
+    """Print p50/p95 changes against a previous ``--json`` result."""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    before = {level["sessions"]: level for level in baseline["results"]}
+    print(f"\nChange vs {baseline_path} ({baseline.get('commit') or 'unknown commit'})")
+    for level in results:
+        old = before.get(level["sessions"])
+        if old is None:
+            continue
+        changes = []
+        for metric in METRICS:
+            if level[metric] and old.get(metric):
+                for q in ("p50", "p95"):
+                    delta = (level[metric][q] - old[metric][q]) / old[metric][q] * 100 if old[metric][q] else 0
+                    changes.append(f"{metric[:-2]} {q} {delta:+.1f}%")
+        print(f"  {level['sessions']} sessions: " + ", ".join(changes))
+
+
+def git_commit() -> Optional[str]:
+    """Return the current commit hash, if run inside a git checkout."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=AGENT_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main() -> None:
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description="Replay benchmark of the agent turn pipeline")
+    parser.add_argument("--profile", default="gpu", help=f"One of {sorted(PROFILES)} or a JSON file")
+    parser.add_argument("--replay", help="JSON lines of recorded turns (default: built-in samples)")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 4], help="Concurrency levels")
+    parser.add_argument("--turns", type=int, default=6, help="Turns per session")
+    parser.add_argument("--json", help="Write the results as JSON to this file")
+    parser.add_argument("--compare", help="Previous --json result to compare against")
+    args = parser.parse_args()
+
+    profile = load_profile(args.profile)
+    services = FakeServices(profile)
+    services.start()
+    turns = load_turns(args.replay)
+    for turn in turns:
+        services.register(turn["pcm"], turn["transcript"])
+
+    configure_environment(services)
+    myagent = load_agent()
+
+    async def run_all() -> List[Dict]:
+        try:
+            # warm up connections, the embedder and the query path once
+            await run_level(myagent.LocalAgent, turns, 1, 1)
+            return [await run_level(myagent.LocalAgent, turns, n, args.turns) for n in args.sessions]
+        finally:
+            await myagent.clients.aclose()
+
+    results = asyncio.run(run_all())
+    services.stop()
+
+    print(f"\nTurn replay, profile {args.profile}, latencies in ms\n")
+    print_table(results)
+    if args.compare:
+        print_comparison(results, args.compare)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({
+                "commit": git_commit(),
+                "profile": args.profile,
+                "profile_settings": asdict(profile),
+                "turns_per_session": args.turns,
+                "results": results,
+            }, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+"""
+Runtime configuration for the Agent service.
+
+All tunables are read from environment variables (optionally loaded from
+``agent/.env`` by python-dotenv) so that the same image can be reconfigured
+from ``docker-compose.yml`` without code changes.
+
+See: docs/services/agent.md#configuration
+"""
+
+import os
+import tempfile
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def _env_str(name: str, default: str) -> str:
+    """Return the string value of an environment variable or a default."""
+    value = os.getenv(name)
+    return value if value not in (None, "") else default
+
+
+def _env_int(name: str, default: int) -> int:
+    """Return an environment variable parsed as ``int`` or a default."""
+    value = os.getenv(name)
+    return int(value) if value not in (None, "") else default
+
+
+def _env_float(name: str, default: float) -> float:
+    """Return an environment variable parsed as ``float`` or a default."""
+    value = os.getenv(name)
+    return float(value) if value not in (None, "") else default
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    """Return an environment variable parsed as a boolean flag or a default."""
+    value = os.getenv(name)
+    if value in (None, ""):
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def _env_list(name: str, default: list) -> list:
+    """Return a comma-separated environment variable as a list of strings or a default."""
+    value = os.getenv(name)
+    if value in (None, ""):
+        return default
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+AGENT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# RAG corpus and embedding model
+DOCS_DIR = _env_str("RAG_DOCS_DIR", os.path.join(AGENT_DIR, "docs"))
+EMBED_MODEL_NAME = _env_str("EMBED_MODEL_NAME", "all-MiniLM-L6-v2")
+
+# Embedding backend: "sentence-transformers" (torch) or "onnx" (int8 ONNX Runtime)
+EMBED_BACKEND = _env_str("EMBED_BACKEND", "sentence-transformers")
+EMBED_ONNX_MODEL_PATH = _env_str("EMBED_ONNX_MODEL_PATH", "")
+EMBED_ONNX_FILE = _env_str("EMBED_ONNX_FILE", "onnx/model_quint8_avx2.onnx")
+EMBED_ONNX_THREADS = _env_int("EMBED_ONNX_THREADS", 0)
+
+# On-disk embedding cache and FAISS index snapshot
+RAG_CACHE_DIR = _env_str(
+    "RAG_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "local-voice-ai", "rag"),
+)
+RAG_CACHE_ENABLED = _env_bool("RAG_CACHE_ENABLED", True)
+
+# Passage chunking and prompt budget for retrieved context
+RAG_CHUNK_TOKENS = _env_int("RAG_CHUNK_TOKENS", 160)
+RAG_CHUNK_OVERLAP_TOKENS = _env_int("RAG_CHUNK_OVERLAP_TOKENS", 32)
+RAG_TOP_K = _env_int("RAG_TOP_K", 8)
+RAG_CONTEXT_TOKENS = _env_int("RAG_CONTEXT_TOKENS", 512)
+
+# FAISS index backend: flat, ivf_flat, hnsw or ivf_pq (see rag/indexes.py)
+RAG_INDEX_TYPE = _env_str("RAG_INDEX_TYPE", "flat")
+RAG_IVF_NLIST = _env_int("RAG_IVF_NLIST", 0)
+RAG_IVF_NPROBE = _env_int("RAG_IVF_NPROBE", 8)
+RAG_HNSW_M = _env_int("RAG_HNSW_M", 32)
+RAG_HNSW_EF_CONSTRUCTION = _env_int("RAG_HNSW_EF_CONSTRUCTION", 80)
+RAG_HNSW_EF_SEARCH = _env_int("RAG_HNSW_EF_SEARCH", 64)
+RAG_PQ_M = _env_int("RAG_PQ_M", 16)
+RAG_PQ_NBITS = _env_int("RAG_PQ_NBITS", 8)
+
+# Speculative RAG lookups on transcripts received before the end of turn
+RAG_PREFETCH_ENABLED = _env_bool("RAG_PREFETCH_ENABLED", True)
+RAG_PREFETCH_MIN_SIMILARITY = _env_float("RAG_PREFETCH_MIN_SIMILARITY", 0.8)
+RAG_PREFETCH_MIN_WORDS = _env_int("RAG_PREFETCH_MIN_WORDS", 3)
+
+# Exact and semantic cache of rag_lookup results
+RAG_QUERY_CACHE_SIZE = _env_int("RAG_QUERY_CACHE_SIZE", 256)
+RAG_QUERY_CACHE_TTL = _env_float("RAG_QUERY_CACHE_TTL", 600.0)
+RAG_QUERY_CACHE_MIN_SIMILARITY = _env_float("RAG_QUERY_CACHE_MIN_SIMILARITY", 0.9)
+
+# Micro-batching query embedding service
+EMBED_BATCH_MAX_SIZE = _env_int("EMBED_BATCH_MAX_SIZE", 32)
+EMBED_BATCH_MAX_WAIT_MS = _env_float("EMBED_BATCH_MAX_WAIT_MS", 4.0)
+EMBED_WORKER_THREADS = _env_int("EMBED_WORKER_THREADS", 1)
+
+# Corpus published once by the main worker process and mmap'd by job processes
+RAG_SHARED_CORPUS = _env_bool("RAG_SHARED_CORPUS", True)
+RAG_SHARED_DIR = _env_str("RAG_SHARED_DIR", os.path.join(RAG_CACHE_DIR, "shared"))
+
+# Incremental hot reload of DOCS_DIR without restarting the agent
+RAG_HOT_RELOAD = _env_bool("RAG_HOT_RELOAD", True)
+RAG_RELOAD_INTERVAL = _env_float("RAG_RELOAD_INTERVAL", 5.0)
+
+# Sentence-level LLM -> TTS streaming (see pipeline/segmenter.py)
+TTS_SENTENCE_STREAMING = _env_bool("TTS_SENTENCE_STREAMING", True)
+TTS_FIRST_CLAUSE_MIN_WORDS = _env_int("TTS_FIRST_CLAUSE_MIN_WORDS", 3)
+TTS_MIN_SEGMENT_CHARS = _env_int("TTS_MIN_SEGMENT_CHARS", 40)
+TTS_MAX_SEGMENT_CHARS = _env_int("TTS_MAX_SEGMENT_CHARS", 250)
+TTS_MAX_CONCURRENCY = _env_int("TTS_MAX_CONCURRENCY", 2)
+
+# Metrics export (see telemetry/metrics.py); METRICS_PORT=0 disables the endpoint
+METRICS_HOST = _env_str("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = _env_int("METRICS_PORT", 9464)
+METRICS_DUMP_PATH = _env_str("METRICS_DUMP_PATH", "")
+METRICS_DUMP_INTERVAL = _env_float("METRICS_DUMP_INTERVAL", 60.0)
+METRICS_WINDOW = _env_int("METRICS_WINDOW", 1024)
+# job processes publish their metrics here; the main process serves the merged view
+METRICS_AGGREGATE = _env_bool("METRICS_AGGREGATE", True)
+METRICS_DIR = _env_str(
+    "METRICS_DIR", os.path.join(tempfile.gettempdir(), "local-voice-ai", "metrics")
+)
+METRICS_PUBLISH_INTERVAL = _env_float("METRICS_PUBLISH_INTERVAL", 5.0)
+
+# Per-turn latency traces (OTLP/JSON lines) and waterfall logs
+TRACING_ENABLED = _env_bool("TRACING_ENABLED", True)
+TRACE_EXPORT_PATH = _env_str(
+    "TRACE_EXPORT_PATH",
+    os.path.join(os.path.expanduser("~"), ".cache", "local-voice-ai", "traces.jsonl"),
+)
+TRACE_WATERFALL_LOG = _env_bool("TRACE_WATERFALL_LOG", True)
+
+# OpenAI-compatible service endpoints (overridden by benchmarks.turn_replay)
+STT_BASE_URL = _env_str("STT_BASE_URL", "http://whisper:80/v1")
+STT_MODEL = _env_str("STT_MODEL", "Systran/faster-whisper-small")
+LLM_BASE_URL = _env_str("LLM_BASE_URL", "http://ollama:11434/v1")
+LLM_MODEL = _env_str("LLM_MODEL", "gemma3:4b")
+TTS_BASE_URL = _env_str("TTS_BASE_URL", "http://kokoro:8880/v1")
+TTS_MODEL = _env_str("TTS_MODEL", "kokoro")
+TTS_VOICE = _env_str("TTS_VOICE", "af_nova")
+
+# Shared keep-alive HTTP pools for the STT/LLM/TTS backends (see backends/clients.py)
+HTTP_MAX_CONNECTIONS = _env_int("HTTP_MAX_CONNECTIONS", 32)
+HTTP_MAX_KEEPALIVE = _env_int("HTTP_MAX_KEEPALIVE", 16)
+HTTP_KEEPALIVE_EXPIRY = _env_float("HTTP_KEEPALIVE_EXPIRY", 60.0)
+HTTP_CONNECT_TIMEOUT = _env_float("HTTP_CONNECT_TIMEOUT", 5.0)
+HTTP_READ_TIMEOUT = _env_float("HTTP_READ_TIMEOUT", 30.0)
+HTTP_WARM_CONNECTIONS = _env_int("HTTP_WARM_CONNECTIONS", 2)
+
+# Model warm-up before the worker registers (see backends/warmup.py)
+BACKEND_WARMUP = _env_bool("BACKEND_WARMUP", True)
+BACKEND_WARMUP_TIMEOUT = _env_float("BACKEND_WARMUP_TIMEOUT", 120.0)
+# ollama keep_alive for the LLM: seconds (-1 = keep loaded) or a duration like "30m"
+LLM_KEEP_ALIVE = _env_str("LLM_KEEP_ALIVE", "-1")
+
+# Load-aware job admission (see backends/admission.py); limits of 0 disable a term
+ADMISSION_ENABLED = _env_bool("ADMISSION_ENABLED", True)
+ADMISSION_LOAD_THRESHOLD = _env_float("ADMISSION_LOAD_THRESHOLD", 0.75)
+ADMISSION_QUEUE_TIMEOUT = _env_float("ADMISSION_QUEUE_TIMEOUT", 2.0)
+ADMISSION_MAX_SESSIONS = _env_int("ADMISSION_MAX_SESSIONS", 0)
+ADMISSION_LATENCY_WINDOW = _env_float("ADMISSION_LATENCY_WINDOW", 30.0)
+ADMISSION_REPORT_INTERVAL = _env_float("ADMISSION_REPORT_INTERVAL", 0.5)
+ADMISSION_DIR = _env_str(
+    "ADMISSION_DIR", os.path.join(tempfile.gettempdir(), "local-voice-ai", "load")
+)
+STT_MAX_INFLIGHT = _env_int("STT_MAX_INFLIGHT", 8)
+LLM_MAX_INFLIGHT = _env_int("LLM_MAX_INFLIGHT", 4)
+TTS_MAX_INFLIGHT = _env_int("TTS_MAX_INFLIGHT", 8)
+# p95 time to response headers at which a backend counts as fully loaded
+STT_LATENCY_SLO = _env_float("STT_LATENCY_SLO", 1.0)
+LLM_LATENCY_SLO = _env_float("LLM_LATENCY_SLO", 1.5)
+TTS_LATENCY_SLO = _env_float("TTS_LATENCY_SLO", 1.0)
+
+# LLM routing across several OpenAI-compatible backends (see backends/router.py)
+LLM_BASE_URLS = _env_list("LLM_BASE_URLS", [LLM_BASE_URL])
+LLM_TTFT_DEADLINE = _env_float("LLM_TTFT_DEADLINE", 2.0)
+LLM_TTFT_EWMA_ALPHA = _env_float("LLM_TTFT_EWMA_ALPHA", 0.3)
+LLM_EJECT_AFTER = _env_int("LLM_EJECT_AFTER", 2)
+LLM_HEALTH_INTERVAL = _env_float("LLM_HEALTH_INTERVAL", 5.0)
+LLM_HEALTH_TIMEOUT = _env_float("LLM_HEALTH_TIMEOUT", 2.0)
+# job processes exchange backend load here, so routing sees all sessions of the worker
+LLM_ROUTING_DIR = _env_str(
+    "LLM_ROUTING_DIR", os.path.join(tempfile.gettempdir(), "local-voice-ai", "llm-routing")
+)
+
+# Disk caches of repeated replies (see pipeline/response_cache.py)
+TTS_CACHE_ENABLED = _env_bool("TTS_CACHE_ENABLED", True)
+TTS_CACHE_DIR = _env_str(
+    "TTS_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "local-voice-ai", "tts")
+)
+TTS_CACHE_MAX_MB = _env_float("TTS_CACHE_MAX_MB", 256.0)
+TTS_CACHE_MAX_CHARS = _env_int("TTS_CACHE_MAX_CHARS", 120)
+# sampling temperature of the LLM; -1 keeps the backend default
+LLM_TEMPERATURE = _env_float("LLM_TEMPERATURE", -1.0)
+# opt-in, and only used when LLM_TEMPERATURE is 0
+LLM_REPLY_CACHE = _env_bool("LLM_REPLY_CACHE", False)
+LLM_REPLY_CACHE_DIR = _env_str(
+    "LLM_REPLY_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "local-voice-ai", "llm")
+)
+LLM_REPLY_CACHE_MAX_MB = _env_float("LLM_REPLY_CACHE_MAX_MB", 16.0)
+
+# Token budget of the prompt in long calls (see pipeline/context_window.py)
+CONTEXT_MANAGEMENT = _env_bool("CONTEXT_MANAGEMENT", True)
+CONTEXT_MAX_TOKENS = _env_int("CONTEXT_MAX_TOKENS", 3072)
+# fraction of the budget the prompt is cut down to once it goes over
+CONTEXT_LOW_WATERMARK = _env_float("CONTEXT_LOW_WATERMARK", 0.6)
+CONTEXT_SUMMARY = _env_bool("CONTEXT_SUMMARY", True)
+CONTEXT_SUMMARY_TOKENS = _env_int("CONTEXT_SUMMARY_TOKENS", 200)
+
+# Hybrid BM25 + vector retrieval (see rag/lexical.py)
+RAG_HYBRID = _env_bool("RAG_HYBRID", True)
+# answer queries whose identifiers a BM25 hit contains verbatim without embedding them
+RAG_KEYWORD_FAST_PATH = _env_bool("RAG_KEYWORD_FAST_PATH", True)
+
+# Cross-encoder reranking of RAG candidates (see rag/rerank.py); downloads the model when enabled
+RAG_RERANK = _env_bool("RAG_RERANK", False)
+RAG_RERANK_MODEL = _env_str("RAG_RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+RAG_RERANK_MODEL_PATH = _env_str("RAG_RERANK_MODEL_PATH", "")
+RAG_RERANK_ONNX_FILE = _env_str("RAG_RERANK_ONNX_FILE", "onnx/model_quint8_avx2.onnx")
+RAG_RERANK_THREADS = _env_int("RAG_RERANK_THREADS", 0)
+# candidates fetched for reranking, and passages kept after it
+RAG_RERANK_CANDIDATES = _env_int("RAG_RERANK_CANDIDATES", 20)
+RAG_RERANK_KEEP = _env_int("RAG_RERANK_KEEP", 3)
+# time a rerank may take before rag_lookup falls back to the vector order
+RAG_RERANK_BUDGET_MS = _env_float("RAG_RERANK_BUDGET_MS", 80.0)
+RAG_RERANK_BATCH = _env_int("RAG_RERANK_BATCH", 16)
+RAG_RERANK_CACHE_SIZE = _env_int("RAG_RERANK_CACHE_SIZE", 4096)
+
+# Seconds a RAG lookup waits for the corpus and models still loading in the background
+RAG_READY_TIMEOUT = _env_float("RAG_READY_TIMEOUT", 3.0)
+
+# Cancel a reply's RAG, LLM and TTS work when the user talks over it (see pipeline/barge_in.py)
+BARGE_IN_CANCEL = _env_bool("BARGE_IN_CANCEL", True)
+# seconds of user speech before the barge-in is acted on, like AgentSession's min_interruption_duration
+BARGE_IN_MIN_SPEECH = _env_float("BARGE_IN_MIN_SPEECH", 0.5)
+
+# Per-session endpointing delay learned from the user's pauses (see pipeline/endpointing.py)
+ADAPTIVE_ENDPOINTING = _env_bool("ADAPTIVE_ENDPOINTING", True)
+# LiveKit's default min_endpointing_delay, used until enough pauses are seen
+ENDPOINTING_INITIAL_DELAY = _env_float("ENDPOINTING_INITIAL_DELAY", 0.5)
+ENDPOINTING_MIN_DELAY = _env_float("ENDPOINTING_MIN_DELAY", 0.2)
+ENDPOINTING_MAX_DELAY = _env_float("ENDPOINTING_MAX_DELAY", 1.5)
+# the delay covers this quantile of the user's pauses, plus the margin
+ENDPOINTING_PAUSE_QUANTILE = _env_float("ENDPOINTING_PAUSE_QUANTILE", 0.9)
+ENDPOINTING_MARGIN = _env_float("ENDPOINTING_MARGIN", 0.1)
+# speech this soon after the end of a turn means the user was cut off; each cut-off adds the step
+ENDPOINTING_CUTOFF_WINDOW = _env_float("ENDPOINTING_CUTOFF_WINDOW", 1.5)
+ENDPOINTING_CUTOFF_STEP = _env_float("ENDPOINTING_CUTOFF_STEP", 0.15)
+# silence before Silero VAD reports the end of speech (its default); shared by all sessions
+VAD_MIN_SILENCE_DURATION = _env_float("VAD_MIN_SILENCE_DURATION", 0.55)
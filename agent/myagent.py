@@ -1,64 +1,524 @@
 import logging
 import os
+import sys
+import time
 from pathlib import Path
+from typing import AsyncIterable
 from dotenv import load_dotenv
-from livekit.agents import JobContext, WorkerOptions, cli
+from livekit import rtc
+from livekit.agents import (
+    DEFAULT_API_CONNECT_OPTIONS, APIConnectOptions, JobContext, JobProcess, ModelSettings, WorkerOptions, cli,
+)
 from livekit.agents.voice import Agent, AgentSession
+# plugins register themselves on import, which must happen on the main thread
 from livekit.plugins import openai, silero, groq
-from livekit.agents import ChatContext, ChatMessage
-from sentence_transformers import SentenceTransformer
-import faiss
+from livekit.agents import ChatContext, ChatMessage, StopResponse
 import asyncio
+import threading
 from functools import partial
+from config import (
+    DOCS_DIR, EMBED_MODEL_NAME, RAG_CACHE_DIR, RAG_CACHE_ENABLED,
+    RAG_CHUNK_TOKENS, RAG_CHUNK_OVERLAP_TOKENS, RAG_TOP_K, RAG_CONTEXT_TOKENS,
+    RAG_INDEX_TYPE, RAG_IVF_NLIST, RAG_IVF_NPROBE, RAG_HNSW_M, RAG_HNSW_EF_CONSTRUCTION,
+    RAG_HNSW_EF_SEARCH, RAG_PQ_M, RAG_PQ_NBITS,
+    RAG_PREFETCH_ENABLED, RAG_PREFETCH_MIN_SIMILARITY, RAG_PREFETCH_MIN_WORDS,
+    RAG_QUERY_CACHE_SIZE, RAG_QUERY_CACHE_TTL, RAG_QUERY_CACHE_MIN_SIMILARITY,
+    EMBED_BATCH_MAX_SIZE, EMBED_BATCH_MAX_WAIT_MS, EMBED_WORKER_THREADS,
+    EMBED_BACKEND, EMBED_ONNX_MODEL_PATH, EMBED_ONNX_FILE, EMBED_ONNX_THREADS,
+    RAG_SHARED_CORPUS, RAG_SHARED_DIR, RAG_HOT_RELOAD, RAG_RELOAD_INTERVAL,
+    TTS_SENTENCE_STREAMING, TTS_FIRST_CLAUSE_MIN_WORDS, TTS_MIN_SEGMENT_CHARS,
+    TTS_MAX_SEGMENT_CHARS, TTS_MAX_CONCURRENCY,
+    METRICS_HOST, METRICS_PORT, METRICS_DUMP_PATH, METRICS_DUMP_INTERVAL, METRICS_WINDOW,
+    METRICS_AGGREGATE, METRICS_DIR, METRICS_PUBLISH_INTERVAL,
+    TRACING_ENABLED, TRACE_EXPORT_PATH, TRACE_WATERFALL_LOG,
+    STT_BASE_URL, STT_MODEL, LLM_MODEL, TTS_BASE_URL, TTS_MODEL, TTS_VOICE,
+    HTTP_MAX_CONNECTIONS, HTTP_MAX_KEEPALIVE, HTTP_KEEPALIVE_EXPIRY, HTTP_CONNECT_TIMEOUT,
+    HTTP_READ_TIMEOUT, HTTP_WARM_CONNECTIONS,
+    BACKEND_WARMUP, BACKEND_WARMUP_TIMEOUT, LLM_KEEP_ALIVE,
+    ADMISSION_ENABLED, ADMISSION_LOAD_THRESHOLD, ADMISSION_QUEUE_TIMEOUT, ADMISSION_MAX_SESSIONS,
+    ADMISSION_LATENCY_WINDOW, ADMISSION_REPORT_INTERVAL, ADMISSION_DIR,
+    STT_MAX_INFLIGHT, LLM_MAX_INFLIGHT, TTS_MAX_INFLIGHT,
+    STT_LATENCY_SLO, LLM_LATENCY_SLO, TTS_LATENCY_SLO,
+    LLM_BASE_URLS, LLM_TTFT_DEADLINE, LLM_TTFT_EWMA_ALPHA, LLM_EJECT_AFTER,
+    LLM_HEALTH_INTERVAL, LLM_HEALTH_TIMEOUT, LLM_ROUTING_DIR,
+    TTS_CACHE_ENABLED, TTS_CACHE_DIR, TTS_CACHE_MAX_MB, TTS_CACHE_MAX_CHARS,
+    LLM_TEMPERATURE, LLM_REPLY_CACHE, LLM_REPLY_CACHE_DIR, LLM_REPLY_CACHE_MAX_MB,
+    CONTEXT_MANAGEMENT, CONTEXT_MAX_TOKENS, CONTEXT_LOW_WATERMARK, CONTEXT_SUMMARY,
+    CONTEXT_SUMMARY_TOKENS, RAG_HYBRID, RAG_KEYWORD_FAST_PATH,
+    RAG_RERANK, RAG_RERANK_MODEL, RAG_RERANK_MODEL_PATH, RAG_RERANK_ONNX_FILE, RAG_RERANK_THREADS,
+    RAG_RERANK_CANDIDATES, RAG_RERANK_KEEP, RAG_RERANK_BUDGET_MS, RAG_RERANK_BATCH,
+    RAG_RERANK_CACHE_SIZE, RAG_READY_TIMEOUT, BARGE_IN_CANCEL, BARGE_IN_MIN_SPEECH,
+    ADAPTIVE_ENDPOINTING, ENDPOINTING_INITIAL_DELAY, ENDPOINTING_MIN_DELAY, ENDPOINTING_MAX_DELAY,
+    ENDPOINTING_PAUSE_QUANTILE, ENDPOINTING_MARGIN, ENDPOINTING_CUTOFF_WINDOW, ENDPOINTING_CUTOFF_STEP,
+    VAD_MIN_SILENCE_DURATION,
+)
+# lazy package: faiss and the model backends load in the RAG loader thread, not at import
+import rag
+from pipeline import (
+    AdaptiveEndpointing, AudioCache, BargeInCanceller, ClauseSegmenter, ContextWindow, PipelinedSynthesizer,
+    ReplyCache, chat_messages, segment_stream, write_in_background,
+)
+from backends import (
+    AdmissionController, AdmissionPolicy, ClientRegistry, LLMBackendPool, LoadBoard, PoolLimits,
+    RequestTracker, RoutingLLM, parse_keep_alive, warm_backends,
+)
+from telemetry import AgentMetrics, JsonLinesExporter, TurnTracer, WorkerMetrics, per_process_path, untraced
 
 load_dotenv()
 
 logger = logging.getLogger("local-agent")
 logger.setLevel(logging.INFO)
 
-# load a small embedding model once
-embed_model = SentenceTransformer("all-MiniLM-L6-v2")
-
-# load all your docs
-docs = []
-docs_dir = os.path.join(os.path.dirname(__file__), "docs")
-if os.path.exists(docs_dir):
-    for fn in os.listdir(docs_dir):
-        with open(os.path.join(docs_dir, fn), encoding="utf-8") as f:
-            docs.append(f.read())
-
-# embed and build FAISS index
-if docs:
-    embs = embed_model.encode(docs, show_progress_bar=False)
-    dim = embs.shape[1]
-    index = faiss.IndexFlatL2(dim)
-    index.add(embs)
-else:
-    dim = embed_model.get_sentence_embedding_dimension()
-    index = faiss.IndexFlatL2(dim)
-    logger.warning("No documents found in docs directory. RAG will return empty context.")
-
-async def rag_lookup(query: str) -> str:
-    """Perform RAG lookup for a given query"""
+# per-process metrics registry, exported by start_metrics()
+agent_metrics = AgentMetrics(window=METRICS_WINDOW)
+
+# in-flight backend requests of this process, published to the main process for admission
+request_tracker = RequestTracker(
+    {"stt": STT_BASE_URL, "llm": LLM_BASE_URLS, "tts": TTS_BASE_URL},
+    latency_window=ADMISSION_LATENCY_WINDOW,
+)
+load_board = LoadBoard(ADMISSION_DIR)
+
+# pooled keep-alive HTTP clients shared by all sessions of this process
+clients = ClientRegistry(PoolLimits(
+    max_connections=HTTP_MAX_CONNECTIONS,
+    max_keepalive=HTTP_MAX_KEEPALIVE,
+    keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+    connect_timeout=HTTP_CONNECT_TIMEOUT,
+    read_timeout=HTTP_READ_TIMEOUT,
+), tracker=request_tracker)
+
+# load, latency and health of the LLM backends, shared by all sessions of this
+# process; load and latency are also exchanged with the other job processes
+llm_pool = LLMBackendPool(
+    LLM_BASE_URLS,
+    ewma_alpha=LLM_TTFT_EWMA_ALPHA,
+    ttft_deadline=LLM_TTFT_DEADLINE,
+    eject_after=LLM_EJECT_AFTER,
+    probe_interval=LLM_HEALTH_INTERVAL,
+    probe_timeout=LLM_HEALTH_TIMEOUT,
+    board=LoadBoard(LLM_ROUTING_DIR) if len(LLM_BASE_URLS) > 1 else None,
+)
+warmup_task = None
+
+# disk caches of repeated replies, shared by all sessions and processes
+audio_cache = (
+    AudioCache(
+        TTS_CACHE_DIR, int(TTS_CACHE_MAX_MB * 1024 * 1024), TTS_MODEL, TTS_VOICE,
+        max_chars=TTS_CACHE_MAX_CHARS,
+    )
+    if TTS_CACHE_ENABLED
+    else None
+)
+# replies only depend on the prompt when sampling is greedy
+reply_cache = (
+    ReplyCache(LLM_REPLY_CACHE_DIR, int(LLM_REPLY_CACHE_MAX_MB * 1024 * 1024), LLM_MODEL)
+    if LLM_REPLY_CACHE and LLM_TEMPERATURE == 0
+    else None
+)
+if LLM_REPLY_CACHE and reply_cache is None:
+    logger.warning("LLM_REPLY_CACHE needs LLM_TEMPERATURE=0; the reply cache is disabled")
+
+# Silero VAD loaded once per process by prewarm() and shared by all sessions
+vad_model = None
+
+# per-process RAG state, populated by load_rag() from the prewarm hook
+embed_model = None
+retriever = None
+embedder = None
+query_cache = None
+reranker = None
+# rag_lookup waits for load_rag() on this instead of prewarm blocking; see rag_loading below
+
+# the reranker picks its passages from a longer candidate list
+retrieve_k = max(RAG_TOP_K, RAG_RERANK_CANDIDATES) if RAG_RERANK else RAG_TOP_K
+
+
+def index_spec() -> "rag.IndexSpec":
+    """Return the configured index backend"""
+    return rag.IndexSpec(
+        kind=RAG_INDEX_TYPE,
+        nlist=RAG_IVF_NLIST,
+        nprobe=RAG_IVF_NPROBE,
+        hnsw_m=RAG_HNSW_M,
+        ef_construction=RAG_HNSW_EF_CONSTRUCTION,
+        ef_search=RAG_HNSW_EF_SEARCH,
+        pq_m=RAG_PQ_M,
+        pq_nbits=RAG_PQ_NBITS,
+    )
+
+
+def load_embed_model():
+    """Load the configured embedding model"""
+    return rag.load_embedding_model(
+        EMBED_BACKEND,
+        EMBED_MODEL_NAME,
+        onnx_model_path=EMBED_ONNX_MODEL_PATH,
+        onnx_file=EMBED_ONNX_FILE,
+        onnx_threads=EMBED_ONNX_THREADS,
+    )
+
+
+def embedding_store():
+    """Return the on-disk embedding cache, or None if disabled"""
+    if not RAG_CACHE_ENABLED:
+        return None
+    # fp32 and int8 vectors of the same model must not end up in one index
+    return rag.EmbeddingStore(RAG_CACHE_DIR, rag.embedding_cache_key(EMBED_BACKEND, EMBED_MODEL_NAME, EMBED_ONNX_FILE))
+
+
+def build_corpus(model) -> "rag.Retriever":
+    """Split agent/docs into passages and index them, reusing the on-disk cache"""
+    passages = rag.ingest(DOCS_DIR, RAG_CHUNK_TOKENS, RAG_CHUNK_OVERLAP_TOKENS)
+    if not passages:
+        logger.warning("No documents found in docs directory. RAG will return empty context.")
+    return rag.build_retriever(
+        passages,
+        model.encode,
+        model.dim,
+        index_spec(),
+        top_k=retrieve_k,
+        token_budget=RAG_CONTEXT_TOKENS,
+        store=embedding_store(),
+    )
+
+
+def start_reloader(model, live: "rag.Retriever", on_swap) -> "rag.CorpusReloader":
+    """Watch agent/docs and hand every updated retriever to on_swap"""
+    reloader = rag.CorpusReloader(
+        DOCS_DIR,
+        RAG_CHUNK_TOKENS,
+        RAG_CHUNK_OVERLAP_TOKENS,
+        model.encode,
+        index_spec(),
+        top_k=retrieve_k,
+        token_budget=RAG_CONTEXT_TOKENS,
+        on_swap=on_swap,
+        store=embedding_store(),
+        interval=RAG_RELOAD_INTERVAL,
+    )
+    reloader.start(live)
+    return reloader
+
+
+def publish_shared_corpus() -> None:
+    """Build the corpus once in the main worker process for job processes to attach to"""
+    model = load_embed_model()
+    built = build_corpus(model)
+    # the BM25 index is built here once and mapped by the job processes
+    rag.shared.publish(RAG_SHARED_DIR, built.passages, built.index, lexical=RAG_HYBRID)
+    # without the reloader, model and index are dropped on return; job
+    # processes load their own model for queries and map the published index
+    if RAG_HOT_RELOAD:
+        # job processes pick up each new generation in watch_shared_corpus()
+        start_reloader(
+            model, built, lambda r: rag.shared.publish(RAG_SHARED_DIR, r.passages, r.index, lexical=RAG_HYBRID)
+        )
+
+
+def set_retriever(new: "rag.Retriever") -> None:
+    """Swap in a new retriever; lookups in flight keep the one they started with"""
+    global retriever
+    if RAG_HYBRID:
+        # build the BM25 index on the reloader thread, not in the first lookup
+        new.lexical
+    retriever = new
+
+
+def attached_retriever(passages, index, generation: str) -> "rag.Retriever":
+    """Retriever over a shared corpus generation, with its BM25 index mapped when published"""
+    lexical = rag.shared.attach_lexical(RAG_SHARED_DIR, generation) if RAG_HYBRID else None
+    return rag.Retriever(
+        index, passages, top_k=retrieve_k, token_budget=RAG_CONTEXT_TOKENS, spec=index_spec(), lexical=lexical
+    )
+
+
+def watch_shared_corpus(generation: str) -> None:
+    """Re-attach whenever the main process publishes a new corpus generation"""
+    def run():
+        nonlocal generation
+        while True:
+            time.sleep(RAG_RELOAD_INTERVAL)
+            current = rag.shared.current_generation(RAG_SHARED_DIR)
+            if current is None or current == generation:
+                continue
+            attached = rag.shared.attach(RAG_SHARED_DIR)
+            if attached is None:
+                continue
+            passages, index, generation = attached
+            set_retriever(attached_retriever(passages, index, generation))
+
+    threading.Thread(target=run, name="rag-attach", daemon=True).start()
+
+
+def load_rag() -> None:
+    """Load the embedding model and attach to (or build) the corpus in this process"""
+    global embed_model, retriever, embedder, query_cache, reranker
+    if retriever is not None:
+        return
+
+    start = time.perf_counter()
+    embed_model = load_embed_model()
+    attached = rag.shared.attach(RAG_SHARED_DIR) if RAG_SHARED_CORPUS else None
+    if attached is not None:
+        passages, index, generation = attached
+        retriever = attached_retriever(passages, index, generation)
+        if RAG_HOT_RELOAD:
+            watch_shared_corpus(generation)
+    else:
+        retriever = build_corpus(embed_model)
+        if RAG_HOT_RELOAD:
+            start_reloader(embed_model, retriever, set_retriever)
+    if RAG_HYBRID:
+        retriever.lexical
+
+    # one embedding service per worker process, shared by all sessions
+    embedder = rag.BatchingEmbedder(
+        embed_model.encode,
+        max_batch=EMBED_BATCH_MAX_SIZE,
+        max_wait=EMBED_BATCH_MAX_WAIT_MS / 1000,
+        threads=EMBED_WORKER_THREADS,
+    )
+
+    query_cache = rag.QueryCache(
+        embed_model.dim,
+        max_entries=RAG_QUERY_CACHE_SIZE,
+        ttl=RAG_QUERY_CACHE_TTL,
+        min_similarity=RAG_QUERY_CACHE_MIN_SIMILARITY,
+    )
+
+    if RAG_RERANK:
+        cross_encoder = rag.OnnxCrossEncoder(
+            RAG_RERANK_MODEL,
+            model_path=RAG_RERANK_MODEL_PATH,
+            onnx_file=RAG_RERANK_ONNX_FILE,
+            threads=RAG_RERANK_THREADS,
+        )
+        # the first run initializes ONNX Runtime; keep it out of the first turn's budget
+        cross_encoder.score("warm up", ["warm up"])
+        reranker = rag.Reranker(
+            cross_encoder.score,
+            keep=RAG_RERANK_KEEP,
+            budget=RAG_RERANK_BUDGET_MS / 1000,
+            batch_size=RAG_RERANK_BATCH,
+            cache_size=RAG_RERANK_CACHE_SIZE,
+        )
+
+    logger.info("RAG ready in %.2fs", time.perf_counter() - start)
+
+
+# finished, successfully or not, once load_rag() returns or raises
+rag_loading = rag.BackgroundLoad(load_rag, name="rag-load")
+
+
+def start_rag_loading() -> None:
+    """Run load_rag() on a background thread, once per process"""
+    rag_loading.start()
+
+
+def load_vad():
+    """Load Silero VAD once per process; sessions share the instance"""
+    global vad_model
+    if vad_model is None:
+        start = time.perf_counter()
+        vad_model = silero.VAD.load(min_silence_duration=VAD_MIN_SILENCE_DURATION)
+        # recorded once here: per-session handlers would pile up on the shared instance
+        vad_model.on("metrics_collected", agent_metrics.record_vad)
+        elapsed = time.perf_counter() - start
+        logger.info("Loaded Silero VAD in %.0f ms, no longer paid per session", elapsed * 1000)
+    return vad_model
+
+
+def start_metrics() -> None:
+    """Publish this process's metrics to the main process, or export them itself"""
+    if METRICS_AGGREGATE:
+        agent_metrics.start_publisher(METRICS_DIR, interval=METRICS_PUBLISH_INTERVAL)
+        return
+    agent_metrics.start_exporter(
+        host=METRICS_HOST,
+        port=METRICS_PORT,
+        dump_path=per_process_path(METRICS_DUMP_PATH),
+        dump_interval=METRICS_DUMP_INTERVAL,
+    )
+
+
+def start_worker_metrics() -> WorkerMetrics:
+    """Serve the merged metrics of all job processes from the main process"""
+    worker_metrics = WorkerMetrics(
+        METRICS_DIR, window=METRICS_WINDOW, recent_max_age=max(60.0, 10 * METRICS_PUBLISH_INTERVAL)
+    )
+    worker_metrics.reset()
+    worker_metrics.start_exporter(
+        host=METRICS_HOST,
+        port=METRICS_PORT,
+        dump_path=METRICS_DUMP_PATH,
+        dump_interval=METRICS_DUMP_INTERVAL,
+    )
+    return worker_metrics
+
+
+def start_warmup() -> None:
+    """Open pooled connections to the backends on the running loop, once per loop"""
+    global warmup_task
+    if HTTP_WARM_CONNECTIONS <= 0:
+        return
     loop = asyncio.get_running_loop()
+    if warmup_task is None or warmup_task.get_loop() is not loop:
+        warmup_task = loop.create_task(clients.warm_up(
+            openai_urls=[STT_BASE_URL, *LLM_BASE_URLS],
+            session_urls=[TTS_BASE_URL],
+            connections=HTTP_WARM_CONNECTIONS,
+        ))
+
 
-    q_emb = await loop.run_in_executor(None, lambda: embed_model.encode([query]))
-    D, I = await loop.run_in_executor(None, lambda: index.search(q_emb, min(3, index.ntotal)))
+def start_load_reporting() -> None:
+    """Publish this process's backend load for the main process's load_fnc"""
+    if ADMISSION_ENABLED:
+        load_board.start_publisher(request_tracker.snapshot, interval=ADMISSION_REPORT_INTERVAL)
 
-    ctx = ""
-    if index.ntotal > 0:
-        ctx = "\n\n---\n\n".join(docs[i] for i in I[0])
+
+def admission_controller() -> AdmissionController:
+    """Build the controller behind WorkerOptions.load_fnc and request_fnc"""
+    return AdmissionController(load_board, AdmissionPolicy(
+        max_sessions=ADMISSION_MAX_SESSIONS,
+        max_inflight={"stt": STT_MAX_INFLIGHT, "llm": LLM_MAX_INFLIGHT, "tts": TTS_MAX_INFLIGHT},
+        latency_slo={"stt": STT_LATENCY_SLO, "llm": LLM_LATENCY_SLO, "tts": TTS_LATENCY_SLO},
+        threshold=ADMISSION_LOAD_THRESHOLD,
+        queue_timeout=ADMISSION_QUEUE_TIMEOUT,
+    ), max_age=max(5.0, 10 * ADMISSION_REPORT_INTERVAL))
+
+
+def startup_log_handler() -> logging.Handler:
+    """Show the main process's INFO logs before cli.run_app configures logging"""
+    # until then only the last-resort handler exists, which drops everything below WARNING
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s - %(message)s"))
+    logger.addHandler(handler)
+    return handler
+
+
+def warm_up_backends() -> None:
+    """Load the STT, LLM and TTS models before the worker registers for jobs"""
+    warm_backends(
+        stt=(STT_BASE_URL, STT_MODEL),
+        llms=[(url, LLM_MODEL) for url in LLM_BASE_URLS],
+        tts=(TTS_BASE_URL, TTS_MODEL, TTS_VOICE),
+        keep_alive=parse_keep_alive(LLM_KEEP_ALIVE),
+        timeout=BACKEND_WARMUP_TIMEOUT,
+    )
+
+
+def prewarm(proc: JobProcess) -> None:
+    """Load VAD and start loading RAG state before the process is handed a job"""
+    start_metrics()
+    start_load_reporting()
+    proc.userdata["vad"] = load_vad()
+    # the corpus and models load in the background; the process is handed jobs meanwhile
+    start_rag_loading()
+    try:
+        # warm the pools now if the job's loop is already running in this process
+        start_warmup()
+        start_llm_health_checks()
+    except RuntimeError:
+        pass
+
+async def rag_lookup(query: str, tracer: TurnTracer = None) -> str:
+    """Perform RAG lookup for a given query, returning budgeted passages"""
+    loop = asyncio.get_running_loop()
+    if not rag_loading.ready:
+        if rag_loading.failed:
+            # logged once by the loader thread
+            return ""
+        # the loader thread started in prewarm may still be running
+        if not await loop.run_in_executor(None, rag_loading.wait, RAG_READY_TIMEOUT):
+            if not rag_loading.failed:
+                logger.warning("RAG is still loading, answering without context")
+            return ""
+    # pin the retriever: a hot reload may swap the global mid-lookup
+    current = retriever
+    trace = tracer.span if tracer is not None else untraced
+
+    with trace("rag") as rag_span:
+        query_cache.check_version(current.version)
+        ctx = query_cache.get(query)
+        if ctx is not None:
+            rag_span.attributes["cache"] = "exact"
+            return ctx
+
+        hits = None
+        q_emb = None
+        lexical_hits = None
+        if RAG_HYBRID:
+            with trace("rag.lexical", parent=rag_span):
+                lexical_hits = await loop.run_in_executor(None, current.lexical_search, query)
+            if RAG_KEYWORD_FAST_PATH and current.keyword_match(query, lexical_hits):
+                # exact identifier match: the embedding would not change the answer
+                hits = lexical_hits
+                rag_span.attributes["cache"] = "keyword"
+
+        if hits is None:
+            with trace("rag.embed", parent=rag_span):
+                q_emb = await embedder.embed(query)
+            ctx = query_cache.get(query, q_emb)
+            if ctx is not None:
+                rag_span.attributes["cache"] = "semantic"
+                return ctx
+
+            with trace("rag.search", parent=rag_span):
+                hits = await loop.run_in_executor(None, lambda: current.search(q_emb))
+            if lexical_hits is not None:
+                hits = current.fuse(hits, lexical_hits)
+            rag_span.attributes["cache"] = "miss"
+
+        status = None
+        if reranker is not None:
+            with trace("rag.rerank", parent=rag_span) as rerank_span:
+                hits, status = await reranker.rerank(query, hits, lambda pid: current.passages[pid].text)
+                rerank_span.attributes["status"] = status
+
+        ctx = current.build_context(hits)
+        # a fallback is not cached: the next time, the rerank may finish in time
+        if status in (None, "reranked"):
+            query_cache.put(query, q_emb, ctx)
 
     print(f"RAG content: {ctx}")
 
     return ctx
 
+def openai_llm(base_url: str) -> openai.LLM:
+    """Return the LLM plugin for one backend, on the shared client pool"""
+    options = {"temperature": LLM_TEMPERATURE} if LLM_TEMPERATURE >= 0 else {}
+    return openai.LLM(model=LLM_MODEL, client=clients.openai_client(base_url), **options)
+
+
+def start_llm_health_checks() -> None:
+    """Probe and share the LLM backends' state when routing across several"""
+    if len(LLM_BASE_URLS) > 1:
+        llm_pool.start_sharing()
+        llm_pool.start_health_checks(lambda url: clients.openai_client(url).models.list())
+
+
+def chunk_text(chunk) -> str:
+    """Text of an ``llm_node`` chunk, which is a str or a ChatChunk."""
+    if isinstance(chunk, str):
+        return chunk
+    if chunk.delta is not None and chunk.delta.content:
+        return chunk.delta.content
+    return ""
+
+
 class LocalAgent(Agent):
     def __init__(self) -> None:
-        stt = openai.STT(base_url="http://whisper:80/v1", model="Systran/faster-whisper-small")
-        llm = openai.LLM(base_url="http://ollama:11434/v1", model="gemma3:4b", timeout=30)
-        tts = groq.TTS(base_url="http://kokoro:8880/v1", model="kokoro", voice="af_nova")
-        vad_inst = silero.VAD.load()
+        # clients come from the process-wide pool instead of one per session
+        stt = openai.STT(model=STT_MODEL, client=clients.openai_client(STT_BASE_URL))
+        llm = openai_llm(LLM_BASE_URLS[0])
+        if len(LLM_BASE_URLS) > 1:
+            llm = RoutingLLM(llm_pool, openai_llm)
+        tts = groq.TTS(
+            base_url=TTS_BASE_URL, model=TTS_MODEL, voice=TTS_VOICE,
+            http_session=clients.http_session(),
+        )
+        vad_inst = load_vad()
         super().__init__(
             instructions="""
                 You are a helpful agent.
@@ -71,104 +531,317 @@ class LocalAgent(Agent):
             vad=vad_inst
         )
 
-        def llm_metrics_wrapper(metrics):
-            import asyncio
-            asyncio.create_task(self.on_llm_metrics_collected(metrics))
-        llm.on("metrics_collected", llm_metrics_wrapper)
-
-        def stt_metrics_wrapper(metrics):
-            import asyncio
-            asyncio.create_task(self.on_stt_metrics_collected(metrics))
-        stt.on("metrics_collected", stt_metrics_wrapper)
-
-        def eou_metrics_wrapper(metrics):
-            import asyncio
-            asyncio.create_task(self.on_eou_metrics_collected(metrics))
-        stt.on("eou_metrics_collected", eou_metrics_wrapper)
-
-        def tts_metrics_wrapper(metrics):
-            import asyncio
-            asyncio.create_task(self.on_tts_metrics_collected(metrics))
-        tts.on("metrics_collected", tts_metrics_wrapper)
-
-        def vad_metrics_wrapper(event):
-            import asyncio
-            asyncio.create_task(self.on_vad_event(event))
-        vad_inst.on("metrics_collected", vad_metrics_wrapper)
-
-    async def on_llm_metrics_collected(self, metrics):
-        logger.info(f"LLM Metrics: {{" +
-            f"'type': {metrics.type}, " +
-            f"'label': {metrics.label}, " +
-            f"'request_id': {metrics.request_id}, " +
-            f"'timestamp': {metrics.timestamp if isinstance(metrics.timestamp, (int, float)) else metrics.timestamp.isoformat() if metrics.timestamp else None}, " +
-            f"'duration': {metrics.duration}, " +
-            f"'ttft': {getattr(metrics, 'ttft', None)}, " +
-            f"'cancelled': {getattr(metrics, 'cancelled', None)}, " +
-            f"'completion_tokens': {getattr(metrics, 'completion_tokens', None)}, " +
-            f"'prompt_tokens': {getattr(metrics, 'prompt_tokens', None)}, " +
-            f"'total_tokens': {getattr(metrics, 'total_tokens', None)}, " +
-            f"'tokens_per_second': {getattr(metrics, 'tokens_per_second', None)}" +
-            "}")
-
-    async def on_stt_metrics_collected(self, metrics):
-        logger.info(f"STT Metrics: {{" +
-            f"'type': {metrics.type}, " +
-            f"'label': {metrics.label}, " +
-            f"'request_id': {metrics.request_id}, " +
-            f"'timestamp': {metrics.timestamp if isinstance(metrics.timestamp, (int, float)) else metrics.timestamp.isoformat() if metrics.timestamp else None}, " +
-            f"'duration': {metrics.duration}, " +
-            f"'speech_id': {getattr(metrics, 'speech_id', None)}, " +
-            f"'error': {str(getattr(metrics, 'error', None)) if getattr(metrics, 'error', None) else None}, " +
-            f"'streamed': {getattr(metrics, 'streamed', None)}, " +
-            f"'audio_duration': {getattr(metrics, 'audio_duration', None)}" +
-            "}")
-
-    async def on_eou_metrics_collected(self, metrics):
-        logger.info(f"EOU Metrics: {{" +
-            f"'type': {metrics.type}, " +
-            f"'label': {metrics.label}, " +
-            f"'timestamp': {metrics.timestamp if isinstance(metrics.timestamp, (int, float)) else metrics.timestamp.isoformat() if metrics.timestamp else None}, " +
-            f"'end_of_utterance_delay': {getattr(metrics, 'end_of_utterance_delay', None)}, " +
-            f"'transcription_delay': {getattr(metrics, 'transcription_delay', None)}, " +
-            f"'speech_id': {getattr(metrics, 'speech_id', None)}, " +
-            f"'error': {str(getattr(metrics, 'error', None)) if getattr(metrics, 'error', None) else None}" +
-            "}")
-
-    async def on_tts_metrics_collected(self, metrics):
-        logger.info(f"TTS Metrics: {{" +
-            f"'type': {metrics.type}, " +
-            f"'label': {metrics.label}, " +
-            f"'request_id': {metrics.request_id}, " +
-            f"'timestamp': {metrics.timestamp if isinstance(metrics.timestamp, (int, float)) else metrics.timestamp.isoformat() if metrics.timestamp else None}, " +
-            f"'ttfb': {getattr(metrics, 'ttfb', None)}, " +
-            f"'duration': {metrics.duration}, " +
-            f"'audio_duration': {getattr(metrics, 'audio_duration', None)}, " +
-            f"'cancelled': {getattr(metrics, 'cancelled', None)}, " +
-            f"'characters_count': {getattr(metrics, 'characters_count', None)}, " +
-            f"'streamed': {getattr(metrics, 'streamed', None)}, " +
-            f"'speech_id': {getattr(metrics, 'speech_id', None)}, " +
-            f"'error': {str(getattr(metrics, 'error', None)) if getattr(metrics, 'error', None) else None}" +
-            "}")
-
-    async def on_vad_event(self, event):
-        None
+        self._tracer = (
+            TurnTracer(JsonLinesExporter(TRACE_EXPORT_PATH) if TRACE_EXPORT_PATH else None,
+                       log_waterfall=TRACE_WATERFALL_LOG)
+            if TRACING_ENABLED
+            else None
+        )
+
+        self._prefetcher = (
+            rag.SpeculativePrefetcher(
+                partial(rag_lookup, tracer=self._tracer),
+                min_similarity=RAG_PREFETCH_MIN_SIMILARITY,
+                min_words=RAG_PREFETCH_MIN_WORDS,
+            )
+            if RAG_PREFETCH_ENABLED
+            else None
+        )
+        # perf_counter() at the end of the user's turn, for time-to-first-audio
+        self._turn_completed_at = None
+
+        # bounds the prompt of long calls; it remembers the cut, so one per session
+        self._context = (
+            ContextWindow(
+                max_tokens=CONTEXT_MAX_TOKENS,
+                low_watermark=CONTEXT_LOW_WATERMARK,
+                summarize=CONTEXT_SUMMARY,
+                summary_tokens=CONTEXT_SUMMARY_TOKENS,
+            )
+            if CONTEXT_MANAGEMENT
+            else None
+        )
+
+        # RAG lookup and reply generation of the current turn, cancelled on barge-in
+        self._barge_in = BargeInCanceller()
+        self._barge_in_timer: asyncio.TimerHandle = None
+
+        # learns this speaker's pauses and moves the endpointing delay with them
+        self._endpointing = (
+            AdaptiveEndpointing(
+                min_delay=ENDPOINTING_MIN_DELAY,
+                max_delay=ENDPOINTING_MAX_DELAY,
+                initial_delay=ENDPOINTING_INITIAL_DELAY,
+                quantile=ENDPOINTING_PAUSE_QUANTILE,
+                margin=ENDPOINTING_MARGIN,
+                cutoff_window=ENDPOINTING_CUTOFF_WINDOW,
+                cutoff_step=ENDPOINTING_CUTOFF_STEP,
+            )
+            if ADAPTIVE_ENDPOINTING
+            else None
+        )
+
+        # recorded synchronously in the plugin callbacks, no task per event
+        llm.on("metrics_collected", agent_metrics.record_llm)
+        stt.on("metrics_collected", agent_metrics.record_stt)
+        stt.on("eou_metrics_collected", agent_metrics.record_eou)
+        tts.on("metrics_collected", agent_metrics.record_tts)
+        if self._tracer is not None:
+            llm.on("metrics_collected", self._tracer.record_llm)
+            stt.on("metrics_collected", self._tracer.record_stt)
+            stt.on("eou_metrics_collected", self._tracer.record_eou)
+            tts.on("metrics_collected", self._tracer.record_tts)
+        if self._endpointing is not None:
+            stt.on("eou_metrics_collected", self._endpointing.record_eou)
+
+    async def on_enter(self) -> None:
+        if self._tracer is not None:
+            self.session.on("agent_state_changed", self._tracer.on_agent_state_changed)
+        if self._prefetcher is not None:
+            self.session.on("user_input_transcribed", self._on_user_input_transcribed)
+        if BARGE_IN_CANCEL or self._endpointing is not None:
+            self.session.on("user_state_changed", self._on_user_state_changed)
+
+    async def on_exit(self) -> None:
+        if self._tracer is not None:
+            self.session.off("agent_state_changed", self._tracer.on_agent_state_changed)
+            self._tracer.finish()
+        if self._prefetcher is not None:
+            self.session.off("user_input_transcribed", self._on_user_input_transcribed)
+            self._prefetcher.reset()
+        if BARGE_IN_CANCEL or self._endpointing is not None:
+            self.session.off("user_state_changed", self._on_user_state_changed)
+        if self._barge_in_timer is not None:
+            self._barge_in_timer.cancel()
+        self._barge_in.cancel()
+        if self._endpointing is not None and self._endpointing.turns:
+            eou = self._endpointing.eou_delays
+            logger.info(
+                "Endpointing: %.2fs after %d turns (%d pauses, %d cut-offs), mean end-of-utterance delay %s",
+                self._endpointing.delay, self._endpointing.turns, len(self._endpointing.pauses),
+                self._endpointing.cutoffs, f"{sum(eou) / len(eou):.2f}s" if eou else "n/a",
+            )
+
+    def _on_user_input_transcribed(self, ev) -> None:
+        # start retrieval while the user is still talking
+        self._prefetcher.on_transcript(ev.transcript, ev.is_final)
+
+    def _on_user_state_changed(self, ev) -> None:
+        # VAD start/end of user speech
+        if self._endpointing is not None:
+            if ev.new_state == "speaking":
+                if self._endpointing.user_speaking():
+                    agent_metrics.inc("endpointing_cutoffs_total")
+                self.update_endpointing()
+            elif ev.old_state == "speaking":
+                self._endpointing.user_silent()
+        if not BARGE_IN_CANCEL:
+            return
+        # a barge-in only counts once it lasted BARGE_IN_MIN_SPEECH
+        if self._barge_in_timer is not None:
+            self._barge_in_timer.cancel()
+            self._barge_in_timer = None
+        if ev.new_state == "speaking":
+            self._barge_in_timer = asyncio.get_running_loop().call_later(BARGE_IN_MIN_SPEECH, self.on_barge_in)
+
+    def update_endpointing(self) -> None:
+        """Apply the endpointing delay learned from the user's pauses, if it moved."""
+        delay = self._endpointing.update()
+        if delay is None:
+            return
+        self.session.update_options(min_endpointing_delay=delay)
+        logger.info(
+            f"Endpointing delay now {delay:.2f}s "
+            f"({len(self._endpointing.pauses)} pauses, {self._endpointing.cutoffs} cut-offs)"
+        )
+
+    def on_barge_in(self) -> None:
+        """Cancel the work of the reply the user is talking over."""
+        self._barge_in_timer = None
+        speech = self.session.current_speech
+        if speech is not None and not speech.allow_interruptions:
+            return
+        if not self._barge_in.busy and speech is None:
+            return
+        lookups = self._barge_in.cancel()
+        if speech is not None:
+            try:
+                # cancels the LLM and TTS nodes, closing their HTTP streams to ollama and Kokoro
+                self.session.interrupt()
+            except RuntimeError as e:
+                logger.debug(f"Barge-in interrupt failed: {e}")
+        agent_metrics.inc("barge_in_total")
+        logger.info(f"Barge-in: reply interrupted, {lookups} RAG lookup(s) cancelled")
+
+    async def retrieve(self, query: str) -> str:
+        """RAG content for ``query``, from the prefetcher or a fresh lookup."""
+        rag_content = None
+        if self._prefetcher is not None:
+            rag_content = await self._prefetcher.take(query)
+        if rag_content is None:
+            rag_content = await rag_lookup(query, tracer=self._tracer)
+        return rag_content
 
     async def on_user_turn_completed(
         self, turn_ctx: ChatContext, new_message: ChatMessage,
     ) -> None:
-        rag_content = await rag_lookup(new_message.text_content)
-        if rag_content:
+        self._turn_completed_at = time.perf_counter()
+        if self._endpointing is not None:
+            self._endpointing.turn_committed()
+            agent_metrics.observe("endpointing_delay_seconds", self._endpointing.delay)
+        lookup = self._barge_in.track(asyncio.ensure_future(self.retrieve(new_message.text_content)))
+        try:
+            # wait() leaves our own cancellation apart from a barge-in cancelling the lookup
+            await asyncio.wait({lookup})
+        except asyncio.CancelledError:
+            lookup.cancel()
+            raise
+        if lookup.cancelled():
+            # the user is already saying something else; no reply to this turn
+            raise StopResponse()
+        rag_content = lookup.result()
+        if not rag_content:
+            return
+        if self._context is None:
             turn_ctx.add_message(
                 role="user",
                 content=f"Additional information relevant to the user's next message: {rag_content}"
             )
             logger.info(f"Added RAG content to chat context: {rag_content}")
+            return
+        # passages the model already has in its prompt are not sent again
+        message = self._context.add_rag(turn_ctx, rag_content)
+        if message is not None:
+            logger.info(f"Added RAG content to chat context: {message.text_content}")
+        else:
+            logger.info("RAG passages already in chat context, none added")
+
+    async def llm_node(
+        self, chat_ctx: ChatContext, tools: list, model_settings: ModelSettings
+    ) -> AsyncIterable:
+        if self._context is not None:
+            chat_ctx = self._context.prompt(chat_ctx)
+
+        self._barge_in.reply_started()
+        completed = False
+        try:
+            async for chunk in self.generate(chat_ctx, tools, model_settings):
+                self._barge_in.reply_text(chunk_text(chunk))
+                yield chunk
+            completed = True
+        finally:
+            # also reached when LiveKit interrupts the reply on its own
+            interrupted = self._barge_in.reply_finished(completed)
+            if interrupted is not None:
+                agent_metrics.inc("barge_in_llm_tokens_total", interrupted.llm_tokens)
+                agent_metrics.inc("barge_in_llm_tokens_saved_total", interrupted.llm_tokens_saved)
+                logger.info(
+                    "LLM reply cut after %.2fs at ~%d tokens, ~%d tokens not generated",
+                    interrupted.seconds, interrupted.llm_tokens, interrupted.llm_tokens_saved,
+                )
+
+    async def generate(
+        self, chat_ctx: ChatContext, tools: list, model_settings: ModelSettings
+    ) -> AsyncIterable:
+        """Reply chunks from the reply cache or the LLM."""
+        if tools:
+            # tool calls are executed by the session's activity
+            async for chunk in Agent.default.llm_node(self, chat_ctx, tools, model_settings):
+                yield chunk
+            return
+        async for text in self.complete(chat_ctx, self.session.conn_options.llm_conn_options):
+            yield text
+
+    async def complete(
+        self, chat_ctx: ChatContext, conn_options: APIConnectOptions = DEFAULT_API_CONNECT_OPTIONS
+    ) -> AsyncIterable[str]:
+        """
+        Reply text for ``chat_ctx`` from the reply cache or ``self.llm``.
+
+        Unlike ``Agent.default.llm_node`` this needs no running session, so
+        ``benchmarks.turn_replay`` drives it directly.
+        """
+        loop = asyncio.get_running_loop()
+        key = None
+        if reply_cache is not None:
+            key = reply_cache.key(chat_messages(chat_ctx))
+            cached = await loop.run_in_executor(None, reply_cache.get, key)
+            if cached is not None:
+                agent_metrics.inc("llm_cache_hits_total")
+                yield cached
+                return
+            agent_metrics.inc("llm_cache_misses_total")
+
+        parts = []
+        async with self.llm.chat(chat_ctx=chat_ctx, conn_options=conn_options) as stream:
+            async for chunk in stream:
+                text = chunk_text(chunk)
+                if text:
+                    parts.append(text)
+                    yield text
+        if key is not None:
+            # only reached when the reply was not interrupted
+            write_in_background(reply_cache.put, key, "".join(parts))
+
+    async def tts_node(
+        self, text: AsyncIterable[str], model_settings: ModelSettings
+    ) -> AsyncIterable[rtc.AudioFrame]:
+        if not TTS_SENTENCE_STREAMING:
+            async for frame in Agent.default.tts_node(self, text, model_settings):
+                yield frame
+            return
+
+        # speak the first clause as soon as it is complete, then whole sentences
+        segmenter = ClauseSegmenter(
+            first_min_words=TTS_FIRST_CLAUSE_MIN_WORDS,
+            min_chars=TTS_MIN_SEGMENT_CHARS,
+            max_chars=TTS_MAX_SEGMENT_CHARS,
+        )
+        synth = PipelinedSynthesizer(self.tts, max_concurrency=TTS_MAX_CONCURRENCY, cache=audio_cache)
+        reply_started_at = time.perf_counter()
+        turn_completed_at, self._turn_completed_at = self._turn_completed_at, None
+        try:
+            async for frame in synth.run(segment_stream(text, segmenter)):
+                if turn_completed_at is not None and synth.first_audio_at is not None:
+                    self.on_first_audio(turn_completed_at, reply_started_at, synth)
+                    turn_completed_at = None
+                yield frame
+        finally:
+            agent_metrics.inc("tts_cache_hits_total", synth.cache_hits)
+            agent_metrics.inc("tts_cache_misses_total", synth.cache_misses)
+            agent_metrics.inc("barge_in_tts_segments_total", synth.cancelled_segments)
+            agent_metrics.inc("barge_in_tts_characters_total", synth.cancelled_chars)
+
+    def on_first_audio(
+        self, turn_completed_at: float, reply_started_at: float, synth: PipelinedSynthesizer
+    ) -> None:
+        ttfa = synth.first_audio_at - turn_completed_at
+        agent_metrics.observe("time_to_first_audio_seconds", ttfa)
+        if self._tracer is not None:
+            now = time.time_ns()
+            self._tracer.add("first_audio", now, now, ttfa=ttfa)
+        logger.info(
+            "Time to first audio: %.3fs (%.3fs after reply start, first segment %d chars)",
+            ttfa, synth.first_audio_at - reply_started_at, len(synth.first_segment or ""),
+        )
 
 async def entrypoint(ctx: JobContext):
+    start_metrics()
+    start_load_reporting()
+    start_rag_loading()
+    start_warmup()
+    start_llm_health_checks()
+    request_tracker.session_started()
+
+    async def end_session() -> None:
+        request_tracker.session_ended()
+
+    ctx.add_shutdown_callback(end_session)
+    ctx.add_shutdown_callback(clients.aclose)
     await ctx.connect()
 
-    session = AgentSession()
+    # LiveKit's default; LocalAgent moves it per session with ADAPTIVE_ENDPOINTING
+    session = AgentSession(min_endpointing_delay=ENDPOINTING_INITIAL_DELAY)
 
     await session.start(
         agent=LocalAgent(),
@@ -176,4 +849,33 @@ async def entrypoint(ctx: JobContext):
     )
 
 if __name__ == "__main__":
-    cli.run_app(WorkerOptions(entrypoint_fnc=entrypoint, job_memory_warn_mb=1500))
\ No newline at end of file
+    # download-files, console, connect, ... run no worker to prepare for
+    runs_worker = sys.argv[1:2] in (["start"], ["dev"])
+    startup_handler = startup_log_handler()
+    try:
+        if METRICS_AGGREGATE and runs_worker:
+            start_worker_metrics()
+        if RAG_SHARED_CORPUS and runs_worker:
+            try:
+                publish_shared_corpus()
+            except Exception:
+                # the worker still registers; job processes build their own corpus
+                logger.warning("Publishing the shared corpus failed", exc_info=True)
+        if BACKEND_WARMUP and runs_worker:
+            # blocks until the models are loaded, so no job lands on a cold backend
+            warm_up_backends()
+    finally:
+        # LiveKit installs its own handler; keeping this one would print every line twice
+        logger.removeHandler(startup_handler)
+    admission = {}
+    if ADMISSION_ENABLED:
+        # report backend load instead of CPU, and turn jobs away above the threshold
+        controller = admission_controller()
+        admission = dict(
+            load_fnc=controller.load,
+            load_threshold=ADMISSION_LOAD_THRESHOLD,
+            request_fnc=controller.request_fnc,
+        )
+    cli.run_app(WorkerOptions(
+        entrypoint_fnc=entrypoint, prewarm_fnc=prewarm, job_memory_warn_mb=1500, **admission
+    ))
\ No newline at end of file
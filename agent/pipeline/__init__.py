@@ -0,0 +1,29 @@
+"""
+Reply-path stages that sit between the LiveKit session and the model plugins.
+
+The modules in this package are used by ``LocalAgent`` node overrides to
+shape how LLM text reaches the TTS service and how long each turn takes.
+
+See: docs/services/agent.md#sentence-streaming-tts
+"""
+
+from .barge_in import BargeInCanceller, InterruptedReply
+from .context_window import ContextWindow
+from .endpointing import AdaptiveEndpointing
+from .response_cache import AudioCache, ReplyCache, chat_messages, write_in_background
+from .segmenter import ClauseSegmenter, segment_stream
+from .tts_stream import PipelinedSynthesizer
+
+__all__ = [
+    "AdaptiveEndpointing",
+    "AudioCache",
+    "BargeInCanceller",
+    "ClauseSegmenter",
+    "ContextWindow",
+    "InterruptedReply",
+    "PipelinedSynthesizer",
+    "ReplyCache",
+    "chat_messages",
+    "segment_stream",
+    "write_in_background",
+]
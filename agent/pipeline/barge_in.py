@@ -0,0 +1,126 @@
+"""
+Cancellation of a reply's in-flight work when the user barges in.
+
+When the user starts talking over the agent, the work for the reply they
+just interrupted is worthless, but it keeps running: the RAG lookup, the
+ollama generation and the Kokoro requests of segments that will never be
+played. On a CPU-only box every wasted token slows down the other
+sessions. ``BargeInCanceller`` tracks this work for one session:
+
+* RAG lookups are registered with :meth:`~BargeInCanceller.track` and
+  cancelled directly. A cancelled lookup also drops its queued embedding
+  request, and no index search or rerank is started after it.
+* The LLM and TTS streams belong to LiveKit's speech task. ``LocalAgent``
+  stops them with ``AgentSession.interrupt()``, which closes the HTTP
+  streams to ollama and Kokoro. Ollama stops generating once the client
+  disconnects.
+
+It also counts what an interrupted reply had generated before it was cut,
+and estimates how many tokens the cancellation saved: an EWMA of the
+length of completed replies minus what was already generated.
+
+See: docs/services/agent.md#barge-in-cancellation
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Optional, Set
+
+
+@dataclass
+class InterruptedReply:
+    """
+    Generation of a reply that was cut off before the LLM finished it.
+
+    Attributes:
+        llm_tokens: Estimated tokens the LLM had generated.
+        llm_tokens_saved: Estimated tokens it would still have generated.
+        seconds: Time from the start of generation to the cut.
+    """
+
+    llm_tokens: int
+    llm_tokens_saved: int
+    seconds: float
+
+
+class BargeInCanceller:
+    """
+    In-flight work of one session's current reply.
+
+    Attributes:
+        ewma_alpha: Weight of the newest completed reply in the length estimate.
+        reply_tokens_ewma: Smoothed token length of completed replies.
+
+    Example:
+        >>> canceller = BargeInCanceller()
+        >>> lookup = canceller.track(asyncio.ensure_future(rag_lookup(text)))
+        >>> canceller.cancel()   # user started speaking
+
+    See Also:
+        docs/services/agent.md#barge-in-cancellation
+    """
+
+    def __init__(self, ewma_alpha: float = 0.2, initial_reply_tokens: float = 40.0) -> None:
+        """
+        Args:
+            ewma_alpha: Weight of the newest completed reply in the length estimate.
+            initial_reply_tokens: Length estimate before any reply has completed.
+        """
+        self.ewma_alpha = ewma_alpha
+        self.reply_tokens_ewma = initial_reply_tokens
+        self._tasks: Set[asyncio.Future] = set()
+        self._reply_started: Optional[float] = None
+        self._reply_chars = 0
+
+    @property
+    def busy(self) -> bool:
+        """True while a tracked task is running or the LLM is generating."""
+        return self._reply_started is not None or any(not t.done() for t in self._tasks)
+
+    def track(self, task: asyncio.Future) -> asyncio.Future:
+        """Register ``task`` to be cancelled on barge-in and return it."""
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    def cancel(self) -> int:
+        """Cancel every tracked task; returns how many were still running."""
+        pending = [t for t in self._tasks if not t.done()]
+        for task in pending:
+            task.cancel()
+        return len(pending)
+
+    def reply_started(self) -> None:
+        """Mark the start of LLM generation for a reply."""
+        self._reply_started = time.perf_counter()
+        self._reply_chars = 0
+
+    def reply_text(self, text: str) -> None:
+        """Count generated reply text."""
+        self._reply_chars += len(text)
+
+    def reply_finished(self, completed: bool) -> Optional[InterruptedReply]:
+        """
+        Mark the end of generation.
+
+        Completed replies update the length estimate. For a reply cut off
+        before the LLM finished, returns what it had and would have generated.
+        """
+        if self._reply_started is None:
+            return None
+        started, self._reply_started = self._reply_started, None
+        tokens = _tokens(self._reply_chars)
+        if completed:
+            self.reply_tokens_ewma += self.ewma_alpha * (tokens - self.reply_tokens_ewma)
+            return None
+        return InterruptedReply(
+            llm_tokens=tokens,
+            llm_tokens_saved=max(0, round(self.reply_tokens_ewma) - tokens),
+            seconds=time.perf_counter() - started,
+        )
+
+
+def _tokens(chars: int) -> int:
+    """Estimated tokens of ``chars`` characters, as in ``rag.corpus.estimate_tokens``."""
+    return -(-chars // 4)
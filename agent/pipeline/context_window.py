@@ -0,0 +1,236 @@
+"""
+Token-budgeted chat context for long calls.
+
+Every turn adds a user message, a reply and, usually, a message with RAG
+passages. Without a limit, the prompt grows for the whole call, and on CPU
+ollama's prompt evaluation time grows with it. ``ContextWindow`` keeps the
+prompt of one session within ``max_tokens``:
+
+* System messages (the agent instructions) are always kept.
+* When the prompt goes over budget, the oldest turns are cut, down to
+  ``low_watermark`` of the budget, at a user-turn boundary. If
+  ``summarize`` is set, the cut turns are replaced by a short extractive
+  summary of what the user asked and the agent answered. No LLM call is
+  needed for it.
+* RAG passages already in the prompt are not sent again. A turn's RAG
+  message only carries passages that are new, and is skipped when there are
+  none.
+* RAG messages are kept in the history in turn order, so the prompt only
+  ever grows at its end.
+
+Ollama reuses its KV cache for the longest prefix shared with the previous
+prompt. The cut point is therefore sticky: it only moves when the budget is
+exceeded, and then by a large step. Between two cuts, the instructions,
+summary and older turns stay byte-identical from turn to turn.
+
+See: docs/services/agent.md#context-budget
+"""
+
+import logging
+from typing import Callable, List, Optional, Sequence, Set
+
+from livekit.agents import ChatContext, ChatMessage
+
+logger = logging.getLogger("local-agent")
+
+RAG_PREFIX = "Additional information relevant to the user's next message: "
+# same as rag.retriever.PASSAGE_SEPARATOR; not imported, to keep faiss out of this module
+PASSAGE_SEPARATOR = "\n\n---\n\n"
+SUMMARY_PREFIX = "Summary of the earlier conversation:"
+PINNED_ROLES = ("system", "developer")
+
+
+def _default_estimate(text: str) -> int:
+    return -(-len(text) // 4)
+
+
+def _text(item) -> str:
+    if item.type == "message":
+        return item.text_content or ""
+    return str(getattr(item, "arguments", None) or getattr(item, "output", "") or "")
+
+
+def _is_rag(item) -> bool:
+    return item.type == "message" and item.role == "user" and _text(item).startswith(RAG_PREFIX)
+
+
+def _is_user_turn(item) -> bool:
+    return item.type == "message" and item.role == "user" and not _is_rag(item)
+
+
+def _passages(item) -> List[str]:
+    return [p for p in _text(item)[len(RAG_PREFIX):].split(PASSAGE_SEPARATOR) if p.strip()]
+
+
+def _shorten(text: str, limit: int) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[: limit - 3].rstrip() + "..."
+
+
+class ContextWindow:
+    """
+    Keeps the prompt of one session within a token budget.
+
+    One instance per session; it remembers where the history was cut and
+    which RAG passages the model has already seen.
+
+    Attributes:
+        max_tokens: Budget for the whole prompt.
+        low_watermark: Fraction of the budget the prompt is cut down to.
+        summarize: Replace cut turns with an extractive summary.
+        summary_tokens: Budget of that summary.
+
+    Example:
+        >>> window = ContextWindow(max_tokens=3072)
+        >>> window.add_rag(turn_ctx, rag_content)        # on_user_turn_completed
+        >>> chat_ctx = window.prompt(chat_ctx)           # llm_node
+
+    See Also:
+        docs/services/agent.md#context-budget
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = 3072,
+        low_watermark: float = 0.6,
+        summarize: bool = True,
+        summary_tokens: int = 200,
+        estimate_tokens: Callable[[str], int] = _default_estimate,
+    ) -> None:
+        """
+        Args:
+            max_tokens: Budget for the whole prompt.
+            low_watermark: Fraction of the budget the prompt is cut down to.
+            summarize: Replace cut turns with an extractive summary.
+            summary_tokens: Budget of that summary.
+            estimate_tokens: Token estimate of a text.
+        """
+        self.max_tokens = max_tokens
+        self.low_watermark = low_watermark
+        self.summarize = summarize
+        self.summary_tokens = summary_tokens
+        self._estimate = estimate_tokens
+        self._rag_messages: List[ChatMessage] = []
+        self._seen_passages: Set[str] = set()
+        self._wanted: List[str] = []
+        self._cut_id: Optional[str] = None
+        self._cut_at: Optional[float] = None
+        self._summary: Optional[ChatMessage] = None
+
+    def add_rag(self, turn_ctx: ChatContext, content: str) -> Optional[ChatMessage]:
+        """
+        Add the passages of ``content`` the model has not seen yet to ``turn_ctx``.
+
+        Args:
+            turn_ctx: Chat context of the current turn.
+            content: RAG context from ``rag_lookup``.
+
+        Returns:
+            The added message, or None if every passage was already in the prompt.
+        """
+        self._wanted = [p for p in content.split(PASSAGE_SEPARATOR) if p.strip()]
+        fresh = [p for p in self._wanted if p not in self._seen_passages]
+        if not fresh:
+            return None
+        message = turn_ctx.add_message(role="user", content=RAG_PREFIX + PASSAGE_SEPARATOR.join(fresh))
+        self._rag_messages.append(message)
+        self._seen_passages.update(fresh)
+        return message
+
+    def _tokens(self, items: Sequence) -> int:
+        return sum(self._estimate(_text(item)) for item in items)
+
+    def prompt(self, chat_ctx: ChatContext) -> ChatContext:
+        """
+        Return the context to send to the LLM for this turn.
+
+        Args:
+            chat_ctx: The session's full context for this turn.
+
+        Returns:
+            A new context with the pinned messages, the summary of cut turns,
+            earlier RAG messages and the turns after the cut.
+        """
+        # earlier turns' RAG messages are not part of the session history; put them back in order
+        ids = {item.id for item in chat_ctx.items}
+        items = sorted(
+            [*chat_ctx.items, *(m for m in self._rag_messages if m.id not in ids)],
+            key=lambda item: item.created_at,
+        )
+        pinned = [i for i in items if i.type == "message" and i.role in PINNED_ROLES]
+        rest = [i for i in items if not (i.type == "message" and i.role in PINNED_ROLES)]
+
+        start = next((n for n, item in enumerate(rest) if item.id == self._cut_id), None)
+        if start is None:
+            start = 0
+            if self._cut_id is not None:
+                # the history was replaced; start over
+                self._cut_id, self._cut_at, self._summary = None, None, None
+
+        kept = rest[start:]
+        summary = [self._summary] if self._summary is not None else []
+        if self._tokens(pinned) + self._tokens(summary) + self._tokens(kept) > self.max_tokens:
+            cut = self._choose_cut(kept, self._tokens(pinned))
+            if cut > 0:
+                self._move_cut(rest[: start + cut], kept[cut])
+                kept = kept[cut:]
+                summary = [self._summary] if self._summary is not None else []
+                logger.info(
+                    "Cut %d chat items to stay within %d tokens (prompt now ~%d tokens)",
+                    cut, self.max_tokens,
+                    self._tokens(pinned) + self._tokens(summary) + self._tokens(kept),
+                )
+
+        # passages cut from the prompt may be sent again
+        self._seen_passages = {p for item in kept if _is_rag(item) for p in _passages(item)}
+        # this turn's passages may have been in a message that was just cut
+        missing = [p for p in self._wanted if p not in self._seen_passages]
+        self._wanted = []
+        if missing:
+            message = ChatMessage(role="user", content=[RAG_PREFIX + PASSAGE_SEPARATOR.join(missing)])
+            kept.append(message)
+            self._rag_messages.append(message)
+            self._seen_passages.update(missing)
+        self._rag_messages = [m for m in self._rag_messages if self._cut_at is None or m.created_at >= self._cut_at]
+
+        return ChatContext([*pinned, *summary, *kept])
+
+    def _choose_cut(self, kept: Sequence, pinned_tokens: int) -> int:
+        """Return how many leading items to cut: enough to reach the low watermark, at a user turn."""
+        turns = [n for n, item in enumerate(kept) if _is_user_turn(item) and n > 0]
+        if not turns:
+            return 0
+        target = self.low_watermark * self.max_tokens - pinned_tokens
+        if self.summarize:
+            target -= self.summary_tokens
+        for n in turns:
+            if self._tokens(kept[n:]) <= target:
+                return n
+        # never cut the turn being answered
+        return turns[-1]
+
+    def _move_cut(self, dropped: Sequence, first_kept) -> None:
+        """Remember the new cut and rebuild the summary of everything before it."""
+        self._cut_id = first_kept.id
+        self._cut_at = first_kept.created_at
+        if not self.summarize:
+            return
+        lines = []
+        for item in dropped:
+            if _is_user_turn(item):
+                lines.append(f"- User: {_shorten(_text(item), 120)}")
+            elif item.type == "message" and item.role == "assistant":
+                lines.append(f"- Agent: {_shorten(_text(item), 120)}")
+        # the most recent exchanges matter most; keep as many as fit
+        budget = self.summary_tokens - self._estimate(SUMMARY_PREFIX)
+        kept_lines: List[str] = []
+        for line in reversed(lines):
+            budget -= self._estimate(line) + 1
+            if budget < 0:
+                break
+            kept_lines.insert(0, line)
+        self._summary = (
+            ChatMessage(role="system", content=["\n".join([SUMMARY_PREFIX, *kept_lines])])
+            if kept_lines
+            else None
+        )
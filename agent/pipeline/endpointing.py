@@ -0,0 +1,168 @@
+"""
+Per-session endpointing delay learned from the speaker's pauses.
+
+Without a turn-detector model, LiveKit ends the user's turn once VAD has
+reported the end of speech and ``min_endpointing_delay`` seconds passed
+without new speech. That delay sits on every turn. A fixed value is too
+long for a fast talker and too short for someone who pauses to think, who
+then gets cut off mid-sentence.
+
+``AdaptiveEndpointing`` watches the VAD-driven user state of one session:
+
+* A pause is the time from VAD end of speech to the next start of speech.
+  Pauses inside a turn are collected. The delay is a high quantile of them
+  plus a margin, so most of this speaker's pauses still fit in it.
+* The user starting to speak again shortly after the turn was committed
+  means they were cut off. That pause is collected as well, and the delay
+  is raised by a penalty step that decays over the following clean turns.
+
+The result is clamped to ``[min_delay, max_delay]``. Until ``min_samples``
+pauses have been seen, ``initial_delay`` plus the penalty is used.
+
+See: docs/services/agent.md#adaptive-endpointing
+"""
+
+import time
+from collections import deque
+from typing import Callable, Deque, Optional
+
+
+class AdaptiveEndpointing:
+    """
+    Endpointing delay of one session.
+
+    Attributes:
+        delay: Endpointing delay to use, in seconds.
+        pauses: Recent pauses, in seconds.
+        cutoffs: Turns the user continued right after they were committed.
+        turns: Committed turns.
+        eou_delays: Recent ``end_of_utterance_delay`` values from EOU metrics.
+
+    Example:
+        >>> endpointing = AdaptiveEndpointing(min_delay=0.2, max_delay=1.5)
+        >>> endpointing.user_silent(); endpointing.user_speaking()
+        >>> if endpointing.update() is not None:
+        ...     session.update_options(min_endpointing_delay=endpointing.delay)
+
+    See Also:
+        docs/services/agent.md#adaptive-endpointing
+    """
+
+    def __init__(
+        self,
+        min_delay: float = 0.2,
+        max_delay: float = 1.5,
+        initial_delay: float = 0.5,
+        quantile: float = 0.9,
+        margin: float = 0.1,
+        cutoff_window: float = 1.5,
+        cutoff_step: float = 0.15,
+        penalty_decay: float = 0.8,
+        window: int = 50,
+        min_samples: int = 5,
+        min_change: float = 0.05,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """
+        Args:
+            min_delay: Lower bound of the delay.
+            max_delay: Upper bound of the delay.
+            initial_delay: Delay before enough pauses are known.
+            quantile: Quantile of the pauses the delay has to cover.
+            margin: Seconds added on top of that quantile.
+            cutoff_window: Speech starting this soon after a commit is a cut-off.
+            cutoff_step: Seconds added to the delay per cut-off.
+            penalty_decay: Factor the cut-off penalty shrinks by per clean turn.
+            window: Pauses kept.
+            min_samples: Pauses needed before they set the delay.
+            min_change: Smallest change :meth:`update` reports.
+            clock: Time source, in seconds.
+        """
+        self.min_delay = min_delay
+        self.max_delay = max(min_delay, max_delay)
+        self.initial_delay = initial_delay
+        self.quantile = quantile
+        self.margin = margin
+        self.cutoff_window = cutoff_window
+        self.cutoff_step = cutoff_step
+        self.penalty_decay = penalty_decay
+        self.min_samples = min_samples
+        self.min_change = min_change
+        self._clock = clock
+        self.pauses: Deque[float] = deque(maxlen=window)
+        self.eou_delays: Deque[float] = deque(maxlen=window)
+        self.cutoffs = 0
+        self.turns = 0
+        self._penalty = 0.0
+        self._silent_at: Optional[float] = None
+        self._committed_at: Optional[float] = None
+        self.delay = self._clamp(initial_delay)
+
+    def _clamp(self, delay: float) -> float:
+        """Limit ``delay`` to the configured bounds."""
+        return min(self.max_delay, max(self.min_delay, delay))
+
+    def user_silent(self) -> None:
+        """VAD end of speech."""
+        self._silent_at = self._clock()
+
+    def user_speaking(self) -> bool:
+        """
+        VAD start of speech.
+
+        Returns:
+            True if the user was cut off: they went on speaking within
+            ``cutoff_window`` of the turn being committed.
+        """
+        now = self._clock()
+        silent_at, self._silent_at = self._silent_at, None
+        if silent_at is None:
+            return False
+        pause = now - silent_at
+        committed_at = self._committed_at
+        if committed_at is None or committed_at < silent_at:
+            # the turn did not end during this pause
+            self.pauses.append(pause)
+            return False
+        self._committed_at = None
+        if now - committed_at <= self.cutoff_window:
+            self.pauses.append(pause)
+            self.cutoffs += 1
+            self._penalty += self.cutoff_step
+            return True
+        # a new turn; the previous one was not cut off
+        self._penalty *= self.penalty_decay
+        return False
+
+    def turn_committed(self) -> None:
+        """End of the user's turn, decided by LiveKit."""
+        self._committed_at = self._clock()
+        self.turns += 1
+
+    def record_eou(self, metrics) -> None:
+        """``stt.on("eou_metrics_collected")`` listener: delay from end of speech to the end of turn."""
+        value = getattr(metrics, "end_of_utterance_delay", None)
+        if isinstance(value, (int, float)) and value >= 0:
+            self.eou_delays.append(float(value))
+
+    def target(self) -> float:
+        """Delay the observed pauses and cut-offs call for."""
+        if len(self.pauses) < self.min_samples:
+            base = self.initial_delay
+        else:
+            ordered = sorted(self.pauses)
+            base = ordered[min(len(ordered) - 1, int(self.quantile * len(ordered)))] + self.margin
+        return self._clamp(base + self._penalty)
+
+    def update(self) -> Optional[float]:
+        """
+        Move :attr:`delay` to :meth:`target`.
+
+        Returns:
+            The new delay if it changed by at least ``min_change``, else None.
+        """
+        target = self.target()
+        if abs(target - self.delay) < self.min_change:
+            return None
+        self.delay = target
+        return target
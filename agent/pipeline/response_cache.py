@@ -0,0 +1,299 @@
+"""
+Disk caches for repeated replies: synthesized audio and LLM text.
+
+Greetings, confirmations and FAQ answers come up again and again across
+calls, and each time the agent paid for a full Kokoro synthesis and, for
+the same prompt, a full gemma3 generation.
+
+``AudioCache``
+    Keys the audio of one TTS segment by (model, voice, normalized text)
+    and stores it as 16-bit PCM WAV. ``PipelinedSynthesizer`` checks it
+    before each request, so a hit is played without a Kokoro round trip.
+``ReplyCache``
+    Keys a complete LLM reply by a hash of the model and the whole prompt,
+    including the RAG context added to it. Replies depend on the prompt
+    alone only at temperature 0, so the agent only uses it then.
+
+Both are built on ``DiskLRU``: one file per entry, written atomically, and
+evicted least recently used first once the directory exceeds its size
+limit. The directory can be shared by all worker processes. Writes happen
+off the reply path through ``write_in_background``, which logs the ones
+that fail.
+
+See: docs/services/agent.md#response-caches
+"""
+
+import asyncio
+import hashlib
+import io
+import logging
+import os
+import re
+import tempfile
+import threading
+import unicodedata
+import wave
+from pathlib import Path
+from typing import Callable, Iterable, List, Optional, Sequence, Set, Tuple
+
+from livekit import rtc
+
+logger = logging.getLogger("local-agent")
+
+# Duration of the frames a cached segment is played back in
+FRAME_MS = 50
+
+_SPACE_RE = re.compile(r"\s+")
+_QUOTES = str.maketrans({"‘": "'", "’": "'", "“": '"', "”": '"'})
+
+# cache writes in flight, referenced until done so their errors are seen
+_pending_writes: Set[asyncio.Future] = set()
+
+
+def normalize_text(text: str) -> str:
+    """
+    Reduce ``text`` to the form used in cache keys.
+
+    Unicode is NFKC-normalized, curly quotes become straight ones, and
+    whitespace is collapsed. Case and punctuation are kept, because they
+    change how Kokoro pronounces the text (``US`` vs ``us``).
+    """
+    text = unicodedata.normalize("NFKC", text).translate(_QUOTES)
+    return _SPACE_RE.sub(" ", text).strip()
+
+
+def cache_key(*parts: str) -> str:
+    """Return the hex SHA-256 of ``parts``, separated so that they cannot run together."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+class DiskLRU:
+    """
+    Size-bounded directory of blobs, evicted least recently used first.
+
+    Each entry is one file named by its key. A read touches the file's
+    mtime, so mtime is the recency. The size is tracked in memory, and
+    when a write goes over ``max_bytes``, the directory is rescanned and
+    the oldest files are deleted down to 90% of the limit. Several processes
+    can share one directory; each of them enforces the limit. Within a
+    process, writes are serialized, so concurrent puts from the executor
+    keep the size count right.
+
+    Attributes:
+        directory: Where entries are stored.
+        max_bytes: Size limit of the directory.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, suffix: str = "") -> None:
+        """
+        Args:
+            directory: Cache directory, created on first write.
+            max_bytes: Size limit of all entries together.
+            suffix: File name extension of entries.
+        """
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self._bytes: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}{self.suffix}"
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Return the blob stored under ``key``, or None."""
+        path = self._path(key)
+        try:
+            data = path.read_bytes()
+            os.utime(path)
+        except OSError:
+            return None
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        """
+        Store ``data`` under ``key``, evicting old entries if over the limit.
+
+        Raises:
+            OSError: If the entry could not be written (disk full, permissions).
+        """
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            if self._bytes is None:
+                self._bytes = sum(size for _, size, _ in self._scan())
+            fd, tmp = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                os.replace(tmp, self._path(key))
+            except BaseException:
+                if os.path.exists(tmp):
+                    os.unlink(tmp)
+                raise
+            self._bytes += len(data)
+            if self._bytes > self.max_bytes:
+                self._evict()
+
+    def _scan(self) -> List[Tuple[Path, int, float]]:
+        """Return (path, size, mtime) of every entry."""
+        entries = []
+        for path in self.directory.glob(f"*{self.suffix}"):
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            entries.append((path, st.st_size, st.st_mtime))
+        return entries
+
+    def _evict(self) -> None:
+        """Delete the least recently used entries down to 90% of the limit."""
+        entries = sorted(self._scan(), key=lambda e: e[2])
+        total = sum(size for _, size, _ in entries)
+        target = 0.9 * self.max_bytes
+        evicted = 0
+        for path, size, _ in entries:
+            if total <= target:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            evicted += 1
+        self._bytes = total
+        logger.debug(f"Evicted {evicted} entries from {self.directory}")
+
+
+class AudioCache:
+    """
+    Synthesized audio of short TTS segments, keyed by model, voice and text.
+
+    Attributes:
+        model: TTS model the audio was made with.
+        voice: TTS voice the audio was made with.
+        max_chars: Longer segments are not cached; they rarely repeat.
+
+    Example:
+        >>> cache = AudioCache(TTS_CACHE_DIR, 256 << 20, "kokoro", "af_nova")
+        >>> synth = PipelinedSynthesizer(self.tts, cache=cache)
+
+    See Also:
+        docs/services/agent.md#response-caches
+    """
+
+    def __init__(self, directory: str, max_bytes: int, model: str, voice: str, max_chars: int = 120) -> None:
+        """Create the cache; ``directory`` is created on first write."""
+        self.store = DiskLRU(directory, max_bytes, suffix=".wav")
+        self.model = model
+        self.voice = voice
+        self.max_chars = max_chars
+
+    def _key(self, text: str) -> str:
+        return cache_key(self.model, self.voice, normalize_text(text))
+
+    def cacheable(self, text: str) -> bool:
+        """Return whether the audio of ``text`` is worth caching."""
+        return 0 < len(normalize_text(text)) <= self.max_chars
+
+    def get(self, text: str) -> Optional[List[rtc.AudioFrame]]:
+        """Return the cached audio of ``text`` as ``FRAME_MS`` frames, or None."""
+        data = self.store.get(self._key(text))
+        if data is None:
+            return None
+        try:
+            with wave.open(io.BytesIO(data)) as w:
+                rate, channels = w.getframerate(), w.getnchannels()
+                pcm = w.readframes(w.getnframes())
+        except (wave.Error, EOFError):
+            return None
+        step = rate * FRAME_MS // 1000 * channels * 2
+        return [
+            rtc.AudioFrame(
+                data=pcm[i : i + step],
+                sample_rate=rate,
+                num_channels=channels,
+                samples_per_channel=len(pcm[i : i + step]) // (2 * channels),
+            )
+            for i in range(0, len(pcm), step)
+        ]
+
+    def put(self, text: str, frames: Sequence[rtc.AudioFrame]) -> None:
+        """Store the audio of ``text``; frames must share one format."""
+        if not frames:
+            return
+        buf = io.BytesIO()
+        with wave.open(buf, "wb") as w:
+            w.setnchannels(frames[0].num_channels)
+            w.setsampwidth(2)
+            w.setframerate(frames[0].sample_rate)
+            for frame in frames:
+                w.writeframes(frame.data.tobytes())
+        self.store.put(self._key(text), buf.getvalue())
+
+
+class ReplyCache:
+    """
+    Complete LLM replies keyed by model and prompt.
+
+    Only valid for deterministic generation (temperature 0).
+
+    Example:
+        >>> cache = ReplyCache(LLM_REPLY_CACHE_DIR, 16 << 20, "gemma3:4b")
+        >>> key = cache.key([("system", instructions), ("user", question)])
+        >>> cache.get(key) or generate()
+    """
+
+    def __init__(self, directory: str, max_bytes: int, model: str) -> None:
+        """Create the cache; ``directory`` is created on first write."""
+        self.store = DiskLRU(directory, max_bytes, suffix=".txt")
+        self.model = model
+
+    def key(self, messages: Iterable[Tuple[str, str]]) -> str:
+        """Return the key of a prompt given as (role, text) pairs."""
+        return cache_key(self.model, *(f"{role}:{normalize_text(text)}" for role, text in messages))
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached reply, or None."""
+        data = self.store.get(key)
+        return data.decode("utf-8") if data is not None else None
+
+    def put(self, key: str, reply: str) -> None:
+        """Store a complete reply."""
+        if reply.strip():
+            self.store.put(key, reply.encode("utf-8"))
+
+
+def write_in_background(put: Callable[..., None], *args) -> asyncio.Future:
+    """
+    Run the cache write ``put(*args)`` on the default executor without waiting for it.
+
+    The future is referenced until it is done, and a failed write (disk
+    full, permissions) is logged as a warning instead of surfacing as
+    "Future exception was never retrieved". Must be called from the event loop.
+    """
+    future = asyncio.get_running_loop().run_in_executor(None, put, *args)
+    _pending_writes.add(future)
+    future.add_done_callback(_write_done)
+    return future
+
+
+def _write_done(future: asyncio.Future) -> None:
+    """Forget a finished cache write and log its error, if any."""
+    _pending_writes.discard(future)
+    if not future.cancelled() and future.exception() is not None:
+        logger.warning(f"Response cache write failed: {future.exception()!r}")
+
+
+def chat_messages(chat_ctx) -> List[Tuple[str, str]]:
+    """Return the items of a LiveKit ``ChatContext`` as (role, text) pairs for :meth:`ReplyCache.key`."""
+    messages = []
+    for item in chat_ctx.items:
+        if item.type == "message":
+            messages.append((item.role, item.text_content or ""))
+        else:
+            # function calls and their outputs are part of the prompt too
+            messages.append((item.type, str(getattr(item, "arguments", None) or getattr(item, "output", ""))))
+    return messages
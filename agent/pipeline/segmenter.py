@@ -0,0 +1,142 @@
+"""
+Split a streamed LLM reply into speakable clauses.
+
+Kokoro synthesizes a whole request before returning audio, so the first
+audio of a turn can only start once the first text segment is complete.
+``ClauseSegmenter`` therefore releases the *first* segment at the earliest
+clause boundary (comma, semicolon, colon, dash or sentence end) once it has
+a few words, and later segments at sentence boundaries, merging very short
+sentences so the TTS is not flooded with tiny requests.
+
+See: docs/services/agent.md#sentence-streaming-tts
+"""
+
+import re
+from typing import AsyncIterable, AsyncIterator, List, Optional
+
+# punctuation followed by whitespace; "3.5" and "e.g.x" are not boundaries
+_SENTENCE_END = re.compile(r"[.!?…]+[\"')\]]*\s+")
+_CLAUSE_END = re.compile(r"(?:[,;:]|\s[-–—])[\"')\]]*\s+")
+
+_ABBREVIATIONS = frozenset({
+    "mr.", "mrs.", "ms.", "dr.", "prof.", "sr.", "jr.", "st.", "vs.", "etc.",
+    "e.g.", "i.e.", "approx.", "no.", "fig.",
+})
+
+
+def _is_abbreviation(text: str, end: int) -> bool:
+    """Return True if the punctuation ending at ``end`` closes an abbreviation."""
+    start = text.rfind(" ", 0, end) + 1
+    return text[start:end].lower() in _ABBREVIATIONS
+
+
+class ClauseSegmenter:
+    """
+    Incremental text segmenter for sentence-level TTS streaming.
+
+    Attributes:
+        first_min_words: Words the first segment needs before it may be
+            flushed at a clause boundary.
+        min_chars: Later sentences shorter than this are merged with the
+            next one.
+        max_chars: Segments longer than this are split at the last space.
+
+    Example:
+        >>> seg = ClauseSegmenter(first_min_words=3)
+        >>> seg.push("Sure, the weather today is sunny, with a light")
+        ['Sure, the weather today is sunny,']
+        >>> seg.push(" breeze. Anything else?")
+        []
+        >>> seg.flush()
+        'with a light breeze. Anything else?'
+
+    See Also:
+        docs/services/agent.md#sentence-streaming-tts
+    """
+
+    def __init__(self, first_min_words: int = 3, min_chars: int = 40, max_chars: int = 250) -> None:
+        """
+        Initialize an empty segmenter for one reply.
+
+        Args:
+            first_min_words: Minimum words of the first segment.
+            min_chars: Minimum characters of every later segment.
+            max_chars: Hard upper bound of a segment.
+        """
+        self.first_min_words = first_min_words
+        self.min_chars = min_chars
+        self.max_chars = max_chars
+        self.segments = 0
+        self._buffer = ""
+
+    def _boundary(self, pattern: "re.Pattern[str]", min_len: int, min_words: int) -> Optional[int]:
+        """Return the end of the first acceptable boundary in the buffer."""
+        for match in pattern.finditer(self._buffer):
+            end = match.end()
+            head = self._buffer[:end].strip()
+            if len(head) < min_len or len(head.split()) < min_words:
+                continue
+            if pattern is _SENTENCE_END and _is_abbreviation(self._buffer, match.start() + 1):
+                continue
+            return end
+        return None
+
+    def _cut(self, end: int) -> str:
+        """Remove and return the first ``end`` characters of the buffer."""
+        segment, self._buffer = self._buffer[:end].strip(), self._buffer[end:].lstrip()
+        self.segments += 1
+        return segment
+
+    def push(self, text: str) -> List[str]:
+        """
+        Add streamed text and return the segments that are now complete.
+
+        Args:
+            text: Next chunk of the LLM reply (any length, may split words).
+
+        Returns:
+            Zero or more segments ready for synthesis, in order.
+        """
+        self._buffer += text
+        ready = []
+        while True:
+            if self.segments == 0:
+                end = self._boundary(_CLAUSE_END, 0, self.first_min_words)
+                sentence_end = self._boundary(_SENTENCE_END, 0, 1)
+                if sentence_end is not None and (end is None or sentence_end < end):
+                    end = sentence_end
+            else:
+                end = self._boundary(_SENTENCE_END, self.min_chars, 1)
+            if end is None and len(self._buffer) > self.max_chars:
+                end = self._buffer.rfind(" ", 0, self.max_chars) + 1 or self.max_chars
+            if end is None:
+                return ready
+            segment = self._cut(end)
+            if segment:
+                ready.append(segment)
+
+    def flush(self) -> Optional[str]:
+        """Return whatever text is left at the end of the reply, if any."""
+        if not self._buffer.strip():
+            self._buffer = ""
+            return None
+        return self._cut(len(self._buffer))
+
+
+async def segment_stream(text: AsyncIterable[str], segmenter: ClauseSegmenter) -> AsyncIterator[str]:
+    """
+    Re-chunk an LLM text stream into speakable segments.
+
+    Args:
+        text: Streamed reply text, as received by ``Agent.tts_node``.
+        segmenter: Fresh segmenter for this reply.
+
+    Yields:
+        Segments in reply order; the remainder is yielded when ``text`` ends.
+    """
+    async for chunk in text:
+        for segment in segmenter.push(chunk):
+            yield segment
+    rest = segmenter.flush()
+    if rest:
+        yield rest
@@ -0,0 +1,159 @@
+"""
+Pipelined, segment-by-segment speech synthesis.
+
+``groq.TTS`` talks to Kokoro's non-streaming ``/audio/speech`` endpoint, so
+each request returns audio only after the whole text is synthesized.
+``PipelinedSynthesizer`` sends every segment from
+:func:`pipeline.segmenter.segment_stream` as its own request and keeps up to
+``max_concurrency`` requests in flight. Sentence N+1 is synthesized while
+sentence N is playing, and audio frames are still yielded strictly in reply
+order. With an ``AudioCache``, segments heard before are played from disk
+instead of being sent to Kokoro.
+
+See: docs/services/agent.md#sentence-streaming-tts
+"""
+
+import asyncio
+import contextlib
+import logging
+import time
+from typing import AsyncIterable, AsyncIterator, Dict, List, Optional
+
+from livekit import rtc
+from livekit.agents import tts as agents_tts
+
+from .response_cache import AudioCache, write_in_background
+
+logger = logging.getLogger("local-agent")
+
+# Marks the end of one segment's audio in its frame queue
+_END = None
+
+
+class PipelinedSynthesizer:
+    """
+    Synthesizes text segments concurrently and plays them back in order.
+
+    One instance serves one reply. The time of the first audio frame is
+    recorded so the agent can report time-to-first-audio per turn.
+
+    Attributes:
+        max_concurrency: Segments in flight at the same time, counting the
+            one playing; 2 synthesizes sentence N+1 while N plays.
+        first_audio_at: ``time.perf_counter()`` of the first frame, or None.
+        first_segment: Text of the first segment, for logging.
+        cache_hits: Segments of this reply played from the audio cache.
+        cache_misses: Cacheable segments that had to be synthesized.
+        cancelled_segments: Segments whose synthesis was still running when
+            the reply was interrupted.
+        cancelled_chars: Characters of those segments.
+
+    Example:
+        >>> synth = PipelinedSynthesizer(self.tts, max_concurrency=2)
+        >>> async for frame in synth.run(segment_stream(text, ClauseSegmenter())):
+        ...     yield frame
+
+    See Also:
+        docs/services/agent.md#sentence-streaming-tts
+    """
+
+    def __init__(
+        self, tts: agents_tts.TTS, max_concurrency: int = 2, cache: Optional[AudioCache] = None
+    ) -> None:
+        """
+        Initialize the synthesizer for one reply.
+
+        Args:
+            tts: TTS plugin used for every segment.
+            max_concurrency: Upper bound on parallel synthesis requests.
+            cache: Optional audio cache checked before each request.
+        """
+        self._tts = tts
+        self._cache = cache
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.max_concurrency = max(1, max_concurrency)
+        self.first_audio_at: Optional[float] = None
+        self.first_segment: Optional[str] = None
+        self.segments = 0
+        self.cancelled_segments = 0
+        self.cancelled_chars = 0
+
+    async def _synthesize(self, text: str, frames: "asyncio.Queue[Optional[rtc.AudioFrame]]") -> None:
+        """Synthesize one segment into its frame queue."""
+        cache = self._cache if self._cache is not None and self._cache.cacheable(text) else None
+        loop = asyncio.get_running_loop()
+        try:
+            if cache is not None:
+                cached = await loop.run_in_executor(None, cache.get, text)
+                if cached is not None:
+                    self.cache_hits += 1
+                    for frame in cached:
+                        frames.put_nowait(frame)
+                    return
+                self.cache_misses += 1
+
+            synthesized: List[rtc.AudioFrame] = []
+            async with self._tts.synthesize(text) as stream:
+                async for audio in stream:
+                    frames.put_nowait(audio.frame)
+                    synthesized.append(audio.frame)
+            if cache is not None:
+                # only complete segments are stored; the write does not delay playback
+                write_in_background(cache.put, text, synthesized)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # a failed sentence is skipped rather than ending the reply
+            logger.warning(f"TTS failed for segment {text[:40]!r}: {e}")
+        finally:
+            frames.put_nowait(_END)
+
+    async def run(self, segments: AsyncIterable[str]) -> AsyncIterator[rtc.AudioFrame]:
+        """
+        Synthesize ``segments`` and yield their audio frames in order.
+
+        Args:
+            segments: Speakable segments of the reply.
+
+        Yields:
+            Audio frames, segment after segment.
+        """
+        slots = asyncio.Semaphore(self.max_concurrency)
+        pending: "asyncio.Queue[Optional[asyncio.Queue]]" = asyncio.Queue()
+        tasks: Dict[asyncio.Task, str] = {}
+
+        async def feed() -> None:
+            try:
+                async for text in segments:
+                    if self.first_segment is None:
+                        self.first_segment = text
+                    self.segments += 1
+                    frames: "asyncio.Queue[Optional[rtc.AudioFrame]]" = asyncio.Queue()
+                    # a slot is held until the segment has been played back
+                    await slots.acquire()
+                    tasks[asyncio.create_task(self._synthesize(text, frames))] = text
+                    pending.put_nowait(frames)
+            finally:
+                pending.put_nowait(_END)
+
+        feeder = asyncio.create_task(feed())
+        try:
+            while (frames := await pending.get()) is not _END:
+                while (frame := await frames.get()) is not _END:
+                    if self.first_audio_at is None:
+                        self.first_audio_at = time.perf_counter()
+                    yield frame
+                slots.release()
+            await feeder
+        finally:
+            # interrupted replies must not leave synthesis running
+            for task, text in tasks.items():
+                if not task.done():
+                    self.cancelled_segments += 1
+                    self.cancelled_chars += len(text)
+            for task in [feeder, *tasks]:
+                task.cancel()
+            for task in [feeder, *tasks]:
+                with contextlib.suppress(asyncio.CancelledError, Exception):
+                    await task
@@ -0,0 +1,96 @@
+"""
+Retrieval-augmented generation (RAG) components for the Agent service.
+
+The modules in this package turn the files in ``agent/docs`` into an
+embedding index and serve lookups for ``LocalAgent.on_user_turn_completed``.
+
+Exports are imported on first access, so ``import rag`` is free and faiss,
+numpy and the model backends are only loaded by the code that uses them,
+normally the RAG loader thread started in prewarm.
+
+See: docs/services/agent.md#rag-system-implementation
+See: docs/architecture.md#rag-retrieval-augmented-generation-flow
+"""
+
+import importlib
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from . import shared
+    from .corpus import Passage, estimate_tokens, ingest, normalize_query
+    from .embedder import BatchingEmbedder
+    from .hot_reload import CorpusReloader
+    from .indexes import INDEX_BUILDERS, IndexSpec, build_index
+    from .lexical import BM25Index, reciprocal_rank_fusion
+    from .loader import BackgroundLoad
+    from .models import OnnxCrossEncoder, embedding_cache_key, load_embedding_model
+    from .prefetch import SpeculativePrefetcher
+    from .query_cache import QueryCache
+    from .rerank import Reranker
+    from .retriever import Retriever, build_retriever
+    from .store import EmbeddingStore
+
+# export name -> submodule that defines it
+_EXPORTS = {
+    "BM25Index": "lexical",
+    "BackgroundLoad": "loader",
+    "BatchingEmbedder": "embedder",
+    "CorpusReloader": "hot_reload",
+    "EmbeddingStore": "store",
+    "INDEX_BUILDERS": "indexes",
+    "IndexSpec": "indexes",
+    "OnnxCrossEncoder": "models",
+    "Passage": "corpus",
+    "QueryCache": "query_cache",
+    "Reranker": "rerank",
+    "Retriever": "retriever",
+    "SpeculativePrefetcher": "prefetch",
+    "build_index": "indexes",
+    "build_retriever": "retriever",
+    "embedding_cache_key": "models",
+    "estimate_tokens": "corpus",
+    "ingest": "corpus",
+    "load_embedding_model": "models",
+    "normalize_query": "corpus",
+    "reciprocal_rank_fusion": "lexical",
+}
+
+__all__ = [
+    "BM25Index",
+    "BackgroundLoad",
+    "BatchingEmbedder",
+    "CorpusReloader",
+    "EmbeddingStore",
+    "INDEX_BUILDERS",
+    "IndexSpec",
+    "OnnxCrossEncoder",
+    "Passage",
+    "QueryCache",
+    "Reranker",
+    "Retriever",
+    "SpeculativePrefetcher",
+    "build_index",
+    "build_retriever",
+    "embedding_cache_key",
+    "estimate_tokens",
+    "ingest",
+    "load_embedding_model",
+    "normalize_query",
+    "reciprocal_rank_fusion",
+]
+
+
+def __getattr__(name: str):
+    if name == "shared":
+        return importlib.import_module(".shared", __name__)
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    # cache it, so later accesses skip __getattr__
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted([*globals(), *__all__])
@@ -0,0 +1,176 @@
+"""
+Document ingestion: loading ``agent/docs`` and splitting it into passages.
+
+Whole files are far too large to paste into a gemma3:4b prompt on every
+turn, so each document is split into overlapping passages of bounded size.
+Every passage remembers the file it came from and its character offsets,
+which is what retrieval returns and what the prompt cites.
+
+See: docs/services/agent.md#document-processing
+"""
+
+import logging
+import math
+import os
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+logger = logging.getLogger("local-agent.rag")
+
+# Rough characters-per-token ratio for English text with SentencePiece/BPE
+# tokenizers; good enough to budget prompt size without loading a tokenizer.
+CHARS_PER_TOKEN = 4
+
+_WORD_RE = re.compile(r"\S+")
+_QUERY_WORD_RE = re.compile(r"\w+")
+_SENTENCE_END_RE = re.compile(r"[.!?:;]['\")\]]*$")
+
+
+@dataclass(frozen=True)
+class Passage:
+    """
+    A contiguous slice of a source document.
+
+    Attributes:
+        source: File name of the document, relative to the docs directory.
+        start: Character offset of the passage in the document.
+        end: Character offset one past the end of the passage.
+        text: The passage text, ``document[start:end]``.
+    """
+
+    source: str
+    start: int
+    end: int
+    text: str
+
+    @property
+    def tokens(self) -> int:
+        """Estimated token count of the passage."""
+        return estimate_tokens(self.text)
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the LLM token count of ``text`` from its length."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def normalize_query(text: str) -> str:
+    """Lower-case ``text`` and reduce it to space-separated words."""
+    return " ".join(_QUERY_WORD_RE.findall(text.lower()))
+
+
+def load_documents(docs_dir: str) -> Dict[str, str]:
+    """
+    Read every text file in ``docs_dir``.
+
+    Args:
+        docs_dir: Directory containing the RAG documents.
+
+    Returns:
+        Mapping of file name to content, ordered by file name so passage ids
+        and cached index snapshots are stable across restarts. Missing
+        directories yield an empty mapping.
+    """
+    documents: Dict[str, str] = {}
+    if not os.path.isdir(docs_dir):
+        return documents
+    for fn in sorted(os.listdir(docs_dir)):
+        path = os.path.join(docs_dir, fn)
+        if not os.path.isfile(path) or fn.startswith("."):
+            continue
+        try:
+            with open(path, encoding="utf-8") as f:
+                documents[fn] = f.read()
+        except (OSError, UnicodeDecodeError) as e:
+            logger.warning(f"Skipping unreadable document {path}: {e}")
+    return documents
+
+
+def chunk_document(
+    source: str, text: str, chunk_tokens: int, overlap_tokens: int
+) -> List[Passage]:
+    """
+    Split a document into overlapping passages on word boundaries.
+
+    Passages grow word by word up to ``chunk_tokens``. When a sentence ends in
+    the last third of the window the passage is cut there instead, so most
+    passages end on a full sentence. The next passage starts
+    ``overlap_tokens`` before the end of the previous one, so a fact spanning
+    a boundary is fully contained in at least one passage.
+
+    Args:
+        source: Name of the document, stored on every passage.
+        text: Document content.
+        chunk_tokens: Maximum estimated tokens per passage.
+        overlap_tokens: Estimated tokens shared between neighbouring passages.
+
+    Returns:
+        Passages in document order. Empty or whitespace-only documents yield
+        no passages.
+
+    Raises:
+        ValueError: If ``overlap_tokens`` is not smaller than ``chunk_tokens``.
+    """
+    if overlap_tokens >= chunk_tokens:
+        raise ValueError("overlap_tokens must be smaller than chunk_tokens")
+
+    words: List[Tuple[int, int]] = [m.span() for m in _WORD_RE.finditer(text)]
+    if not words:
+        return []
+
+    max_chars = chunk_tokens * CHARS_PER_TOKEN
+    overlap_chars = overlap_tokens * CHARS_PER_TOKEN
+    passages: List[Passage] = []
+    first = 0
+    while first < len(words):
+        start = words[first][0]
+        last = first
+        while last + 1 < len(words) and words[last + 1][1] - start <= max_chars:
+            last += 1
+
+        if last + 1 < len(words):
+            # Prefer ending on a sentence boundary in the last third of the window
+            min_end = start + (2 * max_chars) // 3
+            for candidate in range(last, first, -1):
+                if words[candidate][1] < min_end:
+                    break
+                ws, we = words[candidate]
+                if _SENTENCE_END_RE.search(text[ws:we]):
+                    last = candidate
+                    break
+
+        end = words[last][1]
+        passages.append(Passage(source, start, end, text[start:end]))
+        if last + 1 >= len(words):
+            break
+
+        next_first = last + 1
+        while next_first - 1 > first and end - words[next_first - 1][0] <= overlap_chars:
+            next_first -= 1
+        first = next_first
+    return passages
+
+
+def ingest(docs_dir: str, chunk_tokens: int, overlap_tokens: int) -> List[Passage]:
+    """
+    Load and chunk the whole corpus.
+
+    Args:
+        docs_dir: Directory containing the RAG documents.
+        chunk_tokens: Maximum estimated tokens per passage.
+        overlap_tokens: Estimated tokens shared between neighbouring passages.
+
+    Returns:
+        All passages of all documents; the list position is the passage id
+        used in the FAISS index.
+
+    See Also:
+        chunk_document: Splitting of a single document.
+    """
+    passages: List[Passage] = []
+    documents = load_documents(docs_dir)
+    for source, text in documents.items():
+        passages.extend(chunk_document(source, text, chunk_tokens, overlap_tokens))
+    logger.info(f"Ingested {len(documents)} documents into {len(passages)} passages")
+    return passages
@@ -0,0 +1,184 @@
+"""
+Micro-batching query embedding service.
+
+Each ``rag_lookup`` used to call ``embed_model.encode([query])`` through the
+default thread pool, so under load dozens of single-item encodes competed for
+the pool and the GIL. ``BatchingEmbedder`` is the one embedding service of a
+worker process: concurrent requests from all sessions are queued, collected
+into micro-batches bounded by a maximum size and a maximum wait window, and
+encoded together on a dedicated, sized executor.
+
+See: docs/services/agent.md#embedding-service
+"""
+
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger("local-agent.rag")
+
+_Request = Tuple[str, "asyncio.Future[np.ndarray]"]
+
+
+class BatchingEmbedder:
+    """
+    Process-wide embedding service that batches concurrent queries.
+
+    The batching task is started lazily on the event loop of the first
+    caller. A batch is dispatched as soon as ``max_batch`` requests are
+    queued or ``max_wait`` seconds have passed since the first one, so a
+    lone request waits at most ``max_wait`` and a burst is encoded in one
+    model call.
+
+    Attributes:
+        max_batch: Largest number of texts encoded in one call.
+        max_wait: Seconds to wait for more requests after the first one.
+        batches: Number of encode calls made.
+        requests: Number of texts embedded.
+
+    Example:
+        >>> embedder = BatchingEmbedder(embed_model.encode, max_batch=32)
+        >>> q_emb = await embedder.embed("what can you do")  # shape (1, dim)
+
+    See Also:
+        docs/services/agent.md#embedding-service
+    """
+
+    def __init__(
+        self,
+        encode: Callable[[List[str]], np.ndarray],
+        max_batch: int = 32,
+        max_wait: float = 0.004,
+        threads: int = 1,
+    ) -> None:
+        """
+        Initialize the service; no thread or task is started yet.
+
+        Args:
+            encode: Function encoding a list of texts into a float32 matrix.
+            max_batch: Upper bound on texts per encode call.
+            max_wait: Maximum seconds a request waits for batch companions.
+            threads: Size of the dedicated encode executor. One thread is
+                usually best; the model already uses intra-op parallelism.
+        """
+        self._encode = encode
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.batches = 0
+        self.requests = 0
+        self._executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="embed")
+        self._queue: Optional["asyncio.Queue[_Request]"] = None
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # queue.get() still waiting when the last batch closed; reused, never cancelled
+        self._getter: Optional["asyncio.Future[_Request]"] = None
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        """The dedicated executor encodes run on."""
+        return self._executor
+
+    def _ensure_started(self) -> "asyncio.Queue[_Request]":
+        """Start the batching task on the running loop if needed."""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._task is None or self._task.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._getter = None
+            self._task = loop.create_task(self._run(self._queue))
+        return self._queue
+
+    async def embed(self, text: str) -> np.ndarray:
+        """
+        Embed one query, batched with concurrent callers.
+
+        Args:
+            text: Query text.
+
+        Returns:
+            Float32 array of shape ``(1, dim)``, like ``encode([text])``.
+
+        Raises:
+            Exception: Whatever the encode function raised for the batch.
+        """
+        queue = self._ensure_started()
+        future: "asyncio.Future[np.ndarray]" = asyncio.get_running_loop().create_future()
+        queue.put_nowait((text, future))
+        return await future
+
+    async def _next(self, queue: "asyncio.Queue[_Request]", timeout: Optional[float]) -> Optional[_Request]:
+        """
+        Return the next request, or None if none arrived within ``timeout``.
+
+        ``asyncio.wait_for(queue.get(), timeout)`` can cancel a ``get()`` that
+        has already taken an item, losing that request (Python <= 3.11). The
+        ``get()`` is awaited with ``asyncio.wait`` instead, which never cancels
+        it; on timeout it stays pending and is picked up by the next call.
+        """
+        if self._getter is None:
+            try:
+                return queue.get_nowait()
+            except asyncio.QueueEmpty:
+                self._getter = asyncio.ensure_future(queue.get())
+        done, _ = await asyncio.wait({self._getter}, timeout=timeout)
+        if not done:
+            return None
+        request, self._getter = self._getter.result(), None
+        return request
+
+    async def _collect(self, queue: "asyncio.Queue[_Request]") -> List[_Request]:
+        """Wait for one request, then gather more until size or time runs out."""
+        batch = [await self._next(queue, None)]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            request = await self._next(queue, remaining)
+            if request is None:
+                break
+            batch.append(request)
+        return batch
+
+    async def _run(self, queue: "asyncio.Queue[_Request]") -> None:
+        """Batching loop: collect, encode on the executor, resolve futures."""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect(queue)
+            # requests whose caller gave up (e.g. a cancelled prefetch) are dropped
+            batch = [(text, fut) for text, fut in batch if not fut.done()]
+            if not batch:
+                continue
+            texts = [text for text, _ in batch]
+            try:
+                embs = await loop.run_in_executor(self._executor, self._encode, texts)
+                embs = np.asarray(embs, dtype=np.float32)
+            except Exception as e:
+                logger.warning(f"Embedding batch of {len(texts)} failed: {e}")
+                for _, fut in batch:
+                    if not fut.done():
+                        fut.set_exception(e)
+                continue
+            self.batches += 1
+            self.requests += len(texts)
+            for i, (_, fut) in enumerate(batch):
+                if not fut.done():
+                    fut.set_result(embs[i : i + 1])
+
+    async def aclose(self) -> None:
+        """Stop the batching task and shut the executor down."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._getter is not None:
+            self._getter.cancel()
+            self._getter = None
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,301 @@
+"""
+Incremental hot-reload of the ``agent/docs`` corpus.
+
+Editing the docs used to require restarting the agent and dropping every
+call in flight. ``CorpusReloader`` polls the docs directory, and for each
+added, modified or deleted file re-chunks and re-embeds only that file. The
+new passages are applied to a *copy* of the live index with
+``add_with_ids``/``remove_ids`` on a background thread, and the finished
+retriever is handed to a swap callback. Lookups in flight keep using the
+retriever they started with, so they never see a half-built index and never
+wait for the rebuild.
+
+Changed passages are embedded through the ``EmbeddingStore``, so their
+vectors are cached and a restart does not embed them again. Indexes without
+id removal or ``add_with_ids`` (HNSW) are detected before anything is
+embedded and rebuilt from the embedding cache instead, which still only
+embeds the changed passages, once.
+
+See: docs/services/agent.md#hot-reload
+"""
+
+import hashlib
+import logging
+import os
+import threading
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+import faiss
+import numpy as np
+
+from .corpus import Passage, chunk_document, load_documents
+from .indexes import IndexSpec
+from .retriever import Retriever, build_retriever
+from .store import EmbeddingStore, EncodeFn
+
+logger = logging.getLogger("local-agent.rag")
+
+# (mtime_ns, size) of a docs file, used to skip reading unchanged files
+_Signature = Tuple[int, int]
+
+
+@dataclass
+class CorpusChanges:
+    """Sources that differ between two scans of the docs directory."""
+
+    added: Dict[str, str] = field(default_factory=dict)
+    modified: Dict[str, str] = field(default_factory=dict)
+    deleted: List[str] = field(default_factory=list)
+
+    def __bool__(self) -> bool:
+        """Return True if anything changed."""
+        return bool(self.added or self.modified or self.deleted)
+
+
+def _signatures(docs_dir: str) -> Dict[str, _Signature]:
+    """Return the stat signature of every document file."""
+    signatures = {}
+    if not os.path.isdir(docs_dir):
+        return signatures
+    for fn in os.listdir(docs_dir):
+        path = os.path.join(docs_dir, fn)
+        if fn.startswith(".") or not os.path.isfile(path):
+            continue
+        st = os.stat(path)
+        signatures[fn] = (st.st_mtime_ns, st.st_size)
+    return signatures
+
+
+def _hash(text: str) -> str:
+    """Return the content hash of a document."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class CorpusReloader:
+    """
+    Watches the docs directory and produces updated retrievers.
+
+    The reloader owns the id bookkeeping of the live corpus: which passage
+    ids belong to which source file, and the next free id. It runs a daemon
+    polling thread; all index work happens on that thread.
+
+    Attributes:
+        docs_dir: Directory being watched.
+        interval: Seconds between scans.
+        reloads: Number of successful swaps.
+
+    Example:
+        >>> reloader = CorpusReloader(DOCS_DIR, 160, 32, model.encode, spec, 8, 512,
+        ...                           on_swap=set_retriever)
+        >>> reloader.start(retriever)
+
+    See Also:
+        docs/services/agent.md#hot-reload
+    """
+
+    def __init__(
+        self,
+        docs_dir: str,
+        chunk_tokens: int,
+        overlap_tokens: int,
+        encode: EncodeFn,
+        spec: IndexSpec,
+        top_k: int,
+        token_budget: int,
+        on_swap: Callable[[Retriever], None],
+        store: Optional[EmbeddingStore] = None,
+        interval: float = 5.0,
+    ) -> None:
+        """
+        Initialize the reloader; call :meth:`start` to begin watching.
+
+        Args:
+            docs_dir: Directory of the RAG documents.
+            chunk_tokens: Passage size, as used for the initial ingest.
+            overlap_tokens: Passage overlap, as used for the initial ingest.
+            encode: Function encoding a list of texts into a float32 matrix.
+            spec: Index backend of the live retriever.
+            top_k: ``Retriever.top_k`` of rebuilt retrievers.
+            token_budget: ``Retriever.token_budget`` of rebuilt retrievers.
+            on_swap: Called from the reloader thread with each new retriever.
+            store: Embedding cache for changed passages and full rebuilds.
+            interval: Seconds between scans of ``docs_dir``.
+        """
+        self.docs_dir = docs_dir
+        self.chunk_tokens = chunk_tokens
+        self.overlap_tokens = overlap_tokens
+        self.interval = interval
+        self.reloads = 0
+        self._encode = encode
+        self._spec = spec
+        self._top_k = top_k
+        self._token_budget = token_budget
+        self._on_swap = on_swap
+        self._store = store
+        self._retriever: Optional[Retriever] = None
+        self._signatures: Dict[str, _Signature] = {}
+        self._hashes: Dict[str, str] = {}
+        self._source_ids: Dict[str, List[int]] = {}
+        self._next_id = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, retriever: Retriever) -> None:
+        """
+        Adopt the live retriever and start the polling thread.
+
+        Args:
+            retriever: Retriever built from the current contents of
+                ``docs_dir`` (its passage ids are adopted as-is).
+        """
+        self._adopt(retriever)
+        self._signatures = _signatures(self.docs_dir)
+        self._hashes = {source: _hash(text) for source, text in load_documents(self.docs_dir).items()}
+        self._thread = threading.Thread(target=self._run, name="rag-reload", daemon=True)
+        self._thread.start()
+        logger.info(f"Watching {self.docs_dir} for changes every {self.interval:.0f}s")
+
+    def stop(self) -> None:
+        """Stop the polling thread."""
+        self._stop.set()
+
+    def _adopt(self, retriever: Retriever) -> None:
+        """Rebuild the source -> passage id bookkeeping from a retriever."""
+        self._retriever = retriever
+        self._source_ids = {}
+        passages = _as_dict(retriever.passages)
+        for pid, passage in passages.items():
+            self._source_ids.setdefault(passage.source, []).append(pid)
+        self._next_id = max(passages, default=-1) + 1
+
+    def _run(self) -> None:
+        """Polling loop of the reloader thread."""
+        while not self._stop.wait(self.interval):
+            try:
+                changes = self.scan()
+                if changes:
+                    self._apply(changes)
+            except Exception:
+                logger.exception("RAG hot reload failed, keeping the current index")
+
+    def scan(self) -> CorpusChanges:
+        """
+        Compare the docs directory with the live corpus.
+
+        Files whose modification time and size are unchanged are not read.
+        A touched file with identical content is not reported.
+
+        Returns:
+            The added, modified and deleted sources with their new content.
+        """
+        changes = CorpusChanges()
+        signatures = _signatures(self.docs_dir)
+        for source, signature in signatures.items():
+            if self._signatures.get(source) == signature:
+                continue
+            try:
+                with open(os.path.join(self.docs_dir, source), encoding="utf-8") as f:
+                    text = f.read()
+            except (OSError, UnicodeDecodeError) as e:
+                logger.warning(f"Skipping unreadable document {source}: {e}")
+                continue
+            if source not in self._hashes:
+                changes.added[source] = text
+            elif self._hashes[source] != _hash(text):
+                changes.modified[source] = text
+        changes.deleted = [s for s in self._hashes if s not in signatures]
+        self._signatures = signatures
+        return changes
+
+    def _apply(self, changes: CorpusChanges) -> None:
+        """Build a retriever reflecting ``changes`` and swap it in."""
+        current = self._retriever
+        stale_ids = [
+            pid
+            for source in list(changes.modified) + changes.deleted
+            for pid in self._source_ids.get(source, [])
+        ]
+        new_passages: List[Passage] = []
+        for source, text in {**changes.added, **changes.modified}.items():
+            new_passages.extend(chunk_document(source, text, self.chunk_tokens, self.overlap_tokens))
+
+        index = faiss.clone_index(current.index)
+        if _supports_incremental(index):
+            retriever = self._apply_incremental(current, index, stale_ids, new_passages)
+        else:
+            # checked before embedding, so the rebuild does not embed the new passages twice
+            logger.info(f"{type(index).__name__} cannot remove or add ids, rebuilding")
+            retriever = self._rebuild(current, stale_ids, new_passages)
+
+        for source, text in {**changes.added, **changes.modified}.items():
+            self._hashes[source] = _hash(text)
+        for source in changes.deleted:
+            self._hashes.pop(source, None)
+        self._adopt(retriever)
+        self.reloads += 1
+        logger.info(
+            f"Reloaded RAG corpus: {len(changes.added)} added, {len(changes.modified)} modified, "
+            f"{len(changes.deleted)} deleted files; {len(new_passages)} passages embedded, "
+            f"{retriever.index.ntotal} indexed"
+        )
+        self._on_swap(retriever)
+
+    def _embed(self, texts: List[str], dim: int) -> np.ndarray:
+        """Embed ``texts``, through the embedding cache when there is one."""
+        if self._store is None:
+            return np.asarray(self._encode(texts), dtype=np.float32)
+        return self._store.embed(texts, self._encode, dim)
+
+    def _apply_incremental(
+        self, current: Retriever, index: faiss.Index, stale_ids: List[int], new_passages: List[Passage]
+    ) -> Retriever:
+        """Remove/add only the affected passages in ``index``, a copy of the live one."""
+        if stale_ids:
+            index.remove_ids(np.asarray(stale_ids, dtype=np.int64))
+
+        passages = _as_dict(current.passages)
+        for pid in stale_ids:
+            passages.pop(pid, None)
+        if new_passages:
+            new_ids = np.arange(self._next_id, self._next_id + len(new_passages), dtype=np.int64)
+            embeddings = self._embed([p.text for p in new_passages], index.d)
+            index.add_with_ids(embeddings, new_ids)
+            passages.update(zip(new_ids.tolist(), new_passages))
+        return Retriever(index, passages, self._top_k, self._token_budget, spec=self._spec)
+
+    def _rebuild(
+        self, current: Retriever, stale_ids: List[int], new_passages: List[Passage]
+    ) -> Retriever:
+        """Rebuild the whole index; the embedding cache avoids re-embedding."""
+        stale = set(stale_ids)
+        kept = [p for pid, p in sorted(_as_dict(current.passages).items()) if pid not in stale]
+        return build_retriever(
+            kept + new_passages,
+            self._encode,
+            current.index.d,
+            self._spec,
+            top_k=self._top_k,
+            token_budget=self._token_budget,
+            store=self._store,
+        )
+
+
+def _supports_incremental(index: faiss.Index) -> bool:
+    """Return whether ``index`` implements ``remove_ids`` and ``add_with_ids``."""
+    try:
+        # no-op calls: unsupported index types raise without looking at the arguments
+        index.remove_ids(np.zeros(0, dtype=np.int64))
+        index.add_with_ids(np.zeros((0, index.d), dtype=np.float32), np.zeros(0, dtype=np.int64))
+    except RuntimeError:
+        return False
+    return True
+
+
+def _as_dict(passages) -> Dict[int, Passage]:
+    """Return a mutable id -> passage copy of a retriever's passages."""
+    if isinstance(passages, dict):
+        return dict(passages)
+    if hasattr(passages, "items"):
+        return dict(passages.items())
+    return dict(enumerate(passages))
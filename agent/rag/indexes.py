@@ -0,0 +1,190 @@
+"""
+Selectable FAISS index backends for passage retrieval.
+
+``IndexFlatL2`` scans every vector on every query, so latency and memory grow
+linearly with the corpus. For hundreds of thousands of passages an
+approximate index trades a little recall for much lower latency and, with
+product quantization, much lower memory. The backend and its parameters are
+chosen with ``RAG_INDEX_TYPE`` and the ``RAG_IVF_*``/``RAG_HNSW_*``/
+``RAG_PQ_*`` settings; ``agent/benchmarks/ann_report.py`` measures the
+recall-vs-latency trade-off on the real corpus.
+
+Backends:
+    flat      exact brute-force L2 search (default)
+    ivf_flat  inverted file over k-means cells, full vectors
+    hnsw      hierarchical navigable small-world graph, full vectors
+    ivf_pq    inverted file with product-quantized vectors
+
+See: docs/services/agent.md#index-backends
+"""
+
+import logging
+import math
+from dataclasses import dataclass
+from typing import Callable, Dict
+
+import faiss
+import numpy as np
+
+logger = logging.getLogger("local-agent.rag")
+
+# k-means needs about this many training points per IVF cell to be stable
+MIN_POINTS_PER_CELL = 39
+
+
+@dataclass(frozen=True)
+class IndexSpec:
+    """
+    Backend choice and parameters of the passage index.
+
+    Attributes:
+        kind: One of ``INDEX_BUILDERS``.
+        nlist: Number of IVF cells; 0 picks ``4 * sqrt(n)`` at build time.
+        nprobe: IVF cells visited per query (recall vs latency).
+        hnsw_m: Graph neighbours per HNSW node (recall vs memory).
+        ef_construction: HNSW candidate list size while building.
+        ef_search: HNSW candidate list size per query (recall vs latency).
+        pq_m: Sub-quantizers for IVF-PQ; must divide the embedding dimension.
+        pq_nbits: Bits per sub-quantizer code for IVF-PQ.
+    """
+
+    kind: str = "flat"
+    nlist: int = 0
+    nprobe: int = 8
+    hnsw_m: int = 32
+    ef_construction: int = 80
+    ef_search: int = 64
+    pq_m: int = 16
+    pq_nbits: int = 8
+
+    @property
+    def key(self) -> str:
+        """Identifier of the build parameters, used to fingerprint snapshots."""
+        if self.kind == "ivf_flat":
+            return f"ivf_flat:nlist={self.nlist}"
+        if self.kind == "hnsw":
+            return f"hnsw:m={self.hnsw_m},efc={self.ef_construction}"
+        if self.kind == "ivf_pq":
+            return f"ivf_pq:nlist={self.nlist},m={self.pq_m},nbits={self.pq_nbits}"
+        return "flat:idmap"
+
+
+def _nlist_for(spec: IndexSpec, n: int) -> int:
+    """Return the IVF cell count for ``n`` vectors, bounded by training data."""
+    nlist = spec.nlist or int(4 * math.sqrt(n))
+    return max(1, min(nlist, n // MIN_POINTS_PER_CELL))
+
+
+def _build_flat(spec: IndexSpec, embeddings: np.ndarray) -> faiss.Index:
+    """
+    Build an exact ``IndexFlatL2`` behind an ``IndexIDMap2``.
+
+    A bare flat index identifies vectors by position, so removing one would
+    renumber all later passages. The id map keeps passage ids stable across
+    incremental add/remove (see ``rag.hot_reload``); IVF indexes support ids
+    natively.
+    """
+    index = faiss.IndexIDMap2(faiss.IndexFlatL2(embeddings.shape[1]))
+    index.add_with_ids(embeddings, np.arange(len(embeddings), dtype=np.int64))
+    return index
+
+
+def _build_ivf_flat(spec: IndexSpec, embeddings: np.ndarray) -> faiss.Index:
+    """Build and train an ``IndexIVFFlat``."""
+    dim = embeddings.shape[1]
+    index = faiss.IndexIVFFlat(faiss.IndexFlatL2(dim), dim, _nlist_for(spec, len(embeddings)))
+    index.train(embeddings)
+    index.add(embeddings)
+    return index
+
+
+def _build_hnsw(spec: IndexSpec, embeddings: np.ndarray) -> faiss.Index:
+    """Build an ``IndexHNSWFlat``."""
+    index = faiss.IndexHNSWFlat(embeddings.shape[1], spec.hnsw_m)
+    index.hnsw.efConstruction = spec.ef_construction
+    index.add(embeddings)
+    return index
+
+
+def _build_ivf_pq(spec: IndexSpec, embeddings: np.ndarray) -> faiss.Index:
+    """Build and train an ``IndexIVFPQ``."""
+    dim = embeddings.shape[1]
+    if dim % spec.pq_m:
+        raise ValueError(f"RAG_PQ_M={spec.pq_m} must divide the embedding dimension {dim}")
+    index = faiss.IndexIVFPQ(
+        faiss.IndexFlatL2(dim), dim, _nlist_for(spec, len(embeddings)), spec.pq_m, spec.pq_nbits
+    )
+    index.train(embeddings)
+    index.add(embeddings)
+    return index
+
+
+INDEX_BUILDERS: Dict[str, Callable[[IndexSpec, np.ndarray], faiss.Index]] = {
+    "flat": _build_flat,
+    "ivf_flat": _build_ivf_flat,
+    "hnsw": _build_hnsw,
+    "ivf_pq": _build_ivf_pq,
+}
+
+
+def _min_vectors(spec: IndexSpec) -> int:
+    """Return the smallest corpus ``spec`` can be trained on."""
+    if spec.kind == "ivf_flat":
+        return MIN_POINTS_PER_CELL
+    if spec.kind == "ivf_pq":
+        # every PQ codebook has 2**nbits centroids to train
+        return (1 << spec.pq_nbits) * MIN_POINTS_PER_CELL
+    return 0
+
+
+def effective_spec(spec: IndexSpec, n: int) -> IndexSpec:
+    """
+    Return the spec that will actually be built for ``n`` vectors.
+
+    Trained backends need enough vectors to learn their quantizers; a corpus
+    that is too small falls back to the exact flat index, which is also the
+    fastest choice at that size.
+
+    Raises:
+        ValueError: If ``spec.kind`` is not a known backend.
+    """
+    if spec.kind not in INDEX_BUILDERS:
+        raise ValueError(
+            f"Unknown RAG_INDEX_TYPE {spec.kind!r}, expected one of {sorted(INDEX_BUILDERS)}"
+        )
+    if n < _min_vectors(spec):
+        logger.info(f"{n} vectors are too few to train {spec.kind}, using flat index")
+        return IndexSpec(kind="flat")
+    return spec
+
+
+def build_index(spec: IndexSpec, embeddings: np.ndarray) -> faiss.Index:
+    """
+    Build the index described by ``spec`` and apply its search parameters.
+
+    Args:
+        spec: Backend and parameters; see :func:`effective_spec` for fallbacks.
+        embeddings: Matrix of shape ``(n, dim)``; row ``i`` gets id ``i``.
+
+    Returns:
+        A ready-to-search FAISS index.
+    """
+    embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+    spec = effective_spec(spec, len(embeddings))
+    index = INDEX_BUILDERS[spec.kind](spec, embeddings)
+    configure_search(index, spec)
+    return index
+
+
+def configure_search(index: faiss.Index, spec: IndexSpec) -> None:
+    """
+    Apply query-time parameters to an index.
+
+    Search parameters are cheap to change and not part of the snapshot
+    fingerprint, so they are re-applied after loading a cached index.
+    """
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.nprobe = min(spec.nprobe, ivf.nlist)
+    if isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = spec.ef_search
@@ -0,0 +1,271 @@
+"""
+BM25 keyword search over the RAG passages.
+
+MiniLM embeddings place "error E-1042" close to every other error message,
+and model names, version numbers and codes that users read out loud hardly
+move the query vector at all. ``BM25Index`` is an inverted index over the
+same passages as the FAISS index, kept in flat arrays that can be saved
+next to a shared corpus and memory-mapped. ``Retriever`` fuses its ranking
+with the vector ranking by reciprocal rank fusion. When a query carries an
+identifier that a BM25 hit contains verbatim, that hit is returned
+directly, without an embedding call.
+
+Tokens are lower-cased runs of letters and digits. A compound like
+``gemma3:4b``, ``e-1042`` or ``v1.2`` is indexed both whole and split into
+its parts, so that "E 1042" and "E-1042" match alike.
+
+See: docs/services/agent.md#hybrid-retrieval
+"""
+
+import bisect
+import math
+import mmap
+import os
+import re
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+_COMPOUND_RE = re.compile(r"[a-z0-9]+(?:[-_.:/][a-z0-9]+)*")
+_PART_RE = re.compile(r"[a-z0-9]+")
+
+# Files written by BM25Index.save
+_TERMS_FILE = "terms.txt"
+_TERM_OFFSETS_FILE = "term_offsets.npy"
+_OFFSETS_FILE = "postings_offsets.npy"
+_POSTINGS_FILE = "postings.npy"
+_DOCS_FILE = "docs.npy"
+
+_POSTING_DTYPE = np.dtype([("row", np.int32), ("tf", np.int32)])
+_DOC_DTYPE = np.dtype([("id", np.int64), ("length", np.int32)])
+
+# Function words carry no signal in BM25 and are frequent in spoken queries
+STOPWORDS = frozenset(
+    "a an and are as at be but by can could do does for from has have how i if in is it its me my "
+    "of on or our please should so tell than that the their them then there these they this to "
+    "us was we what when where which who why will with would you your".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Return the index terms of ``text``: compounds, their parts, minus stopwords."""
+    terms = []
+    for compound in _COMPOUND_RE.findall(text.lower()):
+        parts = _PART_RE.findall(compound)
+        if len(parts) > 1:
+            terms.append(compound)
+        terms.extend(p for p in parts if p not in STOPWORDS)
+    return terms
+
+
+def is_identifier(term: str) -> bool:
+    """Return whether ``term`` looks like a code, number or version rather than a word."""
+    # "2" or "4b" match too many passages to decide a query on their own
+    return len(term) >= 3 and (any(c.isdigit() for c in term) or not term.isalnum())
+
+
+class _TermTable:
+    """Sorted terms, decoded on access from a memory-mapped text file."""
+
+    def __init__(self, text: Union[mmap.mmap, bytes], offsets: np.ndarray) -> None:
+        self._text = text
+        self._offsets = offsets
+
+    def __len__(self) -> int:
+        """Return the number of terms."""
+        return len(self._offsets) - 1
+
+    def __getitem__(self, row: int) -> str:
+        """Return the term in ``row``."""
+        return self._text[int(self._offsets[row]) : int(self._offsets[row + 1])].decode("ascii")
+
+
+class BM25Index:
+    """
+    Okapi BM25 over passages, with postings lists per term.
+
+    Terms, postings and passage lengths are flat arrays rather than Python
+    lists and dicts. :meth:`save` writes them to a directory once, and every
+    job process maps them read-only with :meth:`load`, so a large index
+    lives once in the page cache (see ``rag.shared``).
+
+    Attributes:
+        k1: Term frequency saturation.
+        b: Strength of the document length normalization.
+        avg_length: Mean passage length in terms.
+
+    Example:
+        >>> index = BM25Index(enumerate(p.text for p in passages))
+        >>> index.search("error code 1042", k=8)
+        [(12, 7.31), (40, 2.05)]
+    """
+
+    def __init__(self, documents: Iterable[Tuple[int, str]], k1: float = 1.2, b: float = 0.75) -> None:
+        """
+        Args:
+            documents: ``(passage_id, text)`` pairs.
+            k1: Term frequency saturation.
+            b: Strength of the document length normalization.
+        """
+        counted = sorted(((pid, Counter(tokenize(text))) for pid, text in documents), key=lambda d: d[0])
+        postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        docs = np.empty(len(counted), dtype=_DOC_DTYPE)
+        # postings refer to rows of the id-sorted passage table
+        for row, (pid, counts) in enumerate(counted):
+            docs[row] = (pid, sum(counts.values()))
+            for term, tf in counts.items():
+                postings[term].append((row, tf))
+        terms = sorted(postings)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(postings[t]) for t in terms])
+        flat = np.array([p for t in terms for p in postings[t]], dtype=_POSTING_DTYPE)
+        self._init(terms, offsets, flat, docs, k1, b)
+
+    def _init(
+        self, terms: Sequence[str], offsets: np.ndarray, postings: np.ndarray, docs: np.ndarray, k1: float, b: float
+    ) -> None:
+        """Set up search over the arrays, built in memory or mapped from disk."""
+        self.k1 = k1
+        self.b = b
+        self._terms = terms
+        self._offsets = offsets
+        self._postings = postings
+        self._docs = docs
+        self.avg_length = float(docs["length"].mean()) if len(docs) else 0.0
+        self._dense = bool(len(docs) == 0 or docs["id"][-1] == len(docs) - 1)
+
+    @classmethod
+    def load(cls, directory: Union[str, Path], k1: float = 1.2, b: float = 0.75) -> "BM25Index":
+        """
+        Map an index written by :meth:`save` read-only.
+
+        Raises:
+            OSError: If the files are missing.
+        """
+        directory = Path(directory)
+        with open(directory / _TERMS_FILE, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            text = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        index = cls.__new__(cls)
+        index._init(
+            _TermTable(text, np.load(directory / _TERM_OFFSETS_FILE, mmap_mode="r")),
+            np.load(directory / _OFFSETS_FILE, mmap_mode="r"),
+            np.load(directory / _POSTINGS_FILE, mmap_mode="r"),
+            np.load(directory / _DOCS_FILE, mmap_mode="r"),
+            k1,
+            b,
+        )
+        return index
+
+    def save(self, directory: Union[str, Path]) -> None:
+        """Write the index to ``directory`` for :meth:`load`."""
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        encoded = [t.encode("ascii") for t in self._terms]
+        term_offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        term_offsets[1:] = np.cumsum([len(t) for t in encoded])
+        (directory / _TERMS_FILE).write_bytes(b"".join(encoded))
+        for name, array in (
+            (_TERM_OFFSETS_FILE, term_offsets),
+            (_OFFSETS_FILE, self._offsets),
+            (_POSTINGS_FILE, self._postings),
+            (_DOCS_FILE, self._docs),
+        ):
+            with open(directory / name, "wb") as f:
+                np.save(f, np.asarray(array))
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def __contains__(self, term: str) -> bool:
+        return self._term_row(term) is not None
+
+    def _term_row(self, term: str) -> Optional[int]:
+        """Return the row of ``term`` in the sorted term table, or None."""
+        row = bisect.bisect_left(self._terms, term)
+        if row < len(self._terms) and self._terms[row] == term:
+            return row
+        return None
+
+    def _term_postings(self, term: str) -> Optional[np.ndarray]:
+        """Return the ``(row, tf)`` postings of ``term``, or None."""
+        row = self._term_row(term)
+        if row is None:
+            return None
+        return self._postings[int(self._offsets[row]) : int(self._offsets[row + 1])]
+
+    def _doc_row(self, pid: int) -> Optional[int]:
+        """Return the passage table row of passage ``pid``, or None."""
+        if self._dense:
+            return pid if 0 <= pid < len(self._docs) else None
+        row = int(np.searchsorted(self._docs["id"], pid))
+        return row if row < len(self._docs) and self._docs["id"][row] == pid else None
+
+    def search(self, query: str, k: int) -> List[Tuple[int, float]]:
+        """
+        Return the ``k`` best passages for ``query``.
+
+        Args:
+            query: Query text, tokenized like the passages.
+            k: Number of results.
+
+        Returns:
+            List of ``(passage_id, score)`` ordered best first; passages
+            sharing no term with the query are not returned.
+        """
+        n = len(self._docs)
+        rows, contributions = [], []
+        for term in set(tokenize(query)):
+            postings = self._term_postings(term)
+            if postings is None:
+                continue
+            # Lucene's idf: unlike the classic one, it stays positive for terms in most passages
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            tf = postings["tf"].astype(np.float64)
+            lengths = self._docs["length"][postings["row"]]
+            norm = self.k1 * (1 - self.b + self.b * lengths / self.avg_length)
+            rows.append(postings["row"])
+            contributions.append(idf * tf * (self.k1 + 1) / (tf + norm))
+        if not rows:
+            return []
+        matched, inverse = np.unique(np.concatenate(rows), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(contributions))
+        best = np.argsort(-scores, kind="stable")[:k]
+        ids = self._docs["id"][matched[best]]
+        return [(int(pid), float(score)) for pid, score in zip(ids, scores[best])]
+
+    def terms_of(self, pid: int, terms: Iterable[str]) -> List[str]:
+        """Return which of ``terms`` occur in passage ``pid``."""
+        row = self._doc_row(pid)
+        if row is None:
+            return []
+        found = []
+        for term in terms:
+            postings = self._term_postings(term)
+            if postings is not None and (postings["row"] == row).any():
+                found.append(term)
+        return found
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[Tuple[int, float]]], k: int = 60) -> List[Tuple[int, float]]:
+    """
+    Merge rankings by reciprocal rank fusion.
+
+    Each passage scores ``sum(1 / (k + rank))`` over the rankings it appears
+    in. Only ranks are used, so FAISS distances and BM25 scores need no
+    common scale.
+
+    Args:
+        rankings: ``(passage_id, score)`` lists, each ordered best first.
+        k: Damping constant; 60 is the value from the original paper.
+
+    Returns:
+        ``(passage_id, fused_score)`` ordered best first.
+    """
+    fused: Dict[int, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, (pid, _) in enumerate(ranking, start=1):
+            fused[pid] += 1.0 / (k + rank)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
@@ -0,0 +1,87 @@
+"""
+Load RAG state once per process on a background thread.
+
+``prewarm`` must return quickly, so ``myagent`` hands ``load_rag`` to a
+``BackgroundLoad``. Lookups wait on it for a bounded time. A failed load
+ends the wait as well: the lookups after it answer without context right
+away instead of waiting for a load that will never finish.
+
+See: docs/services/agent.md#startup-time
+"""
+
+import logging
+import threading
+from typing import Callable, Optional
+
+logger = logging.getLogger("local-agent.rag")
+
+
+class BackgroundLoad:
+    """
+    One-shot loader run on a daemon thread.
+
+    Attributes:
+        error: Exception ``load`` raised, or None.
+
+    Example:
+        >>> loading = BackgroundLoad(load_rag, name="rag-load")
+        >>> loading.start()
+        >>> if not loading.wait(3.0):
+        ...     return ""   # still loading, or loading failed
+
+    See Also:
+        docs/services/agent.md#startup-time
+    """
+
+    def __init__(self, load: Callable[[], None], name: str = "rag-load") -> None:
+        """
+        Args:
+            load: Function that builds the state; run once.
+            name: Name of the loader thread.
+        """
+        self._load = load
+        self._name = name
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._done = threading.Event()
+        self.error: Optional[BaseException] = None
+
+    @property
+    def ready(self) -> bool:
+        """True once ``load`` has returned without an error."""
+        return self._done.is_set() and self.error is None
+
+    @property
+    def failed(self) -> bool:
+        """True once ``load`` has raised."""
+        return self._done.is_set() and self.error is not None
+
+    def start(self) -> None:
+        """Start the loader thread; does nothing if it was already started."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name=self._name, daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        """Thread body: run ``load`` and record its outcome."""
+        try:
+            self._load()
+        except Exception as e:
+            self.error = e
+            logger.exception("Loading RAG failed; turns are answered without context")
+        finally:
+            # wake waiters whether the load succeeded or not
+            self._done.set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        Block until loading has finished or ``timeout`` seconds passed.
+
+        Returns:
+            True if the state is loaded; False if loading failed or is still
+            running. Returns at once after a failed load.
+        """
+        self._done.wait(timeout)
+        return self.ready
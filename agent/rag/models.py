@@ -0,0 +1,271 @@
+"""
+Embedding model backends.
+
+Two interchangeable backends produce all-MiniLM-L6-v2 sentence embeddings:
+
+``sentence-transformers``
+    The reference implementation. Importing it pulls in torch, which costs
+    seconds of startup and hundreds of MB of RSS in every worker process.
+
+``onnx``
+    The same network exported to ONNX with int8 weights, run by ONNX Runtime
+    with a plain ``tokenizers`` tokenizer and mean pooling + L2
+    normalization in numpy, mirroring the sentence-transformers pipeline.
+    Embeddings agree with the reference to within quantization error, so an
+    index built with one backend can be queried with the other. The
+    embedding cache still keeps them apart (``embedding_cache_key``), so
+    the document vectors always come from the backend that embeds queries.
+
+The backend is chosen with ``EMBED_BACKEND``; see
+``agent/benchmarks/embedding_backends.py`` for a latency, RSS and import
+time comparison.
+
+``OnnxCrossEncoder`` runs the optional reranking model (see ``rag.rerank``)
+the same way, without torch.
+
+See: docs/services/agent.md#embedding-backends
+"""
+
+import logging
+import os
+from typing import List, Tuple
+
+import numpy as np
+
+logger = logging.getLogger("local-agent.rag")
+
+BACKENDS = ("sentence-transformers", "onnx")
+
+
+class SentenceTransformerModel:
+    """
+    Embedding model backed by ``sentence_transformers`` and torch.
+
+    Attributes:
+        name: Model name as passed to ``SentenceTransformer``.
+        dim: Embedding dimension.
+    """
+
+    def __init__(self, name: str) -> None:
+        """Load ``name`` with sentence-transformers (imports torch)."""
+        from sentence_transformers import SentenceTransformer
+
+        self.name = name
+        self._model = SentenceTransformer(name)
+        self.dim = self._model.get_sentence_embedding_dimension()
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Embed ``texts`` into a float32 matrix of shape ``(len(texts), dim)``."""
+        return np.asarray(self._model.encode(texts, show_progress_bar=False), dtype=np.float32)
+
+
+class OnnxEmbeddingModel:
+    """
+    Embedding model running an (int8-quantized) ONNX export with ONNX Runtime.
+
+    Reproduces the sentence-transformers pipeline of MiniLM-style models:
+    WordPiece tokenization truncated to ``max_length``, transformer forward
+    pass, attention-masked mean pooling and L2 normalization.
+
+    Attributes:
+        name: Model name, used to locate the files on the Hugging Face Hub.
+        dim: Embedding dimension, read from the model output shape.
+        max_length: Token limit per text (256 for all-MiniLM-L6-v2).
+
+    Example:
+        >>> model = OnnxEmbeddingModel("all-MiniLM-L6-v2")
+        >>> model.encode(["what can you do"]).shape
+        (1, 384)
+    """
+
+    def __init__(
+        self,
+        name: str,
+        model_path: str = "",
+        onnx_file: str = "onnx/model_quint8_avx2.onnx",
+        max_length: int = 256,
+        threads: int = 0,
+    ) -> None:
+        """
+        Load the ONNX model and tokenizer.
+
+        Args:
+            name: Model name; ``org/`` defaults to ``sentence-transformers/``.
+            model_path: Local directory containing ``onnx_file`` and
+                ``tokenizer.json``. Empty to download both from the Hub.
+            onnx_file: Path of the ONNX graph relative to the model directory.
+            max_length: Token limit per text.
+            threads: ONNX Runtime intra-op threads; 0 lets it decide.
+        """
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        self.name = name
+        self.max_length = max_length
+        model_file, tokenizer_file = self._resolve_files(name, model_path, onnx_file)
+
+        self._tokenizer = Tokenizer.from_file(tokenizer_file)
+        self._tokenizer.enable_truncation(max_length=max_length)
+        self._tokenizer.enable_padding()
+
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self._session = ort.InferenceSession(
+            model_file, sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        self._input_names = {i.name for i in self._session.get_inputs()}
+        self.dim = int(self._session.get_outputs()[0].shape[-1])
+        logger.info(f"Loaded ONNX embedding model {model_file}")
+
+    @staticmethod
+    def _resolve_files(name: str, model_path: str, onnx_file: str) -> Tuple[str, str]:
+        """Return local paths of the ONNX graph and tokenizer, downloading if needed."""
+        if model_path:
+            return os.path.join(model_path, onnx_file), os.path.join(model_path, "tokenizer.json")
+
+        from huggingface_hub import hf_hub_download
+
+        repo_id = name if "/" in name else f"sentence-transformers/{name}"
+        return (
+            hf_hub_download(repo_id, onnx_file),
+            hf_hub_download(repo_id, "tokenizer.json"),
+        )
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Embed ``texts`` into a float32 matrix of shape ``(len(texts), dim)``."""
+        if not texts:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        encodings = self._tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self._input_names:
+            feeds["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+
+        token_embeddings = self._session.run(None, feeds)[0]
+        mask = attention_mask[:, :, None].astype(np.float32)
+        pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        return (pooled / np.clip(norms, 1e-12, None)).astype(np.float32)
+
+
+class OnnxCrossEncoder:
+    """
+    Cross-encoder relevance model running an (int8-quantized) ONNX export.
+
+    Scores (query, passage) pairs jointly, which ranks passages far better
+    than comparing two independent embeddings, at the cost of one forward
+    pass per pair.
+
+    Attributes:
+        name: Model name on the Hugging Face Hub.
+        max_length: Token limit per (query, passage) pair.
+
+    Example:
+        >>> model = OnnxCrossEncoder("cross-encoder/ms-marco-MiniLM-L-6-v2")
+        >>> model.score("which voice do you use", ["Kokoro speaks with af_nova", "Whisper transcribes"])
+        array([ 6.1, -9.8], dtype=float32)
+    """
+
+    def __init__(
+        self,
+        name: str,
+        model_path: str = "",
+        onnx_file: str = "onnx/model_quint8_avx2.onnx",
+        max_length: int = 256,
+        threads: int = 0,
+    ) -> None:
+        """
+        Load the ONNX model and tokenizer.
+
+        Args:
+            name: Model name, e.g. ``"cross-encoder/ms-marco-MiniLM-L-6-v2"``.
+            model_path: Local directory containing ``onnx_file`` and
+                ``tokenizer.json``. Empty to download both from the Hub.
+            onnx_file: Path of the ONNX graph relative to the model directory.
+            max_length: Token limit per pair; longer passages are truncated.
+            threads: ONNX Runtime intra-op threads; 0 lets it decide.
+        """
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        self.name = name
+        self.max_length = max_length
+        model_file, tokenizer_file = OnnxEmbeddingModel._resolve_files(name, model_path, onnx_file)
+
+        self._tokenizer = Tokenizer.from_file(tokenizer_file)
+        self._tokenizer.enable_truncation(max_length=max_length)
+        self._tokenizer.enable_padding()
+
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self._session = ort.InferenceSession(
+            model_file, sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        self._input_names = {i.name for i in self._session.get_inputs()}
+        logger.info(f"Loaded ONNX cross-encoder {model_file}")
+
+    def score(self, query: str, passages: List[str]) -> np.ndarray:
+        """Return the relevance logit of each passage for ``query``, higher is better."""
+        if not passages:
+            return np.zeros(0, dtype=np.float32)
+        encodings = self._tokenizer.encode_batch([(query, p) for p in passages])
+        feeds = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+        }
+        if "token_type_ids" in self._input_names:
+            feeds["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+        logits = self._session.run(None, feeds)[0]
+        return np.asarray(logits, dtype=np.float32).reshape(len(passages), -1)[:, 0]
+
+
+def load_embedding_model(
+    backend: str,
+    name: str,
+    onnx_model_path: str = "",
+    onnx_file: str = "onnx/model_quint8_avx2.onnx",
+    onnx_threads: int = 0,
+):
+    """
+    Load the embedding model with the selected backend.
+
+    Args:
+        backend: ``"sentence-transformers"`` or ``"onnx"``.
+        name: Model name, e.g. ``"all-MiniLM-L6-v2"``.
+        onnx_model_path: ONNX only, see :class:`OnnxEmbeddingModel`.
+        onnx_file: ONNX only, see :class:`OnnxEmbeddingModel`.
+        onnx_threads: ONNX only, see :class:`OnnxEmbeddingModel`.
+
+    Returns:
+        An object with ``dim`` and ``encode(texts) -> np.ndarray``.
+
+    Raises:
+        ValueError: If ``backend`` is unknown.
+    """
+    if backend == "onnx":
+        return OnnxEmbeddingModel(
+            name, model_path=onnx_model_path, onnx_file=onnx_file, threads=onnx_threads
+        )
+    if backend == "sentence-transformers":
+        return SentenceTransformerModel(name)
+    raise ValueError(f"Unknown EMBED_BACKEND {backend!r}, expected one of {BACKENDS}")
+
+
+def embedding_cache_key(backend: str, name: str, onnx_file: str = "onnx/model_quint8_avx2.onnx") -> str:
+    """
+    Return the model name the embedding cache is kept under for this backend.
+
+    fp32 sentence-transformers vectors and int8 ONNX vectors differ by the
+    quantization error, so each backend and ONNX file gets its own cache
+    instead of mixing vectors from both in one index.
+
+    Example:
+        >>> embedding_cache_key("onnx", "all-MiniLM-L6-v2", "onnx/model_quint8_avx2.onnx")
+        'all-MiniLM-L6-v2@onnx:onnx/model_quint8_avx2.onnx'
+    """
+    if backend == "onnx":
+        return f"{name}@{backend}:{onnx_file}"
+    return f"{name}@{backend}"
@@ -0,0 +1,167 @@
+"""
+Speculative RAG prefetch from transcripts that arrive before end of turn.
+
+``LocalAgent.on_user_turn_completed`` runs only after end-of-utterance
+detection, so a lookup started there adds embedding and search time straight
+onto the reply latency. While the user is still speaking, the STT already
+produces interim and per-segment transcripts; ``SpeculativePrefetcher``
+starts the lookup on those. When the turn completes, the prefetched result
+is reused if the text it was computed for is similar enough to the final
+transcript, otherwise the stale lookup is cancelled and the caller falls
+back to a fresh lookup.
+
+See: docs/services/agent.md#speculative-rag-prefetch
+"""
+
+import asyncio
+import difflib
+import logging
+import time
+from typing import Awaitable, Callable, Optional
+
+from .corpus import normalize_query
+
+logger = logging.getLogger("local-agent.rag")
+
+
+def text_similarity(a: str, b: str) -> float:
+    """Return a 0..1 similarity of two normalized texts, compared word-wise."""
+    if a == b:
+        return 1.0
+    return difflib.SequenceMatcher(None, a.split(), b.split(), autojunk=False).ratio()
+
+
+class SpeculativePrefetcher:
+    """
+    Runs RAG lookups on partial transcripts ahead of the end of turn.
+
+    At most one speculative lookup is in flight. A new transcript that
+    differs noticeably from the text being looked up cancels it and starts a
+    new one; small changes (punctuation, a trailing word) keep the running
+    lookup.
+
+    Attributes:
+        min_similarity: Similarity needed to reuse a prefetched result.
+        min_words: Shortest partial transcript worth a lookup.
+        hits: Turns answered from a prefetched result.
+        misses: Turns whose prefetch was missing or stale.
+
+    Example:
+        >>> prefetcher = SpeculativePrefetcher(rag_lookup)
+        >>> prefetcher.on_transcript("what can you", is_final=False)
+        >>> context = await prefetcher.take("What can you do?")  # None on miss
+
+    See Also:
+        docs/services/agent.md#speculative-rag-prefetch
+    """
+
+    def __init__(
+        self,
+        lookup: Callable[[str], Awaitable[str]],
+        min_similarity: float = 0.8,
+        min_words: int = 3,
+    ) -> None:
+        """
+        Initialize the prefetcher.
+
+        Args:
+            lookup: Coroutine function performing the RAG lookup.
+            min_similarity: Word-level similarity between the prefetched and
+                final text required to reuse the result.
+            min_words: Minimum words in a partial transcript before a lookup
+                is started.
+        """
+        self._lookup = lookup
+        self.min_similarity = min_similarity
+        self.min_words = min_words
+        self.hits = 0
+        self.misses = 0
+        self._committed = ""
+        self._task: Optional[asyncio.Task] = None
+        self._task_text = ""
+        self._task_started = 0.0
+
+    def on_transcript(self, transcript: str, is_final: bool) -> None:
+        """
+        Feed an interim or final STT transcript of the current user turn.
+
+        Final transcripts are segments of the turn and are accumulated;
+        interim transcripts extend the accumulated text until replaced.
+        Must be called from the event loop thread.
+
+        Args:
+            transcript: Transcript text of the current segment.
+            is_final: Whether the STT will not revise this segment anymore.
+        """
+        segment = normalize_query(transcript)
+        candidate = f"{self._committed} {segment}".strip()
+        if is_final:
+            self._committed = candidate
+
+        if len(candidate.split()) < self.min_words:
+            return
+        if self._task is not None and text_similarity(self._task_text, candidate) >= self.min_similarity:
+            return
+
+        self._cancel()
+        self._task_text = candidate
+        self._task_started = time.perf_counter()
+        self._task = asyncio.create_task(self._lookup(candidate))
+
+    async def take(self, final_text: str) -> Optional[str]:
+        """
+        Claim the prefetched result for the completed turn.
+
+        Resets the prefetcher for the next turn in every case.
+
+        Args:
+            final_text: Final transcript of the user turn.
+
+        Returns:
+            The prefetched RAG context when it was computed for similar text
+            (waiting for it if it is still running), otherwise ``None``, in
+            which case the caller should run a normal lookup.
+        """
+        task, task_text, started = self._task, self._task_text, self._task_started
+        self._task = None
+        self._task_text = ""
+        self._committed = ""
+
+        final = normalize_query(final_text)
+        if task is None or task.cancelled() or text_similarity(task_text, final) < self.min_similarity:
+            if task is not None:
+                task.cancel()
+            self.misses += 1
+            return None
+
+        ahead = time.perf_counter() - started
+        try:
+            result = await task
+        except asyncio.CancelledError:
+            if not task.cancelled():
+                raise  # the turn itself is being cancelled
+            self.misses += 1
+            return None
+        except Exception as e:
+            logger.warning(f"Speculative RAG lookup failed, falling back: {e}")
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        logger.info(
+            f"RAG prefetch hit ({self.hits} hits, {self.misses} misses), "
+            f"started {ahead * 1000:.0f} ms before end of turn"
+        )
+        return result
+
+    def reset(self) -> None:
+        """Cancel any speculative lookup and forget the partial transcript."""
+        self._cancel()
+        self._committed = ""
+
+    def _cancel(self) -> None:
+        """Cancel the in-flight lookup, if any."""
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+        self._task = None
+        self._task_text = ""
@@ -0,0 +1,227 @@
+"""
+Two-level cache of RAG lookup results.
+
+Voice users repeat and rephrase themselves constantly, and every turn pays
+for an embedding and an index search. ``QueryCache`` answers repeated
+questions from memory:
+
+1. Exact level: the normalized query text ("What can you do?" and
+   "what can you do" share an entry). A hit skips the embedding entirely.
+2. Semantic level: cosine similarity of the query embedding against the
+   embeddings of cached queries ("what are you able to do"). A hit skips
+   the index search. Embeddings hardly move when only a number or code
+   changes, so "error 502" is close to "error 504". A semantic hit
+   therefore also needs the same identifier tokens (numbers, codes,
+   versions) as the cached query.
+
+The cache is bounded (LRU), entries expire after a TTL, and everything is
+dropped when the document index changes.
+
+See: docs/services/agent.md#rag-query-cache
+"""
+
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, List, Optional
+
+import numpy as np
+
+from .corpus import normalize_query
+from .lexical import tokenize
+
+logger = logging.getLogger("local-agent.rag")
+
+
+@dataclass
+class _Entry:
+    """A cached lookup result and where its embedding lives."""
+
+    result: str
+    slot: Optional[int]
+    created: float
+    identifiers: FrozenSet[str] = frozenset()
+
+
+class QueryCache:
+    """
+    LRU/TTL cache of RAG contexts keyed by query text and query embedding.
+
+    Embeddings of cached queries are kept L2-normalized in a preallocated
+    matrix, so a semantic lookup is one matrix-vector product over at most
+    ``max_entries`` rows.
+
+    Attributes:
+        max_entries: Maximum number of cached queries.
+        ttl: Seconds an entry stays valid.
+        min_similarity: Cosine similarity needed for a semantic hit; the
+            query must also carry the same identifier tokens.
+        exact_hits: Lookups answered by the exact level.
+        semantic_hits: Lookups answered by the semantic level.
+        misses: Lookups that had to search the index.
+
+    Example:
+        >>> cache = QueryCache(dim=384)
+        >>> cache.get("what can you do")  # exact level only
+        >>> cache.get("what are you able to do", embedding)  # both levels
+        >>> cache.put("what can you do", embedding, context)
+
+    See Also:
+        docs/services/agent.md#rag-query-cache
+    """
+
+    def __init__(
+        self, dim: int, max_entries: int = 256, ttl: float = 600.0, min_similarity: float = 0.9
+    ) -> None:
+        """
+        Initialize an empty cache.
+
+        Args:
+            dim: Embedding dimension of the query embeddings.
+            max_entries: Upper bound on cached queries; least recently used
+                entries are evicted first.
+            ttl: Lifetime of an entry in seconds.
+            min_similarity: Cosine similarity threshold of the semantic level.
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.min_similarity = min_similarity
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._vectors = np.zeros((max_entries, dim), dtype=np.float32)
+        self._slot_keys: Dict[int, str] = {}
+        self._free_slots: List[int] = list(range(max_entries - 1, -1, -1))
+        self._version: object = None
+
+    def __len__(self) -> int:
+        """Return the number of cached queries."""
+        return len(self._entries)
+
+    def check_version(self, version: object) -> None:
+        """
+        Drop every entry if the document index changed.
+
+        Args:
+            version: Identifier of the current index, e.g. ``Retriever.version``.
+        """
+        if version != self._version:
+            if self._entries:
+                logger.info("Document index changed, clearing RAG query cache")
+            self.invalidate()
+            self._version = version
+
+    def invalidate(self) -> None:
+        """Remove all entries; counters are kept."""
+        self._entries.clear()
+        self._slot_keys.clear()
+        self._free_slots = list(range(self.max_entries - 1, -1, -1))
+
+    def get(self, query: str, embedding: Optional[np.ndarray] = None) -> Optional[str]:
+        """
+        Look up a cached result.
+
+        Args:
+            query: Raw query text.
+            embedding: Query embedding of shape ``(dim,)`` or ``(1, dim)``.
+                Without it only the exact level is consulted and misses are
+                not counted, so callers can try the exact level before paying
+                for the embedding.
+
+        Returns:
+            The cached RAG context, or ``None`` on a miss.
+        """
+        now = time.monotonic()
+        key = normalize_query(query)
+        entry = self._entries.get(key)
+        if entry is not None and now - entry.created <= self.ttl:
+            self._entries.move_to_end(key)
+            self.exact_hits += 1
+            return entry.result
+        if entry is not None:
+            self._remove(key)
+
+        if embedding is None:
+            return None
+
+        slot = self._nearest_slot(_normalize(embedding), _identifiers(key))
+        if slot is not None:
+            hit_key = self._slot_keys[slot]
+            hit = self._entries[hit_key]
+            if now - hit.created <= self.ttl:
+                self._entries.move_to_end(hit_key)
+                self.semantic_hits += 1
+                return hit.result
+            self._remove(hit_key)
+
+        self.misses += 1
+        return None
+
+    def put(self, query: str, embedding: Optional[np.ndarray], result: str) -> None:
+        """
+        Cache the result of a lookup, evicting the least recently used entry.
+
+        Args:
+            query: Raw query text.
+            embedding: Query embedding; ``None`` stores an exact-only entry.
+            result: RAG context returned for the query.
+        """
+        if self.max_entries <= 0:
+            return
+        key = normalize_query(query)
+        if key in self._entries:
+            self._remove(key)
+        while len(self._entries) >= self.max_entries:
+            self._remove(next(iter(self._entries)))
+
+        slot = None
+        if embedding is not None:
+            slot = self._free_slots.pop()
+            self._vectors[slot] = _normalize(embedding)
+            self._slot_keys[slot] = key
+        self._entries[key] = _Entry(
+            result=result, slot=slot, created=time.monotonic(), identifiers=_identifiers(key)
+        )
+
+    def stats(self) -> Dict[str, int]:
+        """Return the hit/miss counters and current size."""
+        return {
+            "entries": len(self._entries),
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+        }
+
+    def _nearest_slot(self, vector: np.ndarray, query_identifiers: FrozenSet[str]) -> Optional[int]:
+        """Return the most similar cached slot above the threshold with the same identifiers, if any."""
+        candidates = [
+            slot for slot, key in self._slot_keys.items()
+            if self._entries[key].identifiers == query_identifiers
+        ]
+        if not candidates:
+            return None
+        slots = np.asarray(candidates, dtype=np.int64)
+        sims = self._vectors[slots] @ vector
+        best = int(np.argmax(sims))
+        return int(slots[best]) if sims[best] >= self.min_similarity else None
+
+    def _remove(self, key: str) -> None:
+        """Drop an entry and release its embedding slot."""
+        entry = self._entries.pop(key)
+        if entry.slot is not None:
+            del self._slot_keys[entry.slot]
+            self._free_slots.append(entry.slot)
+
+
+def _identifiers(text: str) -> FrozenSet[str]:
+    """Return the tokens of ``text`` that are numbers, codes or versions rather than words."""
+    return frozenset(t for t in tokenize(text) if not t.isalpha())
+
+
+def _normalize(embedding: np.ndarray) -> np.ndarray:
+    """Flatten an embedding and scale it to unit length."""
+    vector = np.asarray(embedding, dtype=np.float32).reshape(-1)
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm > 0 else vector
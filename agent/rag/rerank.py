@@ -0,0 +1,171 @@
+"""
+Cross-encoder reranking of retrieved passages under a time budget.
+
+Vector search ranks passages by how close two independent embeddings are,
+so the passage that answers the question is often not among the first
+three. Raising ``RAG_TOP_K`` finds it but bloats the prompt. ``Reranker``
+instead takes a larger candidate list, scores every (query, passage) pair
+with a small cross-encoder and keeps only the best few.
+
+The reranker must not add unpredictable latency to a turn:
+
+* Scoring runs on one dedicated thread, in batches, and is abandoned once
+  ``budget`` is spent. ``rag_lookup`` then falls back to the vector order.
+* Pair scores are cached in an LRU keyed by (query, passage text), so a
+  repeated or prefetched query is reranked without running the model. A
+  scoring run that outlived its budget still fills the cache.
+* While a run is on the thread, including one abandoned after its budget,
+  lookups fall back at once instead of queueing behind it. The run is
+  marked busy when it is submitted, not when the thread picks it up, so
+  lookups arriving together cannot all queue up.
+
+See: docs/services/agent.md#reranking
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from .corpus import normalize_query
+
+logger = logging.getLogger("local-agent.rag")
+
+ScoreFn = Callable[[str, List[str]], np.ndarray]
+
+
+class Reranker:
+    """
+    Budgeted, cached cross-encoder reranking shared by all sessions of a process.
+
+    Attributes:
+        keep: Passages returned per query.
+        budget: Seconds a rerank may take before the vector order is used.
+        batch_size: Pairs scored per model call.
+        reranked: Lookups answered in reranked order.
+        fallbacks: Lookups that fell back to the vector order.
+
+    Example:
+        >>> reranker = Reranker(OnnxCrossEncoder(RAG_RERANK_MODEL).score, keep=3, budget=0.08)
+        >>> hits, status = await reranker.rerank(query, hits, lambda pid: retriever.passages[pid].text)
+
+    See Also:
+        docs/services/agent.md#reranking
+    """
+
+    def __init__(
+        self,
+        score: ScoreFn,
+        keep: int = 3,
+        budget: float = 0.08,
+        batch_size: int = 16,
+        cache_size: int = 4096,
+    ) -> None:
+        """
+        Args:
+            score: ``score(query, passages)`` returning one relevance score
+                per passage, higher is better.
+            keep: Passages returned per query.
+            budget: Seconds a rerank may take before the vector order is used.
+            batch_size: Pairs scored per model call.
+            cache_size: Pair scores kept in the LRU cache (0 disables it).
+        """
+        self._score = score
+        self.keep = keep
+        self.budget = budget
+        self.batch_size = batch_size
+        self.cache_size = cache_size
+        self.reranked = 0
+        self.fallbacks = 0
+        self._cache: "OrderedDict[Tuple[str, str], float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._busy = threading.Event()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rag-rerank")
+
+    def _cached(self, query: str, texts: Sequence[str]) -> Dict[int, float]:
+        """Return the cached scores of ``texts``, by position."""
+        found = {}
+        with self._lock:
+            for i, text in enumerate(texts):
+                score = self._cache.get((query, text))
+                if score is not None:
+                    self._cache.move_to_end((query, text))
+                    found[i] = score
+        return found
+
+    def _store(self, query: str, texts: Sequence[str], scores: Sequence[float]) -> None:
+        if self.cache_size <= 0:
+            return
+        with self._lock:
+            for text, score in zip(texts, scores):
+                self._cache[(query, text)] = float(score)
+                self._cache.move_to_end((query, text))
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def score(self, query: str, texts: Sequence[str]) -> List[float]:
+        """
+        Score ``texts`` for ``query``, using and filling the cache.
+
+        Blocking; ``rerank`` runs it on the reranker thread.
+        """
+        query = normalize_query(query)
+        scores = self._cached(query, texts)
+        missing = [i for i in range(len(texts)) if i not in scores]
+        for start in range(0, len(missing), self.batch_size):
+            batch = missing[start:start + self.batch_size]
+            batch_texts = [texts[i] for i in batch]
+            batch_scores = self._score(query, batch_texts)
+            # cached per batch, so an abandoned run still helps the next lookup
+            self._store(query, batch_texts, batch_scores)
+            scores.update(zip(batch, (float(s) for s in batch_scores)))
+        return [scores[i] for i in range(len(texts))]
+
+    async def rerank(
+        self, query: str, hits: Sequence[Tuple[int, float]], text_of: Callable[[int], str]
+    ) -> Tuple[List[Tuple[int, float]], str]:
+        """
+        Return the ``keep`` most relevant candidates, best first.
+
+        Args:
+            query: The user's query.
+            hits: Candidates as ``(passage_id, score)``, in retrieval order.
+            text_of: Returns the text of a passage id.
+
+        Returns:
+            ``(hits, status)``: status is ``"reranked"``, or ``"timeout"``
+            or ``"busy"`` when the first ``keep`` candidates in retrieval
+            order are returned instead.
+        """
+        if len(hits) <= 1:
+            return list(hits), "reranked"
+        if self._busy.is_set():
+            self.fallbacks += 1
+            return list(hits[: self.keep]), "busy"
+
+        texts = [text_of(pid) for pid, _ in hits]
+        start = time.perf_counter()
+        # busy from submission until the thread is done, even after the budget ran out
+        self._busy.set()
+        try:
+            job = self._executor.submit(self.score, query, texts)
+        except BaseException:
+            self._busy.clear()
+            raise
+        job.add_done_callback(lambda _: self._busy.clear())
+        try:
+            scores = await asyncio.wait_for(asyncio.wrap_future(job), self.budget)
+        except asyncio.TimeoutError:
+            self.fallbacks += 1
+            logger.info(f"Rerank of {len(hits)} passages exceeded {self.budget * 1000:.0f} ms, using vector order")
+            return list(hits[: self.keep]), "timeout"
+
+        self.reranked += 1
+        order = np.argsort(-np.asarray(scores), kind="stable")[: self.keep]
+        logger.debug(f"Reranked {len(hits)} passages in {(time.perf_counter() - start) * 1000:.1f} ms")
+        return [(hits[i][0], scores[i]) for i in order], "reranked"
@@ -0,0 +1,244 @@
+"""
+Passage retrieval with a bounded prompt budget.
+
+``Retriever`` owns the FAISS index and the passages it was built from. It
+turns a query embedding into the best-ranked passages and formats them into
+a context block that never exceeds the configured token budget, no matter
+how large the documents in ``agent/docs`` are. For hybrid retrieval it also
+keeps a BM25 index over the same passages (see ``rag.lexical``).
+
+See: docs/services/agent.md#rag-lookup-function
+"""
+
+import itertools
+import logging
+from functools import cached_property, partial
+from typing import List, Optional, Sequence, Tuple
+
+import faiss
+import numpy as np
+
+from .corpus import Passage, estimate_tokens
+from .indexes import IndexSpec, build_index, configure_search
+from .lexical import BM25Index, is_identifier, reciprocal_rank_fusion, tokenize
+from .store import EmbeddingStore, EncodeFn
+
+logger = logging.getLogger("local-agent.rag")
+
+PASSAGE_SEPARATOR = "\n\n---\n\n"
+
+_versions = itertools.count(1)
+
+
+class Retriever:
+    """
+    Top-k passage search over a FAISS index with token-budgeted context.
+
+    The index backend is pluggable (see ``rag.indexes``); the retriever only
+    relies on the common ``faiss.Index.search`` interface, so flat, IVF,
+    HNSW and IVF-PQ indexes are interchangeable.
+
+    Attributes:
+        index: FAISS index whose ids are positions in ``passages``.
+        passages: Passages the index was built from.
+        top_k: Number of nearest neighbours fetched per query.
+        token_budget: Maximum estimated tokens of formatted context.
+        spec: Index backend and search parameters.
+        version: Process-unique id of this index build; caches of lookup
+            results compare it to detect that the corpus changed.
+
+    Example:
+        >>> retriever = Retriever(index, passages, top_k=8, token_budget=600)
+        >>> hits = retriever.search(embed_model.encode([query]))
+        >>> context = retriever.build_context(hits)
+
+    See Also:
+        rag.corpus.ingest: Produces the passages.
+        docs/services/agent.md#rag-lookup-function
+    """
+
+    def __init__(
+        self,
+        index: faiss.Index,
+        passages: Sequence[Passage],
+        top_k: int,
+        token_budget: int,
+        spec: Optional[IndexSpec] = None,
+        lexical: Optional[BM25Index] = None,
+    ) -> None:
+        """
+        Initialize the retriever.
+
+        Args:
+            index: FAISS index over the passage embeddings.
+            passages: Passages in index id order.
+            top_k: Number of candidates fetched from the index per query.
+            token_budget: Upper bound on the estimated tokens of the context.
+            spec: Index backend whose search parameters (``nprobe``,
+                ``efSearch``) are applied to ``index``; defaults to flat.
+            lexical: BM25 index over ``passages``, e.g. mapped from a shared
+                corpus; built on first use if not given.
+        """
+        self.index = index
+        self.passages = passages
+        self.top_k = top_k
+        self.token_budget = token_budget
+        self.spec = spec or IndexSpec()
+        self.version = next(_versions)
+        configure_search(self.index, self.spec)
+        if lexical is not None:
+            # fills the cached_property below
+            self.lexical = lexical
+
+    def search(self, query_embedding: np.ndarray) -> List[Tuple[int, float]]:
+        """
+        Return the nearest passages for a query embedding.
+
+        This call is CPU-bound and should run in an executor.
+
+        Args:
+            query_embedding: Array of shape ``(1, dim)``.
+
+        Returns:
+            List of ``(passage_id, distance)`` ordered best first.
+        """
+        k = min(self.top_k, self.index.ntotal)
+        if k <= 0:
+            return []
+        distances, ids = self.index.search(np.asarray(query_embedding, dtype=np.float32), k)
+        return [(int(i), float(d)) for i, d in zip(ids[0], distances[0]) if i >= 0]
+
+    @cached_property
+    def lexical(self) -> BM25Index:
+        """BM25 index over the passages, built on first use."""
+        items = self.passages.items() if hasattr(self.passages, "items") else enumerate(self.passages)
+        index = BM25Index((pid, passage.text) for pid, passage in items)
+        logger.info(f"Built BM25 index over {len(index)} passages")
+        return index
+
+    def lexical_search(self, query: str) -> List[Tuple[int, float]]:
+        """
+        Return the best BM25 matches for a query text.
+
+        This call is CPU-bound and should run in an executor.
+
+        Returns:
+            List of ``(passage_id, score)`` ordered best first.
+        """
+        return self.lexical.search(query, self.top_k)
+
+    def keyword_match(self, query: str, lexical_hits: Sequence[Tuple[int, float]]) -> bool:
+        """
+        Return whether BM25 alone answers ``query``.
+
+        That is the case when the query contains identifiers (codes, numbers,
+        versions, model names with digits) and the best BM25 hit contains all
+        of them. Vector search adds nothing there, so the embedding call can
+        be skipped.
+        """
+        if not lexical_hits:
+            return False
+        identifiers = {t for t in tokenize(query) if is_identifier(t)}
+        if not identifiers:
+            return False
+        top = lexical_hits[0][0]
+        return len(self.lexical.terms_of(top, identifiers)) == len(identifiers)
+
+    def fuse(
+        self, vector_hits: Sequence[Tuple[int, float]], lexical_hits: Sequence[Tuple[int, float]]
+    ) -> List[Tuple[int, float]]:
+        """
+        Merge vector and BM25 results by reciprocal rank fusion.
+
+        Returns:
+            The ``top_k`` best ``(passage_id, fused_score)``, best first.
+        """
+        return reciprocal_rank_fusion([vector_hits, lexical_hits])[: self.top_k]
+
+    def select(self, passage_ids: Sequence[int]) -> List[Passage]:
+        """
+        Pick ranked passages until the token budget is spent.
+
+        Passages that mostly repeat text already selected from the same
+        document (neighbouring chunks share their overlap) are skipped, and a
+        passage that does not fit is skipped in favour of a shorter
+        lower-ranked one.
+
+        Args:
+            passage_ids: Candidate passage ids, best first.
+
+        Returns:
+            Selected passages in rank order.
+        """
+        selected: List[Passage] = []
+        used = 0
+        for pid in passage_ids:
+            passage = self.passages[pid]
+            # Count the "[source] " prefix and separator the passage adds too
+            cost = passage.tokens + estimate_tokens(f"[{passage.source}] {PASSAGE_SEPARATOR}")
+            if used + cost > self.token_budget:
+                continue
+            if any(_mostly_overlaps(passage, other) for other in selected):
+                continue
+            selected.append(passage)
+            used += cost
+        return selected
+
+    def build_context(self, hits: Sequence[Tuple[int, float]]) -> str:
+        """
+        Format the selected passages of a search result for the prompt.
+
+        Args:
+            hits: Result of :meth:`search`.
+
+        Returns:
+            Passages prefixed with their source, separated by
+            ``PASSAGE_SEPARATOR``; empty string when nothing was found.
+        """
+        passages = self.select([pid for pid, _ in hits])
+        return PASSAGE_SEPARATOR.join(f"[{p.source}] {p.text}" for p in passages)
+
+
+def _mostly_overlaps(a: Passage, b: Passage) -> bool:
+    """Return True when more than half of ``a`` is covered by ``b``."""
+    if a.source != b.source:
+        return False
+    shared = min(a.end, b.end) - max(a.start, b.start)
+    return shared > (a.end - a.start) / 2
+
+
+def build_retriever(
+    passages: Sequence[Passage],
+    encode: EncodeFn,
+    dim: int,
+    spec: IndexSpec,
+    top_k: int,
+    token_budget: int,
+    store: Optional[EmbeddingStore] = None,
+) -> Retriever:
+    """
+    Embed passages, build the configured index and wrap it in a retriever.
+
+    Args:
+        passages: Passages to index, see ``rag.corpus.ingest``.
+        encode: Function encoding a list of texts into a float32 matrix.
+        dim: Embedding dimension of the model.
+        spec: Index backend and parameters.
+        top_k: Number of candidates fetched from the index per query.
+        token_budget: Upper bound on the estimated tokens of the context.
+        store: Optional on-disk cache; when given, unchanged embeddings and
+            the index snapshot are reused instead of recomputed.
+
+    Returns:
+        A ready-to-use ``Retriever``.
+    """
+    texts = [p.text for p in passages]
+    builder = partial(build_index, spec)
+    if store is not None:
+        _, index = store.load_or_build(texts, encode, dim, index_key=spec.key, build_index=builder)
+    elif texts:
+        index = builder(np.asarray(encode(texts), dtype=np.float32))
+    else:
+        index = builder(np.zeros((0, dim), dtype=np.float32))
+    logger.info(f"Built {type(index).__name__} over {index.ntotal} passages")
+    return Retriever(index, passages, top_k=top_k, token_budget=token_budget, spec=spec)
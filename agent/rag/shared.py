@@ -0,0 +1,237 @@
+"""
+Read-only corpus shared between agent job processes.
+
+``cli.run_app`` runs every job in its own process, and each process used to
+load its own copy of the passages and the FAISS index, so memory grew with
+the number of concurrent rooms. Instead, the worker's main process builds
+the corpus once and *publishes* it as flat files; job processes *attach*
+to them with ``mmap``, so the passage text and index pages live once in the
+page cache and are shared by all processes. ``RAG_SHARED_DIR`` may point to
+a tmpfs such as ``/dev/shm`` if it is large enough for the index.
+
+Layout (``<shared_dir>/<generation>/``)::
+
+    passages.txt   UTF-8 passage texts, concatenated
+    passages.npy   per passage, sorted by id: passage id, source id,
+                   char offsets, byte offsets
+    sources.json   source file names, indexed by source id
+    index.faiss    FAISS index, read with IO_FLAG_MMAP_IFC | IO_FLAG_READ_ONLY
+    bm25/          BM25 terms and postings (``BM25Index.save``), if
+                   published with ``lexical=True``
+
+``<shared_dir>/CURRENT`` names the generation to attach to and is replaced
+atomically, so a publish never exposes a half-written corpus.
+
+See: docs/services/agent.md#shared-corpus
+"""
+
+import json
+import logging
+import mmap
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Iterator, List, Mapping, Optional, Sequence, Tuple, Union
+
+import faiss
+import numpy as np
+
+from .corpus import Passage
+from .lexical import BM25Index
+from .store import _atomic_write, read_index_mapped
+
+logger = logging.getLogger("local-agent.rag")
+
+CURRENT_FILE = "CURRENT"
+TEXT_FILE = "passages.txt"
+META_FILE = "passages.npy"
+SOURCES_FILE = "sources.json"
+INDEX_FILE = "index.faiss"
+LEXICAL_DIR = "bm25"
+
+# Generations kept besides the current one, for processes still attached
+KEEP_GENERATIONS = 1
+
+_META_DTYPE = np.dtype([
+    ("id", np.int64),
+    ("source", np.int32),
+    ("start", np.int64),
+    ("end", np.int64),
+    ("byte_start", np.int64),
+    ("byte_end", np.int64),
+])
+
+
+class PassageTable:
+    """
+    Memory-mapped, read-only table of passages keyed by passage id.
+
+    Passages are decoded on access from the shared text file, so a process
+    only touches the pages of passages it actually returns. Ids are the
+    FAISS ids of the published index; after hot reloads they may be sparse.
+
+    Attributes:
+        directory: Generation directory the table is mapped from.
+    """
+
+    def __init__(self, directory: Path) -> None:
+        """Map the passage files of a published generation."""
+        self.directory = directory
+        self._meta = np.load(directory / META_FILE, mmap_mode="r")
+        self._ids = self._meta["id"]
+        self._dense = bool(len(self._ids) == 0 or self._ids[-1] == len(self._ids) - 1)
+        self._sources: List[str] = json.loads((directory / SOURCES_FILE).read_text(encoding="utf-8"))
+        with open(directory / TEXT_FILE, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            self._text = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+    def __len__(self) -> int:
+        """Return the number of passages."""
+        return len(self._meta)
+
+    def _row(self, pid: int) -> int:
+        """Return the table row of passage ``pid``."""
+        if self._dense:
+            if not 0 <= pid < len(self._meta):
+                raise KeyError(pid)
+            return pid
+        row = int(np.searchsorted(self._ids, pid))
+        if row >= len(self._ids) or self._ids[row] != pid:
+            raise KeyError(pid)
+        return row
+
+    def _passage(self, row: int) -> Passage:
+        """Decode the passage stored in ``row``."""
+        meta = self._meta[row]
+        text = self._text[int(meta["byte_start"]) : int(meta["byte_end"])].decode("utf-8")
+        return Passage(self._sources[int(meta["source"])], int(meta["start"]), int(meta["end"]), text)
+
+    def __getitem__(self, pid: int) -> Passage:
+        """Return the passage with id ``pid``."""
+        return self._passage(self._row(int(pid)))
+
+    def items(self) -> Iterator[Tuple[int, Passage]]:
+        """Iterate over ``(passage_id, passage)`` pairs in id order."""
+        for row in range(len(self._meta)):
+            yield int(self._ids[row]), self._passage(row)
+
+    def __iter__(self) -> Iterator[Passage]:
+        """Iterate over all passages in id order."""
+        for _, passage in self.items():
+            yield passage
+
+
+def publish(
+    shared_dir: str,
+    passages: Union[Sequence[Passage], Mapping[int, Passage]],
+    index: faiss.Index,
+    lexical: bool = False,
+) -> Path:
+    """
+    Write passages and index as a new generation and make it current.
+
+    Called once by the worker's main process before job processes start,
+    and again whenever the corpus is rebuilt.
+
+    Args:
+        shared_dir: Root directory shared by all worker processes.
+        passages: Passages by index id; a sequence means ids ``0..n-1``.
+        index: FAISS index over the passages.
+        lexical: Also build the BM25 index over the passages and write it
+            for :func:`attach_lexical`, so job processes do not each build one.
+
+    Returns:
+        The directory of the published generation.
+    """
+    root = Path(shared_dir)
+    root.mkdir(parents=True, exist_ok=True)
+    generation = root / f"gen-{time.time_ns()}-{os.getpid()}"
+    generation.mkdir()
+
+    items = sorted(passages.items()) if hasattr(passages, "items") else list(enumerate(passages))
+    sources: List[str] = []
+    source_ids = {}
+    meta = np.empty(len(items), dtype=_META_DTYPE)
+    offset = 0
+    with open(generation / TEXT_FILE, "wb") as f:
+        for row, (pid, p) in enumerate(items):
+            if p.source not in source_ids:
+                source_ids[p.source] = len(sources)
+                sources.append(p.source)
+            data = p.text.encode("utf-8")
+            f.write(data)
+            meta[row] = (pid, source_ids[p.source], p.start, p.end, offset, offset + len(data))
+            offset += len(data)
+    with open(generation / META_FILE, "wb") as f:
+        np.save(f, meta)
+    (generation / SOURCES_FILE).write_text(json.dumps(sources), encoding="utf-8")
+    faiss.write_index(index, str(generation / INDEX_FILE))
+    if lexical:
+        BM25Index((pid, p.text) for pid, p in items).save(generation / LEXICAL_DIR)
+
+    _atomic_write(root / CURRENT_FILE, lambda p: Path(p).write_text(generation.name, encoding="utf-8"))
+    logger.info(f"Published shared corpus {generation} ({len(passages)} passages, {offset} bytes)")
+    _prune(root, generation.name)
+    return generation
+
+
+def attach(shared_dir: str) -> Optional[Tuple[PassageTable, faiss.Index, str]]:
+    """
+    Map the current published corpus read-only.
+
+    Args:
+        shared_dir: Root directory shared by all worker processes.
+
+    Returns:
+        Tuple of (passages, index, generation name), or ``None`` when nothing
+        has been published yet.
+    """
+    root = Path(shared_dir)
+    try:
+        name = (root / CURRENT_FILE).read_text(encoding="utf-8").strip()
+        generation = root / name
+        passages = PassageTable(generation)
+        index, mapped = read_index_mapped(str(generation / INDEX_FILE))
+    except (OSError, ValueError, RuntimeError) as e:
+        logger.info(f"No shared corpus to attach in {root}: {e}")
+        return None
+    if not mapped:
+        # FAISS could not map this index type; every job process holds its own copy
+        logger.warning(f"Shared index {generation / INDEX_FILE} could not be memory-mapped, read into memory")
+    logger.info(f"Attached shared corpus {generation} ({len(passages)} passages)")
+    return passages, index, name
+
+
+def attach_lexical(shared_dir: str, generation: str) -> Optional[BM25Index]:
+    """
+    Map the BM25 index published with a generation read-only.
+
+    Returns:
+        The index, or ``None`` if the generation was published without one.
+    """
+    try:
+        return BM25Index.load(Path(shared_dir) / generation / LEXICAL_DIR)
+    except (OSError, ValueError) as e:
+        logger.info(f"No shared BM25 index in {generation}: {e}")
+        return None
+
+
+def current_generation(shared_dir: str) -> Optional[str]:
+    """Return the name of the current generation, or ``None``."""
+    try:
+        return (Path(shared_dir) / CURRENT_FILE).read_text(encoding="utf-8").strip()
+    except OSError:
+        return None
+
+
+def _prune(root: Path, current: str) -> None:
+    """Delete all but the newest ``KEEP_GENERATIONS`` old generations."""
+    old = sorted(
+        (d for d in root.iterdir() if d.is_dir() and d.name.startswith("gen-") and d.name != current),
+        key=lambda d: d.stat().st_mtime,
+        reverse=True,
+    )
+    for directory in old[KEEP_GENERATIONS:]:
+        # processes that still map these files keep them alive until they exit
+        shutil.rmtree(directory, ignore_errors=True)
@@ -0,0 +1,343 @@
+"""
+Persistent embedding cache and FAISS index snapshot.
+
+Embedding the whole ``agent/docs`` corpus and building a FAISS index at every
+worker start makes cold starts slow and competes for CPU with Whisper and
+Ollama on the same host. ``EmbeddingStore`` keeps per-text embeddings on disk
+keyed by content hash (one directory per embedding model) together with a
+snapshot of the built index, so a restart only encodes texts that were added
+or changed and memory-maps everything else (see :func:`read_index_mapped`
+for which index types FAISS can map).
+
+Cache layout (``<cache_dir>/<model>/``)::
+
+    manifest.json   model name, embedding dimension and row -> sha256 map
+    embeddings.npy  float32 matrix, one row per entry in the manifest
+    index.faiss     serialized FAISS index built from embeddings.npy
+    index.json      fingerprint of the texts and index type in index.faiss
+
+See: docs/services/agent.md#persistent-embedding-cache
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import faiss
+import numpy as np
+
+logger = logging.getLogger("local-agent.rag")
+
+MANIFEST_FILE = "manifest.json"
+EMBEDDINGS_FILE = "embeddings.npy"
+INDEX_FILE = "index.faiss"
+INDEX_META_FILE = "index.json"
+
+EncodeFn = Callable[[List[str]], np.ndarray]
+
+
+def content_hash(text: str) -> str:
+    """Return the hex SHA-256 digest used to key a text in the cache."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _model_slug(model_name: str) -> str:
+    """Turn a model name such as ``org/model`` into a safe directory name."""
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name).strip("_") or "model"
+
+
+def _atomic_write(path: Path, write: Callable[[str], None]) -> None:
+    """
+    Write a file atomically via a temporary file and ``os.replace``.
+
+    Several worker processes may start at the same time and race to refresh
+    the cache; readers must only ever see complete files.
+
+    Args:
+        path: Final destination of the file.
+        write: Callback that writes the content to the temporary path given.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    os.close(fd)
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def read_index_mapped(path: str) -> Tuple[faiss.Index, bool]:
+    """
+    Read a FAISS index read-only, memory-mapping its vectors where possible.
+
+    ``IO_FLAG_MMAP`` only maps the inverted lists of IVF indexes; flat,
+    IDMap2 and HNSW vector storage would still be copied to the heap.
+    ``IO_FLAG_MMAP_IFC`` (FAISS 1.8+) maps the codes of those as well, so
+    it is tried first, then ``IO_FLAG_MMAP``, then a plain read.
+
+    Returns:
+        Tuple of (index, mapped); ``mapped`` is False if the index had to be
+        read into memory.
+    """
+    attempts = [faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY]
+    if hasattr(faiss, "IO_FLAG_MMAP_IFC"):
+        attempts.insert(0, faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY)
+    for flags in attempts:
+        try:
+            return faiss.read_index(path, flags), True
+        except RuntimeError as e:
+            logger.debug(f"Cannot map {path} with io flags {flags:#x}: {e}")
+    return faiss.read_index(path), False
+
+
+def build_flat_index(embeddings: np.ndarray) -> faiss.Index:
+    """Build the default brute-force L2 index over ``embeddings``."""
+    index = faiss.IndexFlatL2(embeddings.shape[1])
+    if len(embeddings):
+        index.add(np.ascontiguousarray(embeddings, dtype=np.float32))
+    return index
+
+
+class EmbeddingStore:
+    """
+    On-disk cache of text embeddings and the FAISS index built from them.
+
+    Embeddings are keyed by the SHA-256 of the embedded text and stored per
+    embedding model, so switching models never mixes vectors from different
+    spaces. Loading memory-maps both the embedding matrix and the index
+    snapshot, which keeps startup cheap and lets the page cache share the
+    data between worker processes.
+
+    Attributes:
+        model_name: Name of the embedding model the vectors belong to.
+        cache_dir: Directory holding the cache files for ``model_name``.
+
+    Example:
+        >>> store = EmbeddingStore("/tmp/rag-cache", "all-MiniLM-L6-v2")
+        >>> embs, index = store.load_or_build(docs, embed_model.encode, 384)
+
+    See Also:
+        docs/services/agent.md#persistent-embedding-cache
+    """
+
+    def __init__(self, cache_dir: str, model_name: str) -> None:
+        """
+        Initialize the store.
+
+        Args:
+            cache_dir: Root cache directory; a sub-directory per model is used.
+            model_name: Embedding model name, recorded in the manifest.
+        """
+        self.model_name = model_name
+        self.cache_dir = Path(cache_dir) / _model_slug(model_name)
+
+    def _load_cached(self, dim: int) -> Tuple[List[str], Optional[np.ndarray]]:
+        """
+        Load the cached manifest and memory-mapped embedding matrix.
+
+        Args:
+            dim: Expected embedding dimension; a mismatch discards the cache.
+
+        Returns:
+            Tuple of (row hashes, embeddings) or ``([], None)`` when there is
+            no usable cache.
+        """
+        manifest_path = self.cache_dir / MANIFEST_FILE
+        embeddings_path = self.cache_dir / EMBEDDINGS_FILE
+        if not manifest_path.exists() or not embeddings_path.exists():
+            return [], None
+        try:
+            manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+            embeddings = np.load(embeddings_path, mmap_mode="r")
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable embedding cache in {self.cache_dir}: {e}")
+            return [], None
+
+        hashes = manifest.get("hashes", [])
+        if (
+            manifest.get("model") != self.model_name
+            or manifest.get("dim") != dim
+            or embeddings.shape != (len(hashes), dim)
+        ):
+            logger.info(f"Embedding cache in {self.cache_dir} does not match, rebuilding")
+            return [], None
+        return hashes, embeddings
+
+    def _save_embeddings(self, hashes: Sequence[str], embeddings: np.ndarray) -> None:
+        """Persist the embedding matrix first, then the manifest describing it."""
+        manifest = {"model": self.model_name, "dim": int(embeddings.shape[1]), "hashes": list(hashes)}
+
+        def write_npy(path: str) -> None:
+            # np.save appends ".npy" to bare paths, so hand it a file object
+            with open(path, "wb") as f:
+                np.save(f, np.ascontiguousarray(embeddings, dtype=np.float32))
+
+        _atomic_write(self.cache_dir / EMBEDDINGS_FILE, write_npy)
+        _atomic_write(
+            self.cache_dir / MANIFEST_FILE,
+            lambda p: Path(p).write_text(json.dumps(manifest), encoding="utf-8"),
+        )
+
+    def _load_index(self, fingerprint: str) -> Optional[faiss.Index]:
+        """Read the index snapshot, memory-mapped, if it was built for ``fingerprint``."""
+        index_path = self.cache_dir / INDEX_FILE
+        meta_path = self.cache_dir / INDEX_META_FILE
+        if not index_path.exists() or not meta_path.exists():
+            return None
+        try:
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+            if meta.get("fingerprint") != fingerprint:
+                return None
+            index, mapped = read_index_mapped(str(index_path))
+        except (OSError, ValueError, RuntimeError) as e:
+            logger.warning(f"Ignoring unreadable index snapshot {index_path}: {e}")
+            return None
+        logger.info(
+            f"{'Memory-mapped' if mapped else 'Read (not mappable)'} index snapshot "
+            f"with {index.ntotal} vectors"
+        )
+        return index
+
+    def _save_index(self, index: faiss.Index, fingerprint: str) -> None:
+        """Persist the index snapshot and the fingerprint it was built for."""
+        _atomic_write(self.cache_dir / INDEX_FILE, lambda p: faiss.write_index(index, p))
+        _atomic_write(
+            self.cache_dir / INDEX_META_FILE,
+            lambda p: Path(p).write_text(json.dumps({"fingerprint": fingerprint}), encoding="utf-8"),
+        )
+
+    def _fill(
+        self, texts: Sequence[str], hashes: Sequence[str], encode: EncodeFn, dim: int,
+        cached_rows: Dict[str, int], cached: Optional[np.ndarray],
+    ) -> Tuple[np.ndarray, List[int]]:
+        """
+        Assemble embeddings for ``texts`` from cached rows, encoding the rest.
+
+        Returns:
+            Tuple of (embeddings, indices of the texts that were encoded).
+        """
+        embeddings = np.empty((len(hashes), dim), dtype=np.float32)
+        missing = [i for i, h in enumerate(hashes) if h not in cached_rows]
+        if missing:
+            embeddings[missing] = np.asarray(encode([texts[i] for i in missing]), dtype=np.float32)
+        for i, h in enumerate(hashes):
+            if h in cached_rows:
+                embeddings[i] = cached[cached_rows[h]]
+        return embeddings, missing
+
+    def embed(self, texts: Sequence[str], encode: EncodeFn, dim: int) -> np.ndarray:
+        """
+        Return embeddings for ``texts``, encoding only those not in the cache.
+
+        Newly encoded vectors are added to the cache, so a later
+        :meth:`load_or_build` over the corpus (for example after a restart)
+        does not encode them again. Used for incremental updates, where only
+        a few texts change.
+
+        Args:
+            texts: Texts to embed.
+            encode: Function encoding a list of texts into a float32 matrix.
+            dim: Embedding dimension of the model.
+
+        Returns:
+            Float32 matrix, row ``i`` belonging to ``texts[i]``.
+        """
+        hashes = [content_hash(t) for t in texts]
+        cached_hashes, cached = self._load_cached(dim)
+        cached_rows = {h: i for i, h in enumerate(cached_hashes)}
+        embeddings, missing = self._fill(texts, hashes, encode, dim, cached_rows, cached)
+        if not missing:
+            return embeddings
+        new_rows = {hashes[i]: i for i in missing}
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            self._save_embeddings(
+                list(cached_hashes) + list(new_rows),
+                np.concatenate([
+                    cached if cached is not None else np.zeros((0, dim), dtype=np.float32),
+                    embeddings[list(new_rows.values())],
+                ]),
+            )
+        except OSError as e:
+            logger.warning(f"Could not write embedding cache: {e}")
+        return embeddings
+
+    def load_or_build(
+        self,
+        texts: Sequence[str],
+        encode: EncodeFn,
+        dim: int,
+        index_key: str = "flat",
+        build_index: Callable[[np.ndarray], faiss.Index] = build_flat_index,
+    ) -> Tuple[np.ndarray, faiss.Index]:
+        """
+        Return embeddings and a FAISS index for ``texts``, reusing the cache.
+
+        Only texts whose content hash is not in the cache are encoded. When
+        the set and order of texts is unchanged the embedding matrix and the
+        index snapshot are memory-mapped straight from disk.
+
+        Args:
+            texts: Texts to index; row ``i`` of the result belongs to ``texts[i]``.
+            encode: Function encoding a list of texts into a float32 matrix.
+            dim: Embedding dimension of the model.
+            index_key: Identifier of the index type, part of the snapshot
+                fingerprint so a different index type is never reused.
+            build_index: Factory building an index from the embedding matrix.
+
+        Returns:
+            Tuple of (embeddings, index). The embeddings may be a read-only
+            memory map.
+
+        Note:
+            Cache write failures (for example a read-only volume) are logged
+            and otherwise ignored; the freshly built data is still returned.
+        """
+        hashes = [content_hash(t) for t in texts]
+        if not hashes:
+            return np.zeros((0, dim), dtype=np.float32), build_index(np.zeros((0, dim), dtype=np.float32))
+
+        cached_hashes, cached = self._load_cached(dim)
+        cached_rows: Dict[str, int] = {h: i for i, h in enumerate(cached_hashes)}
+
+        writable = True
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+        except OSError as e:
+            logger.warning(f"Embedding cache directory {self.cache_dir} is not writable: {e}")
+            writable = False
+
+        if cached is not None and cached_hashes == hashes:
+            embeddings = cached
+            logger.info(f"Loaded {len(hashes)} cached embeddings from {self.cache_dir}")
+        else:
+            embeddings, missing = self._fill(texts, hashes, encode, dim, cached_rows, cached)
+            logger.info(
+                f"Embedded {len(missing)} new or changed texts, "
+                f"reused {len(hashes) - len(missing)} from cache"
+            )
+            if writable:
+                try:
+                    self._save_embeddings(hashes, embeddings)
+                except OSError as e:
+                    logger.warning(f"Could not write embedding cache: {e}")
+
+        fingerprint = content_hash(f"{index_key}\n" + "\n".join(hashes))
+        index = self._load_index(fingerprint)
+        if index is not None:
+            return embeddings, index
+
+        index = build_index(embeddings)
+        if writable:
+            try:
+                self._save_index(index, fingerprint)
+            except (OSError, RuntimeError) as e:
+                logger.warning(f"Could not write index snapshot: {e}")
+        return embeddings, index
@@ -0,0 +1,19 @@
+"""
+Observability for the Agent service: metrics and per-turn latency traces.
+
+See: docs/services/agent.md#metrics-collection
+"""
+
+from .metrics import AgentMetrics, Histogram, RingBuffer, WorkerMetrics, per_process_path
+from .tracing import JsonLinesExporter, TurnTracer, untraced
+
+__all__ = [
+    "AgentMetrics",
+    "Histogram",
+    "JsonLinesExporter",
+    "RingBuffer",
+    "TurnTracer",
+    "WorkerMetrics",
+    "per_process_path",
+    "untraced",
+]
@@ -0,0 +1,700 @@
+"""
+Low-overhead metrics for the voice pipeline.
+
+The plugin ``metrics_collected`` callbacks used to spawn an asyncio task per
+event just to format a long f-string for ``logger.info``. ``AgentMetrics``
+instead records the interesting fields synchronously, in the callback, into
+preallocated ring buffers (recent values, for percentiles) and fixed-bucket
+histograms (all values since start). Recording is a few list/array writes
+and never touches the event loop.
+
+The aggregates are exported as Prometheus text on a local HTTP endpoint
+(``/metrics``, with ``/metrics.json`` for the same data as JSON) and/or as a
+periodic JSON dump, both served from a daemon thread.
+
+LiveKit runs every job in its own process. Each job process publishes its
+raw state (counters, histogram buckets, recent samples) to
+``<directory>/job-<pid>-<start>.json`` with
+:meth:`AgentMetrics.start_publisher`, and ``WorkerMetrics`` in the main
+process merges those files into one registry on every scrape or dump, so
+one port and one dump file cover the worker. States of processes that
+exited are folded into ``<directory>/exited.json`` and their files deleted,
+so a scrape only reads the processes that are still running.
+
+See: docs/services/agent.md#metrics-collection
+"""
+
+import bisect
+import json
+import logging
+import math
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger("local-agent")
+
+LATENCY_BUCKETS = (0.025, 0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0, 10.0)
+RATE_BUCKETS = (5.0, 10.0, 20.0, 30.0, 50.0, 75.0, 100.0, 150.0, 200.0, 300.0)
+QUANTILES = (0.5, 0.95, 0.99)
+
+# Job states under WorkerMetrics.directory, and the sum of the exited ones
+JOB_STATE_GLOB = "job-*.json"
+EXITED_STATE_FILE = "exited.json"
+
+
+class RingBuffer:
+    """
+    Fixed-capacity buffer of the most recent float samples.
+
+    Attributes:
+        capacity: Number of samples kept; older ones are overwritten.
+    """
+
+    def __init__(self, capacity: int) -> None:
+        """Preallocate storage for ``capacity`` samples."""
+        self.capacity = capacity
+        self._data = np.zeros(capacity, dtype=np.float64)
+        self._next = 0
+        self._size = 0
+
+    def append(self, value: float) -> None:
+        """Store ``value``, overwriting the oldest sample when full."""
+        self._data[self._next] = value
+        self._next = (self._next + 1) % self.capacity
+        if self._size < self.capacity:
+            self._size += 1
+
+    def __len__(self) -> int:
+        """Return the number of samples held."""
+        return self._size
+
+    def values(self) -> np.ndarray:
+        """Return a copy of the held samples, oldest first."""
+        if self._size < self.capacity:
+            return self._data[: self._size].copy()
+        return np.concatenate((self._data[self._next :], self._data[: self._next]))
+
+
+class Histogram:
+    """
+    Cumulative fixed-bucket histogram, Prometheus style.
+
+    Attributes:
+        bounds: Upper bounds of the buckets; a final ``+Inf`` bucket is implied.
+        count: Number of observations.
+        sum: Sum of all observations.
+    """
+
+    def __init__(self, bounds: Sequence[float]) -> None:
+        """Create empty buckets for ``bounds`` (sorted ascending)."""
+        self.bounds = tuple(bounds)
+        self._counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        """Add one observation."""
+        self._counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def counts(self) -> List[int]:
+        """Return the count per bucket, ``+Inf`` last."""
+        return list(self._counts)
+
+    def add(self, counts: Sequence[int], total: float) -> None:
+        """Add the bucket ``counts`` and sum of a histogram with the same bounds."""
+        if len(counts) != len(self._counts):
+            raise ValueError(f"expected {len(self._counts)} buckets, got {len(counts)}")
+        for i, c in enumerate(counts):
+            self._counts[i] += c
+        self.count += sum(counts)
+        self.sum += total
+
+    def cumulative(self) -> List[int]:
+        """Return cumulative counts per bucket, ``+Inf`` last."""
+        total, out = 0, []
+        for c in self._counts:
+            total += c
+            out.append(total)
+        return out
+
+
+class Series:
+    """
+    One metric: a histogram of all values plus a window of recent values.
+
+    Attributes:
+        name: Prometheus metric name.
+        help: One-line description.
+        histogram: All-time distribution.
+        recent: Most recent samples, for percentiles.
+    """
+
+    def __init__(self, name: str, help: str, bounds: Sequence[float], window: int) -> None:
+        """Create the series with empty storage."""
+        self.name = name
+        self.help = help
+        self.histogram = Histogram(bounds)
+        self.recent = RingBuffer(window)
+
+    def observe(self, value: float) -> None:
+        """Record one sample."""
+        self.histogram.observe(value)
+        self.recent.append(value)
+
+    def quantiles(self) -> Dict[str, Optional[float]]:
+        """Return p50/p95/p99 over the recent window (None when empty)."""
+        values = self.recent.values()
+        if not len(values):
+            return {f"p{int(q * 100)}": None for q in QUANTILES}
+        points = np.percentile(values, [q * 100 for q in QUANTILES])
+        return {f"p{int(q * 100)}": float(p) for q, p in zip(QUANTILES, points)}
+
+
+class AgentMetrics:
+    """
+    Metrics registry of one worker process.
+
+    The ``record_*`` methods are registered directly as plugin
+    ``metrics_collected`` listeners; they are synchronous and cheap.
+    Readers (HTTP endpoint, JSON dump) run on other threads and take the
+    same lock, so an export never sees a half-recorded event.
+
+    Example:
+        >>> metrics = AgentMetrics()
+        >>> llm.on("metrics_collected", metrics.record_llm)
+        >>> metrics.start_exporter(port=9464)
+
+    See Also:
+        docs/services/agent.md#metrics-collection
+    """
+
+    def __init__(self, window: int = 1024) -> None:
+        """
+        Create all series.
+
+        Args:
+            window: Samples kept per series for percentiles.
+        """
+        self.window = window
+        self._lock = threading.Lock()
+        self.series: Dict[str, Series] = {}
+        self.counters: Dict[str, float] = {}
+        self._counter_help: Dict[str, str] = {}
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._dump_thread: Optional[threading.Thread] = None
+        self._publisher: Optional[threading.Thread] = None
+
+        self._llm_ttft = self.add_series("llm_ttft_seconds", "LLM time to first token")
+        self._llm_duration = self.add_series("llm_duration_seconds", "LLM request duration")
+        self._llm_tps = self.add_series(
+            "llm_tokens_per_second", "LLM completion tokens per second", RATE_BUCKETS
+        )
+        self._stt_duration = self.add_series("stt_duration_seconds", "STT request duration")
+        self._eou_delay = self.add_series(
+            "eou_end_of_utterance_delay_seconds", "End of speech to end of turn decision"
+        )
+        self._eou_transcription = self.add_series(
+            "eou_transcription_delay_seconds", "End of speech to final transcript"
+        )
+        self._tts_ttfb = self.add_series("tts_ttfb_seconds", "TTS time to first audio byte")
+        self._tts_duration = self.add_series("tts_duration_seconds", "TTS request duration")
+        self._vad_inference = self.add_series(
+            "vad_inference_seconds",
+            "Silero VAD inference time per window",
+            (0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05),
+        )
+        self.add_series("time_to_first_audio_seconds", "End of user turn to first reply audio")
+        self.add_series("endpointing_delay_seconds", "Endpointing delay in effect at the end of a user turn")
+
+        for name, help in (
+            ("llm_requests_total", "LLM requests"),
+            ("llm_cancelled_total", "LLM requests cancelled"),
+            ("llm_prompt_tokens_total", "LLM prompt tokens"),
+            ("llm_completion_tokens_total", "LLM completion tokens"),
+            ("stt_requests_total", "STT requests"),
+            ("stt_audio_seconds_total", "Audio seconds transcribed"),
+            ("stt_errors_total", "STT requests that failed"),
+            ("tts_requests_total", "TTS requests"),
+            ("tts_cancelled_total", "TTS requests cancelled"),
+            ("tts_characters_total", "Characters synthesized"),
+            ("tts_audio_seconds_total", "Audio seconds synthesized"),
+            ("tts_errors_total", "TTS requests that failed"),
+            ("tts_cache_hits_total", "TTS segments played from the audio cache"),
+            ("tts_cache_misses_total", "Cacheable TTS segments that were synthesized"),
+            ("llm_cache_hits_total", "LLM replies served from the reply cache"),
+            ("llm_cache_misses_total", "LLM replies generated with the reply cache enabled"),
+            ("barge_in_total", "Replies cancelled because the user started speaking"),
+            ("barge_in_llm_tokens_total", "Estimated LLM tokens generated for replies interrupted before they finished"),
+            ("barge_in_llm_tokens_saved_total", "Estimated LLM tokens not generated because the reply was interrupted"),
+            ("barge_in_tts_segments_total", "TTS segments whose synthesis was cancelled by an interruption"),
+            ("barge_in_tts_characters_total", "Characters of those TTS segments"),
+            ("endpointing_cutoffs_total", "User turns continued right after they were ended"),
+        ):
+            self.add_counter(name, help)
+
+    def add_series(
+        self, name: str, help: str, bounds: Sequence[float] = LATENCY_BUCKETS
+    ) -> Series:
+        """
+        Register a histogram series.
+
+        Args:
+            name: Prometheus metric name.
+            help: One-line description.
+            bounds: Histogram bucket upper bounds.
+
+        Returns:
+            The series; call ``observe`` on it or use :meth:`observe`.
+        """
+        series = Series(name, help, bounds, self.window)
+        self.series[name] = series
+        return series
+
+    def add_counter(self, name: str, help: str) -> None:
+        """Register a monotonically increasing counter."""
+        self.counters[name] = 0.0
+        self._counter_help[name] = help
+
+    def observe(self, name: str, value: Optional[float]) -> None:
+        """Record ``value`` in series ``name``; None and NaN are ignored."""
+        if value is None or value != value:
+            return
+        with self._lock:
+            self.series[name].observe(value)
+
+    def inc(self, name: str, amount: float = 1.0) -> None:
+        """Increase counter ``name`` by ``amount``."""
+        with self._lock:
+            self.counters[name] += amount
+
+    @staticmethod
+    def _positive(value) -> Optional[float]:
+        """Return ``value`` as float if it is a positive number, else None."""
+        if isinstance(value, (int, float)) and value > 0 and not math.isinf(value):
+            return float(value)
+        return None
+
+    def record_llm(self, metrics) -> None:
+        """``llm.on("metrics_collected")`` listener."""
+        with self._lock:
+            self.counters["llm_requests_total"] += 1
+            if getattr(metrics, "cancelled", False):
+                self.counters["llm_cancelled_total"] += 1
+            self.counters["llm_prompt_tokens_total"] += getattr(metrics, "prompt_tokens", 0) or 0
+            self.counters["llm_completion_tokens_total"] += getattr(metrics, "completion_tokens", 0) or 0
+            for series, value in (
+                (self._llm_ttft, getattr(metrics, "ttft", None)),
+                (self._llm_duration, getattr(metrics, "duration", None)),
+                (self._llm_tps, getattr(metrics, "tokens_per_second", None)),
+            ):
+                value = self._positive(value)
+                if value is not None:
+                    series.observe(value)
+
+    def record_stt(self, metrics) -> None:
+        """``stt.on("metrics_collected")`` listener."""
+        with self._lock:
+            self.counters["stt_requests_total"] += 1
+            self.counters["stt_audio_seconds_total"] += getattr(metrics, "audio_duration", 0) or 0
+            if getattr(metrics, "error", None):
+                self.counters["stt_errors_total"] += 1
+            duration = self._positive(getattr(metrics, "duration", None))
+            if duration is not None:
+                self._stt_duration.observe(duration)
+
+    def record_eou(self, metrics) -> None:
+        """``stt.on("eou_metrics_collected")`` listener."""
+        with self._lock:
+            for series, value in (
+                (self._eou_delay, getattr(metrics, "end_of_utterance_delay", None)),
+                (self._eou_transcription, getattr(metrics, "transcription_delay", None)),
+            ):
+                if isinstance(value, (int, float)) and value >= 0:
+                    series.observe(float(value))
+
+    def record_tts(self, metrics) -> None:
+        """``tts.on("metrics_collected")`` listener."""
+        with self._lock:
+            self.counters["tts_requests_total"] += 1
+            if getattr(metrics, "cancelled", False):
+                self.counters["tts_cancelled_total"] += 1
+            if getattr(metrics, "error", None):
+                self.counters["tts_errors_total"] += 1
+            self.counters["tts_characters_total"] += getattr(metrics, "characters_count", 0) or 0
+            self.counters["tts_audio_seconds_total"] += getattr(metrics, "audio_duration", 0) or 0
+            for series, value in (
+                (self._tts_ttfb, getattr(metrics, "ttfb", None)),
+                (self._tts_duration, getattr(metrics, "duration", None)),
+            ):
+                value = self._positive(value)
+                if value is not None:
+                    series.observe(value)
+
+    def record_vad(self, metrics) -> None:
+        """``vad.on("metrics_collected")`` listener: mean inference time per window."""
+        count = getattr(metrics, "inference_count", 0)
+        total = getattr(metrics, "inference_duration_total", None)
+        if count and total is not None:
+            with self._lock:
+                self._vad_inference.observe(total / count)
+
+    def snapshot(self) -> Dict:
+        """
+        Return all metrics as a JSON-serializable dict.
+
+        Returns:
+            ``{"pid", "timestamp", "counters", "series": {name: {count, sum,
+            mean, p50, p95, p99}}}``; percentiles cover the recent window.
+        """
+        with self._lock:
+            series = {}
+            for name, s in self.series.items():
+                h = s.histogram
+                series[name] = {
+                    "count": h.count,
+                    "sum": h.sum,
+                    "mean": h.sum / h.count if h.count else None,
+                    **s.quantiles(),
+                }
+            return {
+                "pid": os.getpid(),
+                "timestamp": time.time(),
+                "counters": dict(self.counters),
+                "series": series,
+            }
+
+    def state(self) -> Dict:
+        """
+        Return the raw metrics, for :meth:`merge` in another process.
+
+        Returns:
+            ``{"pid", "timestamp", "counters", "series": {name: {buckets,
+            sum, recent}}}``; ``buckets`` are per-bucket counts, ``+Inf`` last.
+        """
+        with self._lock:
+            return {
+                "pid": os.getpid(),
+                "timestamp": time.time(),
+                "counters": dict(self.counters),
+                "series": {
+                    name: {
+                        "buckets": s.histogram.counts(),
+                        "sum": s.histogram.sum,
+                        "recent": s.recent.values().tolist(),
+                    }
+                    for name, s in self.series.items()
+                },
+            }
+
+    def merge(self, states: Iterable[Dict], recent_max_age: float = float("inf")) -> None:
+        """
+        Replace all metrics with the sum of ``states``.
+
+        Counters and histograms are summed. Recent samples are pooled from
+        states written within ``recent_max_age`` seconds only, so percentiles
+        do not include processes that stopped long ago.
+
+        Args:
+            states: Results of :meth:`state`, one per process.
+            recent_max_age: Age limit of the states whose samples are pooled.
+        """
+        now = time.time()
+        counters = dict.fromkeys(self.counters, 0.0)
+        histograms = {name: Histogram(s.histogram.bounds) for name, s in self.series.items()}
+        recent: Dict[str, List[float]] = {name: [] for name in self.series}
+        for state in states:
+            fresh = now - state.get("timestamp", 0) <= recent_max_age
+            for name, value in state.get("counters", {}).items():
+                if name in counters:
+                    counters[name] += value
+            for name, data in state.get("series", {}).items():
+                if name not in histograms:
+                    continue
+                try:
+                    histograms[name].add(data["buckets"], data["sum"])
+                except (KeyError, ValueError):
+                    continue
+                if fresh:
+                    recent[name].extend(data.get("recent", ()))
+        with self._lock:
+            self.counters = counters
+            for name, s in self.series.items():
+                s.histogram = histograms[name]
+                s.recent = RingBuffer(max(1, len(recent[name])))
+                for value in recent[name]:
+                    s.recent.append(value)
+
+    def start_publisher(self, directory: str, interval: float = 5.0) -> None:
+        """
+        Write :meth:`state` to ``<directory>/job-<pid>-<start>.json`` every ``interval`` seconds.
+
+        Runs on a daemon thread; later calls are ignored. ``WorkerMetrics``
+        in the main process reads the files. The start time in the name
+        keeps a process that gets a reused pid from overwriting the state of
+        the process that had it before.
+        """
+        if self._publisher is not None:
+            return
+        path = os.path.join(directory, f"job-{os.getpid()}-{time.time_ns()}.json")
+        self._publisher = threading.Thread(
+            target=self._write_loop, args=(path, self.state, interval, True), name="metrics-publish", daemon=True
+        )
+        self._publisher.start()
+
+    def render_prometheus(self) -> str:
+        """
+        Return all metrics in the Prometheus text exposition format.
+
+        Each series is a ``histogram`` over all samples plus a ``summary``
+        named ``<name>_recent`` with quantiles over the recent window.
+        """
+        lines: List[str] = []
+        with self._lock:
+            for name, value in self.counters.items():
+                lines.append(f"# HELP {name} {self._counter_help[name]}")
+                lines.append(f"# TYPE {name} counter")
+                lines.append(f"{name} {value:g}")
+            for name, s in self.series.items():
+                h = s.histogram
+                lines.append(f"# HELP {name} {s.help}")
+                lines.append(f"# TYPE {name} histogram")
+                for bound, count in zip((*h.bounds, "+Inf"), h.cumulative()):
+                    le = bound if isinstance(bound, str) else f"{bound:g}"
+                    lines.append(f'{name}_bucket{{le="{le}"}} {count}')
+                lines.append(f"{name}_sum {h.sum:g}")
+                lines.append(f"{name}_count {h.count}")
+                lines.append(f"# TYPE {name}_recent summary")
+                for q, value in zip(QUANTILES, s.quantiles().values()):
+                    if value is not None:
+                        lines.append(f'{name}_recent{{quantile="{q:g}"}} {value:g}')
+                lines.append(f"{name}_recent_count {len(s.recent)}")
+        return "\n".join(lines) + "\n"
+
+    def start_exporter(
+        self, host: str = "127.0.0.1", port: int = 0, dump_path: str = "", dump_interval: float = 60.0
+    ) -> None:
+        """
+        Serve ``/metrics`` and/or dump JSON periodically, from daemon threads.
+
+        Safe to call more than once; later calls are ignored. When ``port``
+        is taken (job processes exporting on their own, see
+        ``per_process_path``), the endpoint binds an ephemeral port instead
+        and logs it.
+
+        Args:
+            host: Interface of the HTTP endpoint.
+            port: Port of the HTTP endpoint; 0 disables it.
+            dump_path: JSON dump file; ``{pid}`` is replaced by the process
+                id. Empty disables the dump.
+            dump_interval: Seconds between JSON dumps.
+        """
+        if port and self._server is None:
+            self._server = self._serve(host, port)
+        if dump_path and self._dump_thread is None:
+            self._dump_thread = threading.Thread(
+                target=self._write_loop,
+                args=(dump_path.replace("{pid}", str(os.getpid())), self.snapshot, dump_interval),
+                name="metrics-dump",
+                daemon=True,
+            )
+            self._dump_thread.start()
+
+    def _serve(self, host: str, port: int) -> Optional[ThreadingHTTPServer]:
+        """Start the HTTP endpoint on ``port`` (or an ephemeral port)."""
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                if self.path.split("?")[0] == "/metrics":
+                    body = registry.render_prometheus().encode("utf-8")
+                    content_type = "text/plain; version=0.0.4; charset=utf-8"
+                elif self.path.split("?")[0] == "/metrics.json":
+                    body = json.dumps(registry.snapshot()).encode("utf-8")
+                    content_type = "application/json"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args) -> None:
+                pass
+
+        for candidate in (port, 0):
+            try:
+                server = ThreadingHTTPServer((host, candidate), Handler)
+                break
+            except OSError as e:
+                logger.info(f"Metrics port {candidate} unavailable ({e}), trying an ephemeral port")
+        else:
+            return None
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+        logger.info(f"Serving metrics on http://{host}:{server.server_address[1]}/metrics")
+        return server
+
+    @staticmethod
+    def _write_loop(path: str, data: Callable[[], Dict], interval: float, first: bool = False) -> None:
+        """Write ``data()`` as JSON to ``path`` every ``interval`` seconds, also at once if ``first``."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        while True:
+            if not first:
+                time.sleep(interval)
+            first = False
+            try:
+                _write_json(path, data())
+            except OSError as e:
+                logger.warning(f"Failed to write metrics {path}: {e}")
+
+
+class WorkerMetrics(AgentMetrics):
+    """
+    Metrics of all job processes of a worker, merged in the main process.
+
+    Every :meth:`snapshot` and :meth:`render_prometheus` first merges the
+    states the job processes published to ``directory``. A state not
+    rewritten for ``recent_max_age`` seconds belongs to a process that
+    exited: its counters and histograms are folded into ``exited.json`` and
+    its file is deleted. Counters therefore do not drop when a job process
+    goes away, and a scrape reads one file per running process plus one.
+    :meth:`reset` clears everything when the worker starts.
+
+    Example:
+        >>> worker_metrics = WorkerMetrics("/tmp/local-voice-ai/metrics")
+        >>> worker_metrics.reset()
+        >>> worker_metrics.start_exporter(port=9464)
+        >>> # in each job process:
+        >>> agent_metrics.start_publisher("/tmp/local-voice-ai/metrics")
+
+    See Also:
+        docs/services/agent.md#exporting-metrics
+    """
+
+    def __init__(self, directory: str, window: int = 1024, recent_max_age: float = 60.0) -> None:
+        """
+        Args:
+            directory: Where the job processes publish their state.
+            window: Samples kept per series in each job process.
+            recent_max_age: States older than this many seconds add no
+                samples to the percentiles and are folded into
+                ``exited.json``. Must be well above the publish interval.
+        """
+        super().__init__(window)
+        self.directory = Path(directory)
+        self.recent_max_age = recent_max_age
+        self.processes = 0
+        # scrapes and dumps run on different threads; a state must be folded once
+        self._refresh_lock = threading.Lock()
+
+    def reset(self) -> None:
+        """Delete the states left by a previous run of the worker."""
+        for path in self.directory.glob("*.json"):
+            path.unlink(missing_ok=True)
+
+    def refresh(self) -> None:
+        """Fold the states of exited job processes, then merge all states."""
+        with self._refresh_lock:
+            now = time.time()
+            live, exited = [], []
+            for path in self.directory.glob(JOB_STATE_GLOB):
+                try:
+                    state = json.loads(path.read_text(encoding="utf-8"))
+                except (OSError, ValueError):
+                    continue
+                if now - state.get("timestamp", 0) > self.recent_max_age:
+                    exited.append((path, state))
+                else:
+                    live.append(state)
+            folded = self._fold_exited([state for _, state in exited])
+            for path, _ in exited:
+                path.unlink(missing_ok=True)
+            self.merge([folded, *live], self.recent_max_age)
+            self.processes = len(live)
+
+    def _fold_exited(self, states: List[Dict]) -> Dict:
+        """Add ``states`` to ``exited.json`` and return its new contents."""
+        path = self.directory / EXITED_STATE_FILE
+        try:
+            folded = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            folded = _fold_states(())
+        if states:
+            folded = _fold_states([folded, *states])
+            try:
+                _write_json(str(path), folded)
+            except OSError as e:
+                logger.warning(f"Failed to write metrics {path}: {e}")
+        return folded
+
+    def snapshot(self) -> Dict:
+        """Return the merged metrics as :meth:`AgentMetrics.snapshot`, plus ``processes``."""
+        self.refresh()
+        return {**super().snapshot(), "processes": self.processes}
+
+    def render_prometheus(self) -> str:
+        """Return the merged metrics in the Prometheus text format."""
+        self.refresh()
+        return (
+            "# HELP worker_job_processes Job processes whose metrics are merged\n"
+            "# TYPE worker_job_processes gauge\n"
+            f"worker_job_processes {self.processes}\n"
+        ) + super().render_prometheus()
+
+
+def _fold_states(states: Iterable[Dict]) -> Dict:
+    """
+    Sum the counters and histograms of ``states`` into one state.
+
+    The result has no recent samples and a timestamp of 0, so
+    :meth:`AgentMetrics.merge` counts it in the totals but not in the
+    percentiles.
+    """
+    counters: Dict[str, float] = {}
+    series: Dict[str, Dict] = {}
+    for state in states:
+        for name, value in state.get("counters", {}).items():
+            counters[name] = counters.get(name, 0.0) + value
+        for name, data in state.get("series", {}).items():
+            try:
+                buckets, total = list(data["buckets"]), float(data["sum"])
+            except (KeyError, TypeError, ValueError):
+                continue
+            folded = series.get(name)
+            if folded is None:
+                series[name] = {"buckets": buckets, "sum": total, "recent": []}
+            elif len(folded["buckets"]) == len(buckets):
+                folded["buckets"] = [a + b for a, b in zip(folded["buckets"], buckets)]
+                folded["sum"] += total
+    return {"pid": None, "timestamp": 0, "counters": counters, "series": series}
+
+
+def _write_json(path: str, data: Dict) -> None:
+    """Replace ``path`` with ``data`` as JSON, atomically."""
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def per_process_path(path: str) -> str:
+    """
+    Return ``path`` with a ``{pid}`` placeholder, so job processes do not overwrite each other.
+
+    The placeholder is added before the extension if missing.
+    """
+    if not path or "{pid}" in path:
+        return path
+    root, ext = os.path.splitext(path)
+    logger.warning(f"Metrics dump path {path} has no {{pid}}; using {root}-{{pid}}{ext}")
+    return f"{root}-{{pid}}{ext}"
@@ -0,0 +1,373 @@
+"""
+Per-turn latency tracing across VAD/EOU, STT, RAG, LLM and TTS.
+
+Each plugin reports its own metrics with its own ``request_id``, so the
+logs could not answer "where did the 2.4 s of this turn go". ``TurnTracer``
+stitches everything that happens between the end of the user's speech and
+the end of the agent's reply into one trace: a ``turn`` root span with a
+child span per component, keyed by the turn's ``speech_id``.
+
+Plugin metrics only arrive when a request has finished, so their spans are
+reconstructed backwards from ``metrics.timestamp`` and the reported
+durations. Spans the agent measures itself, such as the RAG embed and
+search, are recorded directly with :meth:`TurnTracer.span`.
+
+Finished turns are written as OTLP/JSON lines (the format the
+OpenTelemetry Collector's ``otlpjsonfile`` receiver reads), and a
+waterfall summary is logged.
+
+See: docs/services/agent.md#turn-tracing
+"""
+
+import contextlib
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger("local-agent")
+
+SERVICE_NAME = "local-voice-agent"
+_WATERFALL_WIDTH = 40
+
+
+def _new_id(nbytes: int) -> str:
+    """Return a random hex id of ``nbytes`` bytes, as used by OTLP."""
+    return os.urandom(nbytes).hex()
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    """Encode an attribute value as an OTLP ``AnyValue``."""
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+@dataclass
+class Span:
+    """One timed operation of a turn; times are Unix epoch nanoseconds."""
+
+    name: str
+    start_ns: int
+    end_ns: int
+    span_id: str = field(default_factory=lambda: _new_id(8))
+    parent: Optional[str] = None
+    attributes: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def duration(self) -> float:
+        """Duration in seconds."""
+        return (self.end_ns - self.start_ns) / 1e9
+
+
+class TurnTrace:
+    """
+    Spans of one user turn and the agent's reply.
+
+    Attributes:
+        trace_id: OTLP trace id.
+        speech_id: LiveKit ``speech_id`` of the turn, once a component
+            reports one.
+        spans: Component spans, without the root.
+    """
+
+    def __init__(self) -> None:
+        """Start an empty trace."""
+        self.trace_id = _new_id(16)
+        self.root_id = _new_id(8)
+        self.speech_id: Optional[str] = None
+        self.spans: List[Span] = []
+        self.has_eou = False
+
+    def add(
+        self,
+        name: str,
+        start_ns: int,
+        end_ns: int,
+        parent: Optional[Span] = None,
+        **attributes: Any,
+    ) -> Span:
+        """Add a span under ``parent`` (the root when None) and return it."""
+        span = Span(
+            name,
+            start_ns,
+            max(end_ns, start_ns),
+            parent=parent.span_id if parent else self.root_id,
+            attributes={k: v for k, v in attributes.items() if v is not None},
+        )
+        self.spans.append(span)
+        return span
+
+    def root(self) -> Span:
+        """Return the ``turn`` span covering all component spans."""
+        start = min(s.start_ns for s in self.spans)
+        end = max(s.end_ns for s in self.spans)
+        attributes = {"speech_id": self.speech_id} if self.speech_id else {}
+        return Span("turn", start, end, span_id=self.root_id, attributes=attributes)
+
+    def to_otlp(self) -> Dict[str, Any]:
+        """Return the trace as an OTLP/JSON ``ExportTraceServiceRequest``."""
+        spans = []
+        for span in [self.root(), *self.spans]:
+            otlp = {
+                "traceId": self.trace_id,
+                "spanId": span.span_id,
+                "name": span.name,
+                "kind": 1,
+                "startTimeUnixNano": str(span.start_ns),
+                "endTimeUnixNano": str(span.end_ns),
+                "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in span.attributes.items()],
+            }
+            if span.parent:
+                otlp["parentSpanId"] = span.parent
+            spans.append(otlp)
+        return {
+            "resourceSpans": [{
+                "resource": {
+                    "attributes": [
+                        {"key": "service.name", "value": {"stringValue": SERVICE_NAME}},
+                        {"key": "process.pid", "value": {"intValue": str(os.getpid())}},
+                    ]
+                },
+                "scopeSpans": [{"scope": {"name": "local-agent.tracing"}, "spans": spans}],
+            }]
+        }
+
+    def waterfall(self) -> str:
+        """Return a text waterfall of the turn, one line per span."""
+        root = self.root()
+        total = max(root.end_ns - root.start_ns, 1)
+        depth = {self.root_id: 0}
+        lines = [f"Turn {self.speech_id or self.trace_id[:8]}: {root.duration * 1000:.0f} ms"]
+        for span in sorted(self.spans, key=lambda s: s.start_ns):
+            level = depth.get(span.parent, 0) + 1
+            depth[span.span_id] = level
+            offset = span.start_ns - root.start_ns
+            begin = int(offset / total * _WATERFALL_WIDTH)
+            width = max(1, round((span.end_ns - span.start_ns) / total * _WATERFALL_WIDTH))
+            bar = " " * begin + "#" * min(width, _WATERFALL_WIDTH - begin)
+            label = "  " * (level - 1) + span.name
+            lines.append(
+                f"  {label:<22} |{bar:<{_WATERFALL_WIDTH}}| "
+                f"+{offset / 1e6:6.0f} ms {span.duration * 1000:6.0f} ms"
+            )
+        return "\n".join(lines)
+
+
+class JsonLinesExporter:
+    """
+    Appends finished traces to a file, one OTLP/JSON request per line.
+
+    Each line is written with a single ``write`` on a file opened for
+    appending, so several job processes can share one file.
+
+    Attributes:
+        path: Output file.
+    """
+
+    def __init__(self, path: str) -> None:
+        """Create the exporter; the directory is created on first export."""
+        self.path = os.path.expanduser(path)
+        self._lock = threading.Lock()
+
+    def export(self, trace: TurnTrace) -> None:
+        """Append ``trace`` to the file; errors are logged, not raised."""
+        line = json.dumps(trace.to_otlp(), separators=(",", ":")) + "\n"
+        try:
+            with self._lock:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(line)
+        except OSError as e:
+            logger.warning(f"Failed to export trace to {self.path}: {e}")
+
+
+@contextlib.contextmanager
+def untraced(name: str, parent: Optional[Span] = None, **attributes: Any) -> Iterator[Span]:
+    """Drop-in for :meth:`TurnTracer.span` when no tracer is active."""
+    yield Span(name, 0, 0, attributes=dict(attributes))
+
+
+def _epoch_ns(timestamp: Any) -> int:
+    """Convert a metrics timestamp (epoch seconds or datetime) to epoch ns."""
+    if isinstance(timestamp, (int, float)) and timestamp > 0:
+        return int(timestamp * 1e9)
+    if hasattr(timestamp, "timestamp"):
+        return int(timestamp.timestamp() * 1e9)
+    return time.time_ns()
+
+
+class TurnTracer:
+    """
+    Collects the spans of the current turn of one agent session.
+
+    A turn starts with the first span recorded after the previous turn
+    ended. It ends when the agent goes back to listening after speaking, or
+    when the next end-of-utterance arrives. The finished turn is then
+    exported and its waterfall logged.
+
+    Example:
+        >>> tracer = TurnTracer(JsonLinesExporter("~/.cache/local-voice-ai/traces.jsonl"))
+        >>> llm.on("metrics_collected", tracer.record_llm)
+        >>> with tracer.span("rag.search"):
+        ...     hits = retriever.search(q_emb)
+
+    See Also:
+        docs/services/agent.md#turn-tracing
+    """
+
+    def __init__(self, exporter: Optional[JsonLinesExporter] = None, log_waterfall: bool = True) -> None:
+        """
+        Initialize the tracer.
+
+        Args:
+            exporter: Where finished turns are written; None to only log.
+            log_waterfall: Log a waterfall summary of every finished turn.
+        """
+        self.exporter = exporter
+        self.log_waterfall = log_waterfall
+        self._turn: Optional[TurnTrace] = None
+        self._speaking_since: Optional[int] = None
+
+    @property
+    def turn(self) -> TurnTrace:
+        """The current turn, started on first use."""
+        if self._turn is None:
+            self._turn = TurnTrace()
+        return self._turn
+
+    def _claim(self, speech_id: Optional[str]) -> TurnTrace:
+        """Return the current turn, adopting ``speech_id`` if it has none."""
+        turn = self.turn
+        if speech_id and turn.speech_id is None:
+            turn.speech_id = speech_id
+        return turn
+
+    def add(self, name: str, start_ns: int, end_ns: int, **attributes: Any) -> Span:
+        """Record a finished span on the current turn."""
+        return self.turn.add(name, start_ns, end_ns, **attributes)
+
+    @contextlib.contextmanager
+    def span(self, name: str, parent: Optional[Span] = None, **attributes: Any) -> Iterator[Span]:
+        """
+        Time a block of code as a span of the current turn.
+
+        Args:
+            name: Span name.
+            parent: Enclosing span, for nesting; the turn root when None.
+            **attributes: Span attributes; more can be set on the yielded
+                span's ``attributes`` inside the block.
+
+        Yields:
+            The open span, to pass as ``parent`` of nested spans.
+        """
+        turn = self.turn
+        span = Span(
+            name, time.time_ns(), 0,
+            parent=parent.span_id if parent else turn.root_id,
+            attributes=dict(attributes),
+        )
+        try:
+            yield span
+        finally:
+            span.end_ns = time.time_ns()
+            turn.spans.append(span)
+
+    def record_eou(self, metrics) -> None:
+        """
+        ``stt.on("eou_metrics_collected")`` listener.
+
+        Adds ``vad.end_of_speech`` (instant), ``eou`` (end of speech to end
+        of turn decision) and ``stt.final_transcript`` (end of speech to
+        final transcript) spans.
+        """
+        if self._turn is not None and self._turn.has_eou:
+            self.finish()
+        end = _epoch_ns(getattr(metrics, "timestamp", None))
+        delay = getattr(metrics, "end_of_utterance_delay", 0) or 0
+        transcription = getattr(metrics, "transcription_delay", 0) or 0
+        speech_end = end - int(delay * 1e9)
+
+        turn = self._claim(getattr(metrics, "speech_id", None))
+        turn.has_eou = True
+        turn.add("vad.end_of_speech", speech_end, speech_end)
+        turn.add("eou", speech_end, end, end_of_utterance_delay=delay)
+        turn.add("stt.final_transcript", speech_end, speech_end + int(transcription * 1e9),
+                 transcription_delay=transcription)
+
+    def record_stt(self, metrics) -> None:
+        """``stt.on("metrics_collected")`` listener: one ``stt`` span per request."""
+        end = _epoch_ns(getattr(metrics, "timestamp", None))
+        duration = getattr(metrics, "duration", 0) or 0
+        self.turn.add(
+            "stt", end - int(duration * 1e9), end,
+            audio_duration=getattr(metrics, "audio_duration", None),
+            request_id=getattr(metrics, "request_id", None),
+        )
+
+    def record_llm(self, metrics) -> None:
+        """``llm.on("metrics_collected")`` listener: ``llm`` with an ``llm.ttft`` child."""
+        end = _epoch_ns(getattr(metrics, "timestamp", None))
+        start = end - int((getattr(metrics, "duration", 0) or 0) * 1e9)
+        turn = self._claim(getattr(metrics, "speech_id", None))
+        span = turn.add(
+            "llm", start, end,
+            ttft=getattr(metrics, "ttft", None),
+            prompt_tokens=getattr(metrics, "prompt_tokens", None),
+            completion_tokens=getattr(metrics, "completion_tokens", None),
+            tokens_per_second=getattr(metrics, "tokens_per_second", None),
+            cancelled=getattr(metrics, "cancelled", None),
+            request_id=getattr(metrics, "request_id", None),
+        )
+        ttft = getattr(metrics, "ttft", None)
+        if isinstance(ttft, (int, float)) and ttft >= 0:
+            turn.add("llm.ttft", start, start + int(ttft * 1e9), parent=span)
+
+    def record_tts(self, metrics) -> None:
+        """``tts.on("metrics_collected")`` listener: ``tts`` with a ``tts.ttfb`` child."""
+        end = _epoch_ns(getattr(metrics, "timestamp", None))
+        start = end - int((getattr(metrics, "duration", 0) or 0) * 1e9)
+        turn = self._claim(getattr(metrics, "speech_id", None))
+        span = turn.add(
+            "tts", start, end,
+            ttfb=getattr(metrics, "ttfb", None),
+            characters_count=getattr(metrics, "characters_count", None),
+            audio_duration=getattr(metrics, "audio_duration", None),
+            cancelled=getattr(metrics, "cancelled", None),
+            request_id=getattr(metrics, "request_id", None),
+        )
+        ttfb = getattr(metrics, "ttfb", None)
+        if isinstance(ttfb, (int, float)) and ttfb >= 0:
+            turn.add("tts.ttfb", start, start + int(ttfb * 1e9), parent=span)
+
+    def on_agent_state_changed(self, ev) -> None:
+        """``session.on("agent_state_changed")`` listener; ends the turn after the reply."""
+        if ev.new_state == "speaking":
+            self._speaking_since = time.time_ns()
+        elif ev.old_state == "speaking" and self._speaking_since is not None:
+            self.turn.add("agent.speaking", self._speaking_since, time.time_ns())
+            self._speaking_since = None
+            self.finish()
+
+    def finish(self) -> Optional[TurnTrace]:
+        """
+        End the current turn: export it and log its waterfall.
+
+        Returns:
+            The finished turn, or None if nothing was recorded.
+        """
+        turn, self._turn = self._turn, None
+        if turn is None or not turn.spans:
+            return None
+        if self.exporter is not None:
+            self.exporter.export(turn)
+        if self.log_waterfall:
+            logger.info(turn.waterfall())
+        return turn
@@ -0,0 +1,41 @@
+"""Tests for load-aware job admission (backends/admission.py)."""
+
+import time
+
+import pytest
+
+pytest.importorskip("livekit.agents")
+
+from backends.admission import AdmissionController, AdmissionPolicy, LoadBoard
+
+
+def snapshot(pid, sessions=0, inflight=None, llm_p95=None):
+    return {
+        "pid": pid,
+        "time": time.time(),
+        "sessions": sessions,
+        "inflight": {"stt": 0, "llm": 0, "tts": 0, **(inflight or {})},
+        "latency_p95": {"stt": None, "llm": llm_p95, "tts": None},
+    }
+
+
+def test_past_slow_burst_does_not_load_an_idle_worker(tmp_path):
+    board = LoadBoard(str(tmp_path))
+    controller = AdmissionController(board, AdmissionPolicy())
+    # a cold model load 10 s ago, nothing running since
+    board.publish(snapshot(101, llm_p95=8.0))
+
+    assert controller.breakdown().get("llm_latency", 0.0) == 0.0
+    assert controller.load() < controller.policy.threshold
+
+
+def test_slow_backend_loads_a_busy_worker(tmp_path):
+    board = LoadBoard(str(tmp_path))
+    controller = AdmissionController(board, AdmissionPolicy())
+
+    board.publish(snapshot(101, inflight={"llm": 1}, llm_p95=1.5))
+    assert controller.breakdown()["llm_latency"] == 1.0
+
+    # between requests of an active call the term still counts
+    board.publish(snapshot(101, sessions=1, llm_p95=1.5))
+    assert controller.load() == 1.0
@@ -0,0 +1,43 @@
+"""Tests for the micro-batching query embedder (rag/embedder.py)."""
+
+import asyncio
+
+import numpy as np
+
+from rag.embedder import BatchingEmbedder
+
+
+def encode(texts):
+    return np.array([[float(t)] for t in texts], dtype=np.float32)
+
+
+def test_concurrent_queries_are_batched():
+    async def run():
+        embedder = BatchingEmbedder(encode, max_batch=8, max_wait=0.05)
+        results = await asyncio.gather(*(embedder.embed(str(i)) for i in range(20)))
+        await embedder.aclose()
+        return embedder, results
+
+    embedder, results = asyncio.run(run())
+
+    assert [float(r[0, 0]) for r in results] == list(range(20))
+    assert embedder.requests == 20
+    assert embedder.batches == 3
+
+
+def test_timed_out_wait_keeps_the_pending_get():
+    async def run():
+        embedder = BatchingEmbedder(encode)
+        queue = asyncio.Queue()
+        timed_out = await embedder._next(queue, 0.01)
+        future = asyncio.get_running_loop().create_future()
+        queue.put_nowait(("7", future))
+        # the get() left pending by the timeout must deliver it, not drop it
+        request = await embedder._next(queue, 0.01)
+        await embedder.aclose()
+        return timed_out, request, future
+
+    timed_out, request, future = asyncio.run(run())
+
+    assert timed_out is None
+    assert request == ("7", future)
@@ -0,0 +1,70 @@
+"""Tests for incremental hot reload of the docs corpus (rag/hot_reload.py)."""
+
+import numpy as np
+
+from rag.corpus import ingest
+from rag.hot_reload import CorpusReloader
+from rag.indexes import IndexSpec
+from rag.retriever import build_retriever
+from rag.store import EmbeddingStore
+
+DIM = 8
+
+
+def fake_encode(calls):
+    def encode(texts):
+        calls.append(list(texts))
+        return np.stack([np.full(DIM, len(t), dtype=np.float32) for t in texts])
+    return encode
+
+
+def start_reloader(docs, cache, spec, calls):
+    store = EmbeddingStore(str(cache), "test-model")
+    encode = fake_encode(calls)
+    live = build_retriever(ingest(str(docs), 40, 0), encode, DIM, spec, top_k=4, token_budget=200, store=store)
+    swapped = []
+    reloader = CorpusReloader(
+        str(docs), 40, 0, encode, spec, top_k=4, token_budget=200, on_swap=swapped.append, store=store
+    )
+    reloader.start(live)
+    reloader.stop()
+    return reloader, swapped
+
+
+def write_docs(docs):
+    docs.mkdir()
+    (docs / "a.md").write_text("alpha " * 20, encoding="utf-8")
+    (docs / "b.md").write_text("beta " * 20, encoding="utf-8")
+
+
+def test_reloaded_passages_are_cached_for_restart(tmp_path):
+    docs, cache = tmp_path / "docs", tmp_path / "cache"
+    write_docs(docs)
+    calls = []
+    reloader, swapped = start_reloader(docs, cache, IndexSpec(), calls)
+    calls.clear()
+
+    (docs / "b.md").write_text("gamma " * 20, encoding="utf-8")
+    reloader._apply(reloader.scan())
+
+    assert calls == [[p.text for p in swapped[0].passages.values() if p.source == "b.md"]]
+    # a restart finds every passage in the cache
+    calls.clear()
+    build_retriever(ingest(str(docs), 40, 0), fake_encode(calls), DIM, IndexSpec(), 4, 200,
+                    store=EmbeddingStore(str(cache), "test-model"))
+    assert calls == []
+
+
+def test_hnsw_reload_embeds_new_passages_once(tmp_path):
+    docs, cache = tmp_path / "docs", tmp_path / "cache"
+    write_docs(docs)
+    calls = []
+    reloader, swapped = start_reloader(docs, cache, IndexSpec(kind="hnsw"), calls)
+    calls.clear()
+
+    (docs / "c.md").write_text("delta " * 20, encoding="utf-8")
+    reloader._apply(reloader.scan())
+
+    new_texts = [p.text for p in ingest(str(docs), 40, 0) if p.source == "c.md"]
+    assert calls == [new_texts]
+    assert swapped[0].index.ntotal == len(ingest(str(docs), 40, 0))
@@ -0,0 +1,43 @@
+"""Tests for the background RAG loader (rag/loader.py)."""
+
+import threading
+import time
+
+from rag.loader import BackgroundLoad
+
+
+def test_wait_returns_once_loaded():
+    loaded = []
+    loading = BackgroundLoad(lambda: loaded.append(True))
+    loading.start()
+    loading.start()
+
+    assert loading.wait(5.0)
+    assert loading.ready and not loading.failed
+    assert loaded == [True]
+
+
+def test_wait_times_out_while_loading():
+    release = threading.Event()
+    loading = BackgroundLoad(release.wait)
+    loading.start()
+
+    assert not loading.wait(0.05)
+    assert not loading.ready and not loading.failed
+    release.set()
+    assert loading.wait(5.0)
+
+
+def test_failed_load_does_not_block_waiters():
+    def load():
+        raise OSError("model not found")
+
+    loading = BackgroundLoad(load)
+    loading.start()
+    loading.wait(5.0)
+
+    start = time.perf_counter()
+    assert not loading.wait(3.0)
+    assert time.perf_counter() - start < 0.5
+    assert loading.failed
+    assert isinstance(loading.error, OSError)
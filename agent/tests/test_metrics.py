@@ -0,0 +1,98 @@
+"""Tests for merging the metrics of several job processes (telemetry/metrics.py)."""
+
+import json
+import time
+from types import SimpleNamespace
+
+from telemetry.metrics import AgentMetrics, WorkerMetrics, per_process_path
+
+
+def job_process(pid, ttfts, requests_at=None):
+    metrics = AgentMetrics()
+    for ttft in ttfts:
+        metrics.record_llm(SimpleNamespace(ttft=ttft, duration=2 * ttft, prompt_tokens=10, completion_tokens=5))
+    state = metrics.state()
+    state["pid"] = pid
+    if requests_at is not None:
+        state["timestamp"] = requests_at
+    return state
+
+
+def publish(directory, state, started=0):
+    (directory / f"job-{state['pid']}-{started}.json").write_text(json.dumps(state), encoding="utf-8")
+
+
+def test_worker_metrics_sum_job_processes(tmp_path):
+    publish(tmp_path, job_process(101, [0.1, 0.2]))
+    publish(tmp_path, job_process(102, [0.4]))
+
+    snapshot = WorkerMetrics(str(tmp_path)).snapshot()
+
+    assert snapshot["processes"] == 2
+    assert snapshot["counters"]["llm_requests_total"] == 3
+    assert snapshot["counters"]["llm_prompt_tokens_total"] == 30
+    ttft = snapshot["series"]["llm_ttft_seconds"]
+    assert ttft["count"] == 3
+    assert abs(ttft["sum"] - 0.7) < 1e-9
+    assert ttft["p50"] == 0.2
+
+
+def test_exited_process_counts_but_adds_no_recent_samples(tmp_path):
+    publish(tmp_path, job_process(101, [0.1]))
+    publish(tmp_path, job_process(102, [5.0], requests_at=time.time() - 3600))
+
+    worker = WorkerMetrics(str(tmp_path), recent_max_age=60.0)
+    snapshot = worker.snapshot()
+
+    assert snapshot["counters"]["llm_requests_total"] == 2
+    assert snapshot["series"]["llm_ttft_seconds"]["p99"] == 0.1
+    assert "worker_job_processes 1" in worker.render_prometheus()
+    assert 'llm_ttft_seconds_bucket{le="+Inf"} 2' in worker.render_prometheus()
+
+
+def test_exited_process_is_folded_and_its_pid_reused(tmp_path):
+    worker = WorkerMetrics(str(tmp_path), recent_max_age=60.0)
+    publish(tmp_path, job_process(101, [0.1, 0.2], requests_at=time.time() - 120), started=1)
+    publish(tmp_path, job_process(102, [0.3]))
+
+    assert worker.snapshot()["counters"]["llm_requests_total"] == 3
+    # the exited process's file is gone, its counts live on in exited.json
+    assert sorted(p.name for p in tmp_path.glob("*.json")) == ["exited.json", "job-102-0.json"]
+
+    # a new process gets pid 101 again
+    publish(tmp_path, job_process(101, [0.4]), started=2)
+    snapshot = worker.snapshot()
+
+    assert snapshot["processes"] == 2
+    assert snapshot["counters"]["llm_requests_total"] == 4
+    assert snapshot["series"]["llm_ttft_seconds"]["count"] == 4
+    assert abs(snapshot["series"]["llm_ttft_seconds"]["sum"] - 1.0) < 1e-9
+    # folded only once, however often the worker is scraped
+    assert worker.snapshot()["counters"]["llm_requests_total"] == 4
+
+
+def test_reset_clears_previous_run(tmp_path):
+    publish(tmp_path, job_process(101, [0.1]))
+    worker = WorkerMetrics(str(tmp_path))
+
+    worker.reset()
+
+    assert worker.snapshot()["counters"]["llm_requests_total"] == 0
+
+
+def test_publisher_writes_state_at_once(tmp_path):
+    metrics = AgentMetrics()
+    metrics.inc("barge_in_total")
+
+    metrics.start_publisher(str(tmp_path), interval=60.0)
+
+    deadline = time.monotonic() + 5.0
+    while not list(tmp_path.glob("*.json")) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert WorkerMetrics(str(tmp_path)).snapshot()["counters"]["barge_in_total"] == 1
+
+
+def test_per_process_path_adds_pid():
+    assert per_process_path("/tmp/metrics.json") == "/tmp/metrics-{pid}.json"
+    assert per_process_path("/tmp/metrics-{pid}.json") == "/tmp/metrics-{pid}.json"
+    assert per_process_path("") == ""
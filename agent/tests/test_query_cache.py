@@ -0,0 +1,33 @@
+"""Tests for the two-level RAG query cache (rag/query_cache.py)."""
+
+import numpy as np
+
+from rag.query_cache import QueryCache
+
+
+def embedding(*values):
+    return np.asarray(values, dtype=np.float32)
+
+
+def test_semantic_hit_for_rephrased_query():
+    cache = QueryCache(dim=3, min_similarity=0.9)
+    cache.put("what can you do", embedding(1.0, 0.0, 0.0), "capabilities")
+
+    assert cache.get("what are you able to do", embedding(0.99, 0.05, 0.0)) == "capabilities"
+    assert cache.semantic_hits == 1
+
+
+def test_semantic_level_does_not_mix_up_identifiers():
+    cache = QueryCache(dim=3, min_similarity=0.9)
+    cache.put("error 502", embedding(1.0, 0.0, 0.0), "bad gateway")
+    cache.put("how do I install v1.2", embedding(0.0, 1.0, 0.0), "install 1.2")
+
+    # same embedding, different number or version: must search again
+    assert cache.get("error 504", embedding(1.0, 0.0, 0.0)) is None
+    assert cache.get("how do I install v1.3", embedding(0.0, 1.0, 0.0)) is None
+    assert cache.get("error", embedding(1.0, 0.0, 0.0)) is None
+    assert cache.semantic_hits == 0
+
+    # same identifiers, rephrased: still a semantic hit
+    assert cache.get("what does error 502 mean", embedding(0.98, 0.1, 0.0)) == "bad gateway"
+    assert cache.semantic_hits == 1
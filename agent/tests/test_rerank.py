@@ -0,0 +1,68 @@
+"""Tests for budgeted cross-encoder reranking (rag/rerank.py)."""
+
+import asyncio
+import threading
+import time
+
+import numpy as np
+
+from rag.rerank import Reranker
+
+HITS = [(0, 0.9), (1, 0.8), (2, 0.7), (3, 0.6)]
+
+
+def text_of(pid):
+    return f"passage {pid}"
+
+
+def test_concurrent_lookups_fall_back_instead_of_queueing():
+    calls = []
+    released = threading.Event()
+
+    def slow_score(query, texts):
+        calls.append(query)
+        released.wait(5.0)
+        return np.arange(len(texts), dtype=np.float32)
+
+    reranker = Reranker(slow_score, keep=2, budget=0.05, cache_size=0)
+    # the thread has not picked up the first run yet when the others arrive
+    reranker._executor.submit(released.wait, 5.0)
+
+    async def lookups():
+        return await asyncio.gather(*(reranker.rerank(f"query {i}", HITS, text_of) for i in range(4)))
+
+    results = asyncio.run(lookups())
+
+    assert sorted(status for _, status in results) == ["busy", "busy", "busy", "timeout"]
+    assert all(hits == HITS[:2] for hits, _ in results)
+    released.set()
+    reranker._executor.shutdown(wait=True)
+    # the timed-out run was still queued and got cancelled: no backlog for the model
+    assert calls == []
+    assert not reranker._busy.is_set()
+
+
+def test_busy_until_abandoned_run_finishes():
+    released = threading.Event()
+
+    def slow_score(query, texts):
+        released.wait(5.0)
+        return np.arange(len(texts), dtype=np.float32)
+
+    reranker = Reranker(slow_score, keep=2, budget=0.05, cache_size=0)
+
+    async def lookups():
+        first = await reranker.rerank("a", HITS, text_of)
+        second = await reranker.rerank("b", HITS, text_of)
+        released.set()
+        deadline = time.monotonic() + 5.0
+        while reranker._busy.is_set() and time.monotonic() < deadline:
+            await asyncio.sleep(0.01)
+        third = await reranker.rerank("c", HITS, text_of)
+        return first, second, third
+
+    first, second, third = asyncio.run(lookups())
+
+    assert (first[1], second[1], third[1]) == ("timeout", "busy", "reranked")
+    # highest score first: the last candidate
+    assert [pid for pid, _ in third[0]] == [3, 2]
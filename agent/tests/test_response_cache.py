@@ -0,0 +1,45 @@
+"""Tests for the disk-backed reply and audio caches (pipeline/response_cache.py)."""
+
+import asyncio
+import logging
+import threading
+
+import pytest
+
+pytest.importorskip("livekit.agents")
+
+from pipeline.response_cache import DiskLRU, ReplyCache, write_in_background
+
+
+def test_concurrent_puts_keep_the_size_count(tmp_path):
+    store = DiskLRU(str(tmp_path), max_bytes=20_000, suffix=".bin")
+
+    def writer(n):
+        for i in range(200):
+            store.put(f"{n}-{i}", bytes(100 + (i % 7) * 50))
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    on_disk = sum(p.stat().st_size for p in tmp_path.glob("*.bin"))
+    assert store._bytes == on_disk
+    assert on_disk <= store.max_bytes
+    assert not list(tmp_path.glob(".tmp-*"))
+
+
+def test_failed_background_write_is_logged(tmp_path, caplog):
+    # the cache directory cannot be created: a file is in the way
+    (tmp_path / "llm").write_text("not a directory")
+    cache = ReplyCache(str(tmp_path / "llm"), 1 << 20, "gemma3:4b")
+
+    async def write():
+        await asyncio.wait({write_in_background(cache.put, cache.key([("user", "hi")]), "Hello!")})
+
+    with caplog.at_level(logging.WARNING, logger="local-agent"):
+        asyncio.run(write())
+
+    assert "Response cache write failed" in caplog.text
+    assert cache.get(cache.key([("user", "hi")])) is None
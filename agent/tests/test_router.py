@@ -0,0 +1,54 @@
+"""Tests for LLM routing across job processes (backends/router.py)."""
+
+import os
+import time
+
+import pytest
+
+pytest.importorskip("livekit.agents")
+
+from backends.admission import LoadBoard
+from backends.router import LLMBackendPool
+
+URLS = ["http://gpu-1/v1", "http://gpu-2/v1"]
+
+
+def other_process(board, inflight, ttft):
+    board.publish({
+        "pid": os.getpid() + 1,
+        "time": time.time(),
+        "backends": {url: {"inflight": n, "ttft_ewma": t} for url, n, t in zip(URLS, inflight, ttft)},
+    })
+
+
+def test_new_pool_sees_load_of_other_processes(tmp_path):
+    board = LoadBoard(str(tmp_path))
+    other_process(board, inflight=[3, 0], ttft=[None, None])
+
+    pool = LLMBackendPool(URLS, board=board)
+
+    assert [b.url for b in pool.ranked()] == ["http://gpu-2/v1", "http://gpu-1/v1"]
+
+
+def test_unmeasured_pool_uses_ttft_of_other_processes(tmp_path):
+    board = LoadBoard(str(tmp_path))
+    other_process(board, inflight=[0, 0], ttft=[2.0, 0.5])
+
+    pool = LLMBackendPool(URLS, board=board)
+
+    assert pool.ranked()[0].url == "http://gpu-2/v1"
+
+
+def test_requests_are_published(tmp_path):
+    board = LoadBoard(str(tmp_path))
+    pool = LLMBackendPool(URLS, board=board)
+    newcomer = LLMBackendPool(URLS, board=board)
+
+    pool.acquire(pool.backends[0])
+    [snapshot] = board.read(max_age=5.0)
+    assert snapshot["backends"]["http://gpu-1/v1"]["inflight"] == 1
+
+    pool.release(pool.backends[0])
+    assert board.read(max_age=5.0)[0]["backends"]["http://gpu-1/v1"]["inflight"] == 0
+    # its own snapshot does not count as another process
+    assert newcomer.remote_load() == {}
@@ -0,0 +1,120 @@
+"""Tests for the corpus shared between job processes (rag/shared.py)."""
+
+import random
+import subprocess
+import sys
+from pathlib import Path
+
+import faiss
+import numpy as np
+import pytest
+
+from rag.corpus import Passage
+from rag.lexical import BM25Index
+from rag.shared import attach, attach_lexical, publish
+
+AGENT_DIR = Path(__file__).resolve().parent.parent
+
+# attaches in a fresh process and prints how much private memory that cost
+ATTACH_SCRIPT = """
+import sys
+import numpy as np
+from rag.shared import attach
+
+def rss_anon():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("RssAnon:"):
+                return int(line.split()[1]) * 1024
+
+before = rss_anon()
+passages, index, _ = attach(sys.argv[1])
+index.search(np.zeros((1, index.d), dtype=np.float32), 5)
+print(rss_anon() - before, index.ntotal)
+"""
+
+ATTACH_LEXICAL_SCRIPT = """
+import sys
+from rag.shared import attach_lexical, current_generation
+
+def rss_anon():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("RssAnon:"):
+                return int(line.split()[1]) * 1024
+
+before = rss_anon()
+lexical = attach_lexical(sys.argv[1], current_generation(sys.argv[1]))
+hits = lexical.search("w1 w2 e-10", 5)
+print(rss_anon() - before, len(hits))
+"""
+
+
+def publish_flat(shared_dir, n, dim):
+    index = faiss.IndexIDMap2(faiss.IndexFlatL2(dim))
+    index.add_with_ids(np.random.rand(n, dim).astype(np.float32), np.arange(n, dtype=np.int64))
+    passages = [Passage("doc.md", i, i + 1, f"passage {i}") for i in range(n)]
+    publish(str(shared_dir), passages, index)
+
+
+def test_attach_returns_published_corpus(tmp_path):
+    publish_flat(tmp_path, 50, 8)
+
+    passages, index, _ = attach(str(tmp_path))
+
+    assert index.ntotal == 50
+    assert passages[7].text == "passage 7"
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="reads RssAnon from /proc")
+def test_attach_maps_flat_index_instead_of_copying(tmp_path):
+    n, dim = 50_000, 384
+    publish_flat(tmp_path, n, dim)
+    index_bytes = n * dim * 4
+
+    for _ in range(2):
+        out = subprocess.run(
+            [sys.executable, "-c", ATTACH_SCRIPT, str(tmp_path)],
+            cwd=AGENT_DIR, capture_output=True, text=True, check=True,
+        ).stdout.split()
+        private_bytes, ntotal = int(out[0]), int(out[1])
+
+        assert ntotal == n
+        # a heap copy would add the full 73 MB of vectors to every process
+        assert private_bytes < index_bytes // 4
+
+
+def publish_words(shared_dir, n, words_per_passage):
+    rng = random.Random(0)
+    vocab = [f"w{i}" for i in range(5000)] + [f"e-{i}" for i in range(1000)]
+    passages = [Passage("doc.md", i, i + 1, " ".join(rng.choices(vocab, k=words_per_passage))) for i in range(n)]
+    index = faiss.IndexIDMap2(faiss.IndexFlatL2(4))
+    index.add_with_ids(np.zeros((n, 4), dtype=np.float32), np.arange(n, dtype=np.int64))
+    return passages, publish(str(shared_dir), passages, index, lexical=True)
+
+
+def test_attached_bm25_matches_built_one(tmp_path):
+    passages, generation = publish_words(tmp_path, 300, 20)
+
+    mapped = attach_lexical(str(tmp_path), generation.name)
+    built = BM25Index(enumerate(p.text for p in passages))
+
+    for query in ["w1 w2", "e-10 w7", "E 999", "nothing here"]:
+        assert mapped.search(query, 5) == built.search(query, 5)
+    top = built.search("e-10 w7", 1)[0][0]
+    assert mapped.terms_of(top, ["e-10", "w7", "zzz"]) == built.terms_of(top, ["e-10", "w7", "zzz"])
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="reads RssAnon from /proc")
+def test_attach_maps_bm25_instead_of_building_it(tmp_path):
+    _, generation = publish_words(tmp_path, 20_000, 60)
+    bm25_bytes = sum(f.stat().st_size for f in (generation / "bm25").iterdir())
+
+    out = subprocess.run(
+        [sys.executable, "-c", ATTACH_LEXICAL_SCRIPT, str(tmp_path)],
+        cwd=AGENT_DIR, capture_output=True, text=True, check=True,
+    ).stdout.split()
+
+    assert int(out[1]) > 0
+    # building it in the process would add several times the file size
+    assert int(out[0]) < bm25_bytes // 2
@@ -0,0 +1,57 @@
+"""Tests for the persistent embedding cache and index snapshot (rag/store.py)."""
+
+import faiss
+import numpy as np
+
+from rag.models import embedding_cache_key
+from rag.store import EmbeddingStore, read_index_mapped
+
+DIM = 8
+
+
+def fake_encode(calls):
+    def encode(texts):
+        calls.append(list(texts))
+        return np.stack([np.full(DIM, len(t), dtype=np.float32) for t in texts])
+    return encode
+
+
+def test_flat_snapshot_is_memory_mapped(tmp_path):
+    index = faiss.IndexIDMap2(faiss.IndexFlatL2(DIM))
+    index.add_with_ids(np.random.rand(100, DIM).astype(np.float32), np.arange(100, dtype=np.int64))
+    path = str(tmp_path / "index.faiss")
+    faiss.write_index(index, path)
+
+    mapped_index, mapped = read_index_mapped(path)
+
+    assert mapped
+    assert mapped_index.ntotal == 100
+    query = np.random.rand(1, DIM).astype(np.float32)
+    assert (mapped_index.search(query, 3)[1] == index.search(query, 3)[1]).all()
+
+
+def test_restart_reuses_embeddings_and_snapshot(tmp_path):
+    texts = ["a", "bb", "ccc"]
+    calls = []
+    store = EmbeddingStore(str(tmp_path), "test-model")
+    _, index = store.load_or_build(texts, fake_encode(calls), DIM)
+
+    _, reloaded = EmbeddingStore(str(tmp_path), "test-model").load_or_build(texts, fake_encode(calls), DIM)
+
+    assert calls == [texts]
+    assert reloaded.ntotal == index.ntotal == 3
+
+
+def test_backends_do_not_share_cached_embeddings(tmp_path):
+    texts = ["a", "bb"]
+    calls = []
+    fp32 = embedding_cache_key("sentence-transformers", "all-MiniLM-L6-v2")
+    int8 = embedding_cache_key("onnx", "all-MiniLM-L6-v2", "onnx/model_quint8_avx2.onnx")
+    EmbeddingStore(str(tmp_path), fp32).load_or_build(texts, fake_encode(calls), DIM)
+
+    EmbeddingStore(str(tmp_path), int8).load_or_build(texts, fake_encode(calls), DIM)
+    EmbeddingStore(str(tmp_path), fp32).load_or_build(texts, fake_encode(calls), DIM)
+
+    # the onnx store embedded the texts itself; each store then reuses its own
+    assert calls == [texts, texts]
+    assert embedding_cache_key("onnx", "all-MiniLM-L6-v2", "onnx/model.onnx") != int8
@@ -0,0 +1,66 @@
+"""End-to-end test of the offline turn replay benchmark (benchmarks/turn_replay.py)."""
+
+import asyncio
+import os
+import sys
+
+import numpy as np
+import pytest
+
+pytest.importorskip("livekit.agents")
+
+from benchmarks.fake_services import PROFILES, FakeServices
+from benchmarks.turn_replay import configure_environment, load_agent, load_turns, run_level
+
+
+class HashEmbedder:
+    """Deterministic stand-in for the sentence-transformers model."""
+
+    dim = 32
+
+    def encode(self, texts):
+        rows = [np.random.default_rng(abs(hash(t)) % 2**32).random(self.dim) for t in texts]
+        return np.asarray(rows, dtype=np.float32).reshape(len(texts), self.dim)
+
+
+@pytest.fixture
+def services(tmp_path):
+    services = FakeServices(PROFILES["instant"])
+    services.start()
+    environ, path = dict(os.environ), list(sys.path)
+    configure_environment(services)
+    os.environ.update({
+        "RAG_CACHE_DIR": str(tmp_path / "rag-cache"),
+        "LLM_REPLY_CACHE_DIR": str(tmp_path / "llm-cache"),
+        "METRICS_EXPORT_PATH": "",
+    })
+    yield services
+    services.stop()
+    os.environ.clear()
+    os.environ.update(environ)
+    sys.path[:] = path
+    sys.modules.pop("myagent", None)
+
+
+def test_replay_turn_runs_outside_a_session(services, monkeypatch):
+    turns = load_turns(None)[:1]
+    services.register(turns[0]["pcm"], turns[0]["transcript"])
+    import myagent
+
+    monkeypatch.setattr(myagent, "load_embed_model", HashEmbedder)
+    load_agent()
+
+    async def replay():
+        try:
+            return await run_level(myagent.LocalAgent, turns, 1, 1)
+        finally:
+            await myagent.clients.aclose()
+
+    level = asyncio.run(replay())
+
+    assert level["errors"] == 0
+    assert level["turns"] == 1
+    # the turn searched the corpus instead of timing out on the loader
+    assert myagent.query_cache.misses == 1
+    for metric in ("turn_s", "ttfa_s", "stt_s", "rag_s", "llm_ttft_s"):
+        assert level[metric] is not None, metric
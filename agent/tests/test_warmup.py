@@ -0,0 +1,45 @@
+"""Tests for the backend model warm-up (backends/warmup.py)."""
+
+import socket
+import threading
+
+import pytest
+
+pytest.importorskip("livekit.agents")
+
+from backends.warmup import pin_ollama_model, warm_backends
+
+
+@pytest.fixture
+def garbage_server():
+    """A TCP port that answers every request with a line that is not HTTP."""
+    server = socket.socket()
+    server.bind(("127.0.0.1", 0))
+    server.listen()
+
+    def serve():
+        while True:
+            try:
+                conn, _ = server.accept()
+            except OSError:
+                return
+            with conn:
+                conn.recv(65536)
+                conn.sendall(b"garbage\r\n\r\n")
+
+    threading.Thread(target=serve, daemon=True).start()
+    yield f"http://127.0.0.1:{server.getsockname()[1]}/v1"
+    server.close()
+
+
+def test_warm_up_reports_non_http_backend_without_raising(garbage_server):
+    results = warm_backends(
+        (garbage_server, "whisper"), [(garbage_server, "gemma3:4b")], (garbage_server, "kokoro", "af_heart"),
+        timeout=5.0,
+    )
+
+    assert [r.service for r in results] == ["stt", "llm", "tts"]
+    for r in results:
+        assert r.cold is None
+        assert "BadStatusLine" in r.error
+    assert pin_ollama_model(garbage_server, "gemma3:4b", -1, 5.0) is False
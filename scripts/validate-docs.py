@@ -5,30 +5,231 @@ Documentation validation script for Local Voice AI project.
 This script validates the documentation system by:
 1. Checking all cross-references are valid
 2. Ensuring all required files exist
-3. Validating markdown links
+3. Validating markdown links and their anchors
 4. Checking docstring standards compliance
 5. Validating documentation timestamps against source code
 
+Every markdown, Python and TypeScript file is read and parsed once into a
+shared index of links, anchors and undocumented functions; the checks run
+against that index. Files are parsed in a process pool, and the parse
+results are cached per file in .cache/validate-docs.json, keyed by
+modification time and content hash, so a run after a small change only
+re-parses the changed files. The time of every check is reported at the end.
+
 Usage Examples:
   python scripts/validate-docs.py                          # Basic validation
   python scripts/validate-docs.py --check-timestamps       # With timestamp checking
   python scripts/validate-docs.py --check-timestamps --strict  # Strict timestamp checking
   python scripts/validate-docs.py --update-timestamps --check-timestamps  # Update timestamps
+  python scripts/validate-docs.py --jobs 1 --no-cache      # Serial run without the cache
 """
 
+import hashlib
+import json
 import os
 import re
 import sys
 import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from typing import List, Dict, Set, Tuple, Optional
 import argparse
 
+# Markdown link: [text](target)
+LINK_RE = re.compile(r'\[([^\]]+)\]\(([^)]+)\)')
+HEADING_RE = re.compile(r'^(#{1,6})\s+(.*?)\s*#*\s*$')
+
+# Annotated Python function, with the docstring that may follow it
+PY_DEF_RE = re.compile(r'def\s+(\w+)\s*\([^)]*\)\s*->[^:]*:(\s*""")?')
+
+# TypeScript function declarations and JSDoc comments that end right before one
+TS_FUNC_RE = re.compile(r'(?:function\s+(\w+)|const\s+(\w+)\s*=\s*(?:\([^)]*\)\s*=>|async\s*\([^)]*\)\s*=>))')
+TS_JSDOC_END_RE = re.compile(r'\*/\s*(?:function\s+(\w+)|const\s+(\w+)\s*=)')
+
+# Directories never scanned for source files
+SKIPPED_PATHS = ("node_modules", ".git")
+
+# Below this many files to parse, a process pool costs more than it saves
+PARALLEL_MIN_FILES = 16
+
+DEFAULT_CACHE_FILE = Path(".cache") / "validate-docs.json"
+
+
+def slugify(heading: str) -> str:
+    """Return the GitHub anchor of a markdown heading."""
+    slug = heading.strip().lower()
+    slug = re.sub(r'[^\w\- ]', '', slug)
+    return slug.replace(' ', '-')
+
+
+def parse_markdown(content: str) -> Dict:
+    """Index the links, heading anchors and line-level issues of a markdown file."""
+    anchors = []
+    seen: Dict[str, int] = {}
+    issues = []
+    fenced = set()
+    in_fence = False
+    for i, line in enumerate(content.split("\n"), 1):
+        # Check for empty link text
+        if "[](" in line:
+            issues.append([i, "empty", line.strip()])
+        # Check for malformed links
+        if "[" in line and "](" in line and not LINK_RE.search(line):
+            issues.append([i, "malformed", line.strip()])
+
+        if line.lstrip().startswith("```"):
+            in_fence = not in_fence
+            continue
+        if in_fence:
+            fenced.add(i)
+            continue
+        heading = HEADING_RE.match(line)
+        if heading:
+            slug = slugify(heading.group(2))
+            count = seen.get(slug, 0)
+            seen[slug] = count + 1
+            anchors.append(slug if count == 0 else f"{slug}-{count}")
+
+    # [line, text, target, inside a code block]
+    links = []
+    for match in LINK_RE.finditer(content):
+        line = content.count("\n", 0, match.start()) + 1
+        links.append([line, match.group(1), match.group(2), line in fenced])
+
+    return {"links": links, "anchors": anchors, "issues": issues}
+
+
+def parse_python(content: str) -> Dict:
+    """Find annotated functions whose definitions all lack a docstring."""
+    functions = []
+    documented = set()
+    for match in PY_DEF_RE.finditer(content):
+        functions.append(match.group(1))
+        if match.group(2):
+            documented.add(match.group(1))
+    return {"undocumented": [name for name in functions if name not in documented]}
+
+
+def parse_typescript(content: str) -> Dict:
+    """Find exported-style functions without a JSDoc comment right before them."""
+    first_jsdoc = content.find("/**")
+    documented = []
+    if first_jsdoc >= 0:
+        for match in TS_JSDOC_END_RE.finditer(content, first_jsdoc + 3):
+            documented.append((match.group(1), match.group(2)))
+
+    def has_jsdoc(name: str) -> bool:
+        """True if a JSDoc comment precedes a declaration of ``name``."""
+        # "function foo" also documents foo's prefixes, as the old per-function regex did
+        return any(
+            (function is not None and function.startswith(name)) or const == name
+            for function, const in documented
+        )
+
+    undocumented = []
+    for function, const in TS_FUNC_RE.findall(content):
+        name = function or const
+        if name and not name.startswith("_") and not has_jsdoc(name):
+            undocumented.append(name)
+    return {"undocumented": undocumented}
+
+
+PARSERS = {".md": parse_markdown, ".py": parse_python, ".ts": parse_typescript, ".tsx": parse_typescript}
+
+
+def parse_file(path: str) -> Tuple[str, str, Dict]:
+    """
+    Read and parse one file; runs in the worker processes.
+
+    Returns:
+        ``(path, sha1 of the content, parse result)``; the result holds an
+        ``error`` message instead if the file could not be read.
+    """
+    try:
+        data = Path(path).read_bytes()
+        content = data.decode("utf-8")
+    except Exception as e:
+        return path, "", {"error": str(e)}
+    return path, hashlib.sha1(data).hexdigest(), PARSERS[Path(path).suffix](content)
+
+
+def parser_version() -> str:
+    """Hash of this script, so changed parsing rules invalidate the cache."""
+    return hashlib.sha1(Path(__file__).read_bytes()).hexdigest()
+
+
+class ResultCache:
+    """Per-file parse results, keyed by modification time, size and content hash."""
+
+    def __init__(self, path: Optional[Path]):
+        self.path = path
+        self.version = parser_version()
+        self.entries: Dict[str, Dict] = {}
+        self.hits = 0
+        self.misses = 0
+        if path is None or not path.exists():
+            return
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return
+        if data.get("version") == self.version:
+            self.entries = data.get("files", {})
+
+    def lookup(self, path: str, stat: os.stat_result) -> Optional[Dict]:
+        """Return the cached result of an unchanged file, or None."""
+        entry = self.entries.get(path)
+        if entry is None:
+            return None
+        if entry["mtime_ns"] != stat.st_mtime_ns or entry["size"] != stat.st_size:
+            # touched or checked out again: still valid if the content is the same
+            try:
+                digest = hashlib.sha1(Path(path).read_bytes()).hexdigest()
+            except OSError:
+                return None
+            if digest != entry["sha1"]:
+                return None
+            entry["mtime_ns"], entry["size"] = stat.st_mtime_ns, stat.st_size
+        return entry["result"]
+
+    def store(self, path: str, stat: os.stat_result, sha1: str, result: Dict) -> None:
+        """Remember the result of a freshly parsed file."""
+        if sha1:
+            self.entries[path] = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "sha1": sha1, "result": result}
+
+    def save(self, paths: Set[str]) -> None:
+        """Write the entries of ``paths`` back; entries of deleted files are dropped."""
+        if self.path is None:
+            return
+        files = {p: e for p, e in self.entries.items() if p in paths}
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(".tmp")
+            tmp.write_text(json.dumps({"version": self.version, "files": files}), encoding="utf-8")
+            os.replace(tmp, self.path)
+        except OSError as e:
+            print(f"⚠️  Could not write cache {self.path}: {e}")
+
+
+def find_source_files(root: Path, suffixes: Tuple[str, ...]) -> List[Path]:
+    """Find source files below ``root``, skipping dependency and VCS directories."""
+    found = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if not any(s in d for s in SKIPPED_PATHS))
+        for name in sorted(filenames):
+            if name.endswith(suffixes):
+                path = Path(dirpath, name)
+                if not any(s in str(path) for s in SKIPPED_PATHS):
+                    found.append(path)
+    return found
+
+
 class DocumentationValidator:
     """Validates documentation structure and cross-references."""
-    
+
     def __init__(self, docs_dir: str = "docs", check_timestamps: bool = False,
-                 strict_timestamps: bool = False, update_timestamps: bool = False):
+                 strict_timestamps: bool = False, update_timestamps: bool = False,
+                 jobs: Optional[int] = None, cache_file: Optional[Path] = DEFAULT_CACHE_FILE):
         self.docs_dir = Path(docs_dir)
         self.errors: List[str] = []
         self.warnings: List[str] = []
@@ -36,6 +237,15 @@ class DocumentationValidator:
         self.check_timestamps = check_timestamps
         self.strict_timestamps = strict_timestamps
         self.update_timestamps = update_timestamps
+        self.jobs = jobs or os.cpu_count() or 1
+        self.cache = ResultCache(cache_file)
+        # parse results by file path, filled by build_index()
+        self.index: Dict[str, Dict] = {}
+        self.md_files: List[Path] = []
+        self.source_files: List[Path] = []
+        # seconds per check, in the order they ran
+        self.timings: Dict[str, float] = {}
+        self.workers = 0
         self.required_files = [
             "index.md",
             "architecture.md",
@@ -51,27 +261,59 @@ class DocumentationValidator:
             "services/livekit.md",
             "services/frontend.md",
         ]
-        
+
         # Mapping of source files to their documentation files
         self.source_to_doc_mapping = {
             # Agent service
             "agent/myagent.py": "services/agent.md",
+            "agent/config.py": "services/agent.md",
+            "agent/rag/store.py": "services/agent.md",
+            "agent/rag/corpus.py": "services/agent.md",
+            "agent/rag/retriever.py": "services/agent.md",
+            "agent/rag/indexes.py": "services/agent.md",
+            "agent/rag/prefetch.py": "services/agent.md",
+            "agent/rag/query_cache.py": "services/agent.md",
+            "agent/rag/embedder.py": "services/agent.md",
+            "agent/rag/models.py": "services/agent.md",
+            "agent/rag/shared.py": "services/agent.md",
+            "agent/rag/hot_reload.py": "services/agent.md",
+            "agent/rag/lexical.py": "services/agent.md",
+            "agent/rag/rerank.py": "services/agent.md",
+            "agent/rag/loader.py": "services/agent.md",
+            "agent/pipeline/segmenter.py": "services/agent.md",
+            "agent/pipeline/tts_stream.py": "services/agent.md",
+            "agent/pipeline/response_cache.py": "services/agent.md",
+            "agent/pipeline/context_window.py": "services/agent.md",
+            "agent/pipeline/barge_in.py": "services/agent.md",
+            "agent/pipeline/endpointing.py": "services/agent.md",
+            "agent/telemetry/metrics.py": "services/agent.md",
+            "agent/backends/clients.py": "services/agent.md",
+            "agent/backends/admission.py": "services/agent.md",
+            "agent/backends/router.py": "services/agent.md",
+            "agent/backends/warmup.py": "services/agent.md",
+            "agent/telemetry/tracing.py": "services/agent.md",
+            "agent/benchmarks/embedding_backends.py": "services/agent.md",
+            "agent/benchmarks/ann_report.py": "services/agent.md",
+            "agent/benchmarks/hybrid_report.py": "services/agent.md",
+            "agent/benchmarks/fake_services.py": "services/agent.md",
+            "agent/benchmarks/turn_replay.py": "services/agent.md",
+            "agent/benchmarks/startup_report.py": "services/agent.md",
             "agent/Dockerfile": "services/agent.md",
             "agent/requirements.txt": "services/agent.md",
-            
+
             # Whisper service
             "whisper/Dockerfile": "services/whisper.md",
-            
+
             # Ollama service
             "ollama/Dockerfile": "services/ollama.md",
             "ollama/entrypoint.sh": "services/ollama.md",
-            
+
             # Kokoro service
             "livekit/Dockerfile": "services/kokoro.md",
-            
+
             # Livekit service
             "livekit/Dockerfile": "services/livekit.md",
-            
+
             # Frontend service (multiple files map to one doc)
             "voice-assistant-frontend/package.json": "services/frontend.md",
             "voice-assistant-frontend/Dockerfile": "services/frontend.md",
@@ -79,280 +321,302 @@ class DocumentationValidator:
             "voice-assistant-frontend/app/page.tsx": "services/frontend.md",
             "voice-assistant-frontend/next.config.mjs": "services/frontend.md",
             "voice-assistant-frontend/tsconfig.json": "services/frontend.md",
-            
+
             # Architecture
             "docker-compose.yml": "architecture.md",
             "README.md": "index.md",
         }
-    
+
+    def timed(self, name: str, check, *args) -> None:
+        """Run one check and record its duration."""
+        start = time.perf_counter()
+        check(*args)
+        self.timings[name] = time.perf_counter() - start
+
     def validate_all(self) -> bool:
         """Run all validation checks."""
         print("🔍 Validating Local Voice AI documentation...")
         print("=" * 50)
-        
+
+        # Read and parse every file once
+        self.timed("index", self.build_index)
+
         # Check required files exist
-        self.check_required_files()
-        
+        self.timed("required files", self.check_required_files)
+
         # Validate cross-references
-        self.validate_cross_references()
-        
+        self.timed("cross-references", self.validate_cross_references)
+
         # Check markdown links
-        self.validate_markdown_links()
-        
+        self.timed("markdown links", self.validate_markdown_links)
+
         # Validate docstring standards
-        self.validate_docstring_standards()
-        
+        self.timed("docstrings", self.validate_docstring_standards)
+
         # Validate timestamps if requested
         if self.check_timestamps:
-            self.validate_timestamps()
-        
+            self.timed("timestamps", self.validate_timestamps)
+
         # Print results
         self.print_results()
-        
+        self.print_timings()
+
         return len(self.errors) == 0
-    
+
+    def build_index(self):
+        """Parse all documentation and source files, reusing cached results of unchanged files."""
+        self.md_files = sorted(self.docs_dir.rglob("*.md"))
+        self.source_files = find_source_files(Path("."), (".py", ".ts", ".tsx"))
+
+        stats = {}
+        pending = []
+        for path in [*self.md_files, *self.source_files]:
+            key = str(path)
+            try:
+                stats[key] = path.stat()
+            except OSError as e:
+                self.index[key] = {"error": str(e)}
+                continue
+            cached = self.cache.lookup(key, stats[key])
+            if cached is not None:
+                self.index[key] = cached
+                self.cache.hits += 1
+            else:
+                pending.append(key)
+        self.cache.misses = len(pending)
+
+        if len(pending) >= PARALLEL_MIN_FILES and self.jobs > 1:
+            self.workers = min(self.jobs, len(pending))
+            chunksize = max(1, len(pending) // (self.workers * 4))
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                parsed = list(pool.map(parse_file, pending, chunksize=chunksize))
+        else:
+            parsed = [parse_file(path) for path in pending]
+
+        for key, sha1, result in parsed:
+            self.index[key] = result
+            self.cache.store(key, stats[key], sha1, result)
+        self.cache.save(set(stats))
+
     def check_required_files(self):
         """Check that all required documentation files exist."""
         print("\n📁 Checking required files...")
-        
+
         all_required = self.required_files + self.required_service_files
-        
+
         for file_path in all_required:
             full_path = self.docs_dir / file_path
             if not full_path.exists():
                 self.errors.append(f"Missing required file: {file_path}")
             else:
                 print(f"  ✅ {file_path}")
-    
+
     def validate_cross_references(self):
         """Validate all cross-references in documentation."""
         print("\n🔗 Validating cross-references...")
-        
-        # Find all markdown files
-        md_files = list(self.docs_dir.rglob("*.md"))
-        
+
         # Build list of all valid targets
         valid_targets = set()
-        for md_file in md_files:
+        for md_file in self.md_files:
             # Add relative paths from docs directory
             rel_path = md_file.relative_to(self.docs_dir)
             valid_targets.add(str(rel_path))
             valid_targets.add(str(rel_path.with_suffix("")))
             valid_targets.add(str(rel_path.name))
             valid_targets.add(str(rel_path.with_suffix("").name))
-        
+
         # Check each file for references
-        for md_file in md_files:
+        for md_file in self.md_files:
             self.check_file_references(md_file, valid_targets)
-    
+
     def check_file_references(self, file_path: Path, valid_targets: Set[str]):
-        """Check references in a single file."""
-        try:
-            content = file_path.read_text(encoding="utf-8")
-        except Exception as e:
-            self.errors.append(f"Could not read {file_path}: {e}")
+        """Check the indexed references of a single file."""
+        entry = self.index[str(file_path)]
+        if "error" in entry:
+            self.errors.append(f"Could not read {file_path}: {entry['error']}")
             return
-        
-        # Find all markdown links
-        link_pattern = r'\[([^\]]+)\]\(([^)]+)\)'
-        matches = re.findall(link_pattern, content)
-        
-        for link_text, link_target in matches:
+
+        for _, link_text, link_target, fenced in entry["links"]:
             # Skip external links
-            if link_target.startswith(("http://", "https://", "mailto:", "#")):
+            if link_target.startswith(("http://", "https://", "mailto:")):
                 continue
-            
+
             # Clean up the target
-            target = link_target.split("#")[0]  # Remove anchors
+            target, _, anchor = link_target.partition("#")  # Split off anchors
             target = target.strip()
-            
-            # Check if target is valid
-            if not self.is_valid_target(target, file_path, valid_targets):
-                self.errors.append(
-                    f"Invalid reference in {file_path.relative_to(self.docs_dir)}: "
+
+            if target:
+                # Check if target is valid
+                if not self.is_valid_target(target, file_path, valid_targets):
+                    self.errors.append(
+                        f"Invalid reference in {file_path.relative_to(self.docs_dir)}: "
+                        f"[{link_text}]({link_target})"
+                    )
+                    continue
+
+            # examples in code blocks may point at sections that do not exist
+            if anchor and not fenced and not self.is_valid_anchor(target, anchor, file_path):
+                self.warnings.append(
+                    f"Unknown anchor in {file_path.relative_to(self.docs_dir)}: "
                     f"[{link_text}]({link_target})"
                 )
-    
+
     def is_valid_target(self, target: str, source_file: Path, valid_targets: Set[str]) -> bool:
         """Check if a reference target is valid."""
         # Direct match
         if target in valid_targets:
             return True
-        
+
         # Special cases for external file references
         if target.startswith("../"):
             # Allow references to files outside docs directory
             return True
-        
+
         # Check relative to source file
         source_dir = source_file.parent.relative_to(self.docs_dir)
         if source_dir != Path("."):
             relative_target = str(source_dir / target)
             if relative_target in valid_targets:
                 return True
-        
+
         # Check with .md extension
         if not target.endswith(".md"):
             if target + ".md" in valid_targets:
                 return True
-        
+
         # Special case for services/index.md
         if target == "services/index.md":
             return True
-        
+
         return False
-    
+
+    def is_valid_anchor(self, target: str, anchor: str, source_file: Path) -> bool:
+        """Check an anchor against the headings of the markdown file it points to."""
+        if not target:
+            doc = source_file
+        else:
+            doc = source_file.parent / target
+            if not doc.suffix:
+                doc = doc.with_suffix(".md")
+        entry = self.index.get(str(Path(os.path.normpath(doc))))
+        if entry is None or "anchors" not in entry:
+            # outside docs or not markdown: nothing to check against
+            return True
+        return anchor in entry["anchors"]
+
     def validate_markdown_links(self):
         """Validate markdown link formatting."""
         print("\n📝 Validating markdown links...")
-        
-        md_files = list(self.docs_dir.rglob("*.md"))
-        
-        for md_file in md_files:
-            try:
-                content = md_file.read_text(encoding="utf-8")
-            except Exception as e:
-                self.errors.append(f"Could not read {md_file}: {e}")
+
+        for md_file in self.md_files:
+            entry = self.index[str(md_file)]
+            if "error" in entry:
+                self.errors.append(f"Could not read {md_file}: {entry['error']}")
                 continue
-            
+
             # Check for common markdown link issues
-            self.check_markdown_issues(content, md_file)
-    
-    def check_markdown_issues(self, content: str, file_path: Path):
-        """Check for common markdown issues in a file."""
-        lines = content.split("\n")
-        
-        for i, line in enumerate(lines, 1):
-            # Check for empty link text
-            if "[](" in line:
+            self.check_markdown_issues(entry["issues"], md_file)
+
+    def check_markdown_issues(self, issues: List, file_path: Path):
+        """Report the common markdown issues found while indexing a file."""
+        for i, kind, line in issues:
+            if kind == "empty":
                 self.warnings.append(
                     f"Empty link text in {file_path.relative_to(self.docs_dir)}:{i}"
                 )
-            
-            # Check for malformed links
-            if "[" in line and "](" in line and not re.search(r'\[[^\]]+\]\([^)]+\)', line):
+            else:
                 self.warnings.append(
-                    f"Potential malformed link in {file_path.relative_to(self.docs_dir)}:{i}: {line.strip()}"
+                    f"Potential malformed link in {file_path.relative_to(self.docs_dir)}:{i}: {line}"
                 )
-    
+
     def validate_docstring_standards(self):
         """Validate docstring standards in code files."""
         print("\n🐍 Validating docstring standards...")
-        
-        # Check Python files
-        python_files = list(Path(".").rglob("*.py"))
-        for py_file in python_files:
-            if "node_modules" in str(py_file) or ".git" in str(py_file):
-                continue
-            self.check_python_docstrings(py_file)
-        
-        # Check TypeScript files
-        ts_files = list(Path(".").rglob("*.ts")) + list(Path(".").rglob("*.tsx"))
-        for ts_file in ts_files:
-            if "node_modules" in str(ts_file) or ".git" in str(ts_file):
-                continue
-            self.check_typescript_docstrings(ts_file)
-    
-    def check_python_docstrings(self, file_path: Path):
-        """Check docstring standards in Python files."""
-        try:
-            content = file_path.read_text(encoding="utf-8")
-        except Exception:
-            return
-        
-        # Check for functions without docstrings
-        function_pattern = r'def\s+(\w+)\s*\([^)]*\)\s*->[^:]*:'
-        functions = re.findall(function_pattern, content)
-        
-        for func_name in functions:
-            # Simple check - look for docstring after function definition
-            func_pattern = rf'def {func_name}\s*\([^)]*\)\s*->[^:]*:\s*"""'
-            if not re.search(func_pattern, content):
-                self.warnings.append(
-                    f"Function {func_name} in {file_path} may be missing docstring"
-                )
-    
-    def check_typescript_docstrings(self, file_path: Path):
-        """Check JSDoc standards in TypeScript files."""
-        try:
-            content = file_path.read_text(encoding="utf-8")
-        except Exception:
-            return
-        
-        # Check for functions without JSDoc
-        function_pattern = r'(?:function\s+(\w+)|const\s+(\w+)\s*=\s*(?:\([^)]*\)\s*=>|async\s*\([^)]*\)\s*=>))'
-        functions = re.findall(function_pattern, content)
-        
-        for func_match in functions:
-            func_name = func_match[0] or func_match[1]
-            if func_name and not func_name.startswith("_"):
-                # Simple check - look for JSDoc before function
-                jsdoc_pattern = rf'/\*\*[\s\S]*?\*/\s*(?:function\s+{func_name}|const\s+{func_name}\s*=)'
-                if not re.search(jsdoc_pattern, content):
+
+        # Python files first, then TypeScript
+        for suffixes, label in (((".py",), "docstring"), ((".ts", ".tsx"), "JSDoc")):
+            for source_file in self.source_files:
+                if source_file.suffix not in suffixes:
+                    continue
+                for func_name in self.index[str(source_file)].get("undocumented", []):
                     self.warnings.append(
-                        f"Function {func_name} in {file_path} may be missing JSDoc"
+                        f"Function {func_name} in {source_file} may be missing {label}"
                     )
-    
+
     def print_results(self):
         """Print validation results."""
         print("\n" + "=" * 50)
         print("📊 VALIDATION RESULTS")
         print("=" * 50)
-        
+
         if self.errors:
             print(f"\n❌ ERRORS ({len(self.errors)}):")
             for error in self.errors:
                 print(f"  • {error}")
-        
+
         if self.warnings:
             print(f"\n⚠️  WARNINGS ({len(self.warnings)}):")
             for warning in self.warnings:
                 print(f"  • {warning}")
-        
+
         if not self.errors and not self.warnings:
             print("\n✅ All checks passed! Documentation is valid.")
         elif not self.errors:
             print(f"\n✅ No errors found. {len(self.warnings)} warnings to review.")
         else:
             print(f"\n❌ {len(self.errors)} error(s) found. Please fix before committing.")
-        
+
         print(f"\n📈 Summary: {len(self.errors)} errors, {len(self.warnings)} warnings")
-        
+
         if self.info_messages:
             print(f"\nℹ️  INFO ({len(self.info_messages)}):")
             for info in self.info_messages:
                 print(f"  • {info}")
-    
+
+    def print_timings(self):
+        """Print the duration of every check."""
+        print("\n⏱️  TIMINGS:")
+        for name, seconds in self.timings.items():
+            detail = ""
+            if name == "index":
+                processes = f"{self.workers} processes" if self.workers else "serial"
+                detail = (
+                    f"  ({len(self.index)} files: {self.cache.hits} cached, "
+                    f"{self.cache.misses} parsed, {processes})"
+                )
+            print(f"  • {name:<18} {seconds * 1000:>8.1f} ms{detail}")
+        print(f"  • {'total':<18} {sum(self.timings.values()) * 1000:>8.1f} ms")
+
     def validate_timestamps(self):
         """Validate that documentation is newer than source code."""
         print("\n⏰ Validating documentation timestamps...")
-        
+
         timestamp_issues = []
-        
+
         for source_file, doc_file in self.source_to_doc_mapping.items():
             source_path = Path(source_file)
             doc_path = self.docs_dir / doc_file
-            
+
             # Skip if either file doesn't exist
             if not source_path.exists():
                 self.warnings.append(f"Source file not found: {source_file}")
                 continue
-                
+
             if not doc_path.exists():
                 self.errors.append(f"Documentation file not found: {doc_file}")
                 continue
-            
+
             # Get modification times
             source_mtime = source_path.stat().st_mtime
             doc_mtime = doc_path.stat().st_mtime
-            
+
             # Calculate time difference
             time_diff = doc_mtime - source_mtime
-            
+
             if time_diff < 0:
                 # Documentation is older than source code
                 days_old = abs(time_diff) / (24 * 3600)
-                
+
                 if self.strict_timestamps or days_old > 7:
                     self.errors.append(
                         f"Documentation severely outdated: {doc_file} is {days_old:.1f} days older than {source_file}"
@@ -370,20 +634,20 @@ class DocumentationValidator:
                 self.info_messages.append(
                     f"Documentation current: {doc_file} is newer than {source_file}"
                 )
-        
+
         # Auto-update timestamps if requested and no errors
         if self.update_timestamps and not self.errors:
             self.update_documentation_timestamps(timestamp_issues)
-    
+
     def update_documentation_timestamps(self, timestamp_issues: List[Tuple[str, str, float]]):
         """Update documentation file timestamps to current time."""
         if not timestamp_issues:
             print("\n📝 All documentation timestamps are current.")
             return
-        
+
         print(f"\n📝 Updating {len(timestamp_issues)} documentation file timestamps...")
         current_time = time.time()
-        
+
         for source_file, doc_file, _ in timestamp_issues:
             doc_path = self.docs_dir / doc_file
             try:
@@ -421,28 +685,46 @@ def main():
         action="store_true",
         help="Update documentation timestamps after validation (only if no errors)"
     )
-    
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=None,
+        help="Processes that parse files (default: CPU count, 1 = serial)"
+    )
+    parser.add_argument(
+        "--cache-file",
+        default=str(DEFAULT_CACHE_FILE),
+        help=f"Per-file result cache (default: {DEFAULT_CACHE_FILE})"
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Parse every file, without reading or writing the cache"
+    )
+
     args = parser.parse_args()
-    
+
     # Check if docs directory exists
     if not Path(args.docs_dir).exists():
         print(f"❌ Documentation directory '{args.docs_dir}' not found.")
         sys.exit(1)
-    
+
     # Validate argument combinations
     if args.update_timestamps and not args.check_timestamps:
         print("❌ --update-timestamps requires --check-timestamps")
         sys.exit(1)
-    
+
     # Run validation
     validator = DocumentationValidator(
         docs_dir=args.docs_dir,
         check_timestamps=args.check_timestamps,
         strict_timestamps=args.strict_timestamps,
-        update_timestamps=args.update_timestamps
+        update_timestamps=args.update_timestamps,
+        jobs=args.jobs,
+        cache_file=None if args.no_cache else Path(args.cache_file),
     )
     success = validator.validate_all()
-    
+
     # Exit with appropriate code
     if not success:
         sys.exit(1)
@@ -454,4 +736,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()